@@ -169,6 +169,6 @@ class RatedAppSettingsAdmin(admin.ModelAdmin):
             'description': 'Configure SMTP settings for analytics email reports'
         }),
         ('Analytics Settings', {
-            'fields': ('analytics_enabled', 'analytics_preset', 'analytics_last_job')
+            'fields': ('analytics_enabled', 'analytics_preset', 'analytics_last_job', 'interactive_rate_share', 'shard_cache_horizon_months')
         })
     )
@@ -0,0 +1,164 @@
+import math
+from typing import Dict, Optional
+
+from .cohort_shards import ShardedCohortDiscovery
+from .integrations.factory import IntegrationFactory
+from .management.commands.process_analytics import date_range_utc
+from .models import AnalyticsJob, Patient
+
+# Typical Cliniko round trip, used for the sequential part of the estimate
+AVG_REQUEST_SECONDS = 0.4
+# Name lookup for cohort members not yet known locally
+DISCOVERY_CALLS_PER_PATIENT = 1
+# Patient, appointments (active + cancelled), invoices, referrals
+FETCH_CALLS_PER_PATIENT = 5
+# Appointments (active + cancelled) to find the latest, then GET and PUT its notes
+WRITE_BACK_CALLS_PER_PATIENT = 4
+PAGE_SIZE = 100
+
+
+def previous_skip_ratio() -> float:
+    """Share of patients carried forward by the most recent incremental run"""
+    last_run = AnalyticsJob.objects.filter(
+        incremental=True,
+        is_test_mode=False,
+        last_run_completed__isnull=False,
+        patients_processed__gt=0
+    ).order_by('-last_run_completed').values('patients_skipped', 'patients_processed').first()
+
+    if not last_run:
+        return 0.0
+    return last_run['patients_skipped'] / last_run['patients_processed']
+
+
+def estimate_analytics_run(
+    settings,
+    date_range: str,
+    incremental: bool = True,
+    is_test_mode: bool = False
+) -> Optional[Dict]:
+    """
+    Project the size, API usage and duration of an analytics run
+
+    Fetches only the first page of appointments in the window: the total
+    appointment count comes from the API and the cohort is projected from
+    the unique patients on that page. Discovery only pays for month shards
+    missing from the shard cache, and for name lookups of patients not yet
+    stored locally. Scoring and write-back run as overlapping pipeline
+    stages, so the slower of the two sets their duration.
+
+    :param settings: RatedAppSettings for the clinic
+    :param date_range: AnalyticsJob date range code
+    :param incremental: Whether unchanged patients will be carried forward
+    :param is_test_mode: Test runs skip the write-back stage
+    :return: Estimate dictionary, or None if the integration can't sample appointments
+    """
+    client = IntegrationFactory.get_client(settings)
+    start_date, end_date = date_range_utc(date_range, settings.clinic_timezone)
+
+    sample = client.sample_appointments_in_range(start_date, end_date)
+    if sample is None:
+        return None
+    total_appointments, first_page = sample
+
+    patient_ids = {
+        link.split('/')[-1]
+        for link in (
+            (appointment.get('patient') or {}).get('links', {}).get('self', '')
+            for appointment in first_page
+        )
+        if link
+    }
+
+    exact = total_appointments <= len(first_page)
+    if exact or not first_page:
+        cohort = len(patient_ids)
+    else:
+        # Repeat visits grow with the window, so this errs on the high side
+        cohort = min(total_appointments, math.ceil(len(patient_ids) / len(first_page) * total_appointments))
+
+    rate_limits = client.get_rate_limits()
+    workers = max(1, rate_limits.get('concurrent_requests', 1))
+
+    # Month shards already cached cost no API calls; only the rest are paginated
+    discovery = ShardedCohortDiscovery(client, settings, workers=workers)
+    shards = discovery.plan(start_date, end_date)
+    frozen = [shard for shard in shards if shard['frozen']]
+    cached = discovery.cached_shards(shards)
+    fetched_appointments = total_appointments
+    if cached:
+        live = [shard for shard in shards if not shard['frozen']]
+        live_sample = client.sample_appointments_in_range(live[0]['fetch_start'], end_date) if live else (0, [])
+        live_appointments = live_sample[0] if live_sample else total_appointments
+        frozen_appointments = max(total_appointments - live_appointments, 0)
+        fetched_appointments = live_appointments + math.ceil(
+            frozen_appointments * (len(frozen) - len(cached)) / len(frozen)
+        )
+    fetched_shards = len(shards) - len(cached)
+
+    # Share of sampled patients whose names are already stored
+    known = Patient.objects.filter(cliniko_patient_id__in=patient_ids).exclude(patient_name='').count()
+    lookups = math.ceil(cohort * (1 - known / len(patient_ids))) if patient_ids else cohort
+
+    skip_ratio = previous_skip_ratio() if incremental else 0.0
+    rescored = math.ceil(cohort * (1 - skip_ratio))
+
+    budget = client.rate_budget()
+    background_per_minute = budget.capacity - budget.reserve
+
+    def stage(api_calls: int, sequential_seconds: float) -> Dict:
+        # A stage is bound by whichever is slower: the rate budget or its own pacing
+        rate_seconds = api_calls / background_per_minute * 60
+        return {
+            'api_calls': api_calls,
+            'seconds': round(max(rate_seconds, sequential_seconds / workers)),
+        }
+
+    # Every fetched shard paginates on its own, so count one partial page each
+    discovery_calls = (
+        math.ceil(fetched_appointments / PAGE_SIZE) + fetched_shards
+        + lookups * DISCOVERY_CALLS_PER_PATIENT
+    )
+    scoring_calls = rescored * FETCH_CALLS_PER_PATIENT
+    write_back_calls = 0 if is_test_mode else rescored * WRITE_BACK_CALLS_PER_PATIENT
+
+    stages = {
+        'discovery': stage(
+            discovery_calls,
+            discovery_calls * AVG_REQUEST_SECONDS
+        ),
+        'scoring': stage(
+            scoring_calls,
+            scoring_calls * AVG_REQUEST_SECONDS
+        ),
+        'write_back': stage(
+            write_back_calls,
+            write_back_calls * AVG_REQUEST_SECONDS
+        ),
+    }
+
+    # Fetch/score and write-back overlap, but share one rate budget
+    pipelined_calls = scoring_calls + write_back_calls
+    processing_seconds = max(
+        stages['scoring']['seconds'],
+        stages['write_back']['seconds'],
+        round(pipelined_calls / background_per_minute * 60)
+    )
+
+    return {
+        'date_range': date_range,
+        'appointments': total_appointments,
+        'cohort': cohort,
+        'cohort_exact': exact,
+        'cached_shards': len(cached),
+        'fetched_shards': fetched_shards,
+        'patients_rescored': rescored,
+        'skip_ratio': round(skip_ratio, 2),
+        'write_backs': 0 if is_test_mode else rescored,
+        'stages': stages,
+        'api_calls': sum(s['api_calls'] for s in stages.values()),
+        'duration_seconds': stages['discovery']['seconds'] + processing_seconds,
+        'requests_per_minute': background_per_minute,
+        'workers': workers,
+    }
+
@@ -0,0 +1,200 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from django.db import close_old_connections
+
+from .job_control import JobInterrupted
+
+logger = logging.getLogger(__name__)
+
+# End-of-stream marker passed down the queues
+_DONE = object()
+
+
+class Stage:
+    """
+    One step of an analytics pipeline, run by ``workers`` threads
+
+    ``func`` takes a work item and returns the item to hand downstream. It
+    should not raise: failures are recorded on the item so later stages can
+    pass it through untouched. Anything it does raise is recorded the same way
+    (status 'error'), except JobInterrupted, which marks the item
+    'interrupted' and stops the worker calling ``func``; it then passes the
+    rest of its input through as interrupted, so no upstream stage is left
+    blocked on a full queue.
+    """
+
+    def __init__(self, name: str, func: Callable[[Dict], Dict], workers: int = 1, queue_size: int = 10):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.input = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self._done_seen = 0
+        self._finished_workers = 0
+        self._lock = threading.Lock()
+
+    def stats(self, elapsed: float) -> Dict:
+        """Throughput, utilisation and queue depth since the pipeline started"""
+        with self._lock:
+            processed, busy = self.processed, self.busy_seconds
+        return {
+            'workers': self.workers,
+            'processed': processed,
+            'queue_depth': self.input.qsize(),
+            'per_minute': round(processed / elapsed * 60, 1) if elapsed > 0 else 0.0,
+            'utilisation': round(busy / (elapsed * self.workers), 2) if elapsed > 0 else 0.0,
+        }
+
+
+class Pipeline:
+    """
+    Stages connected by bounded queues, so every stage works concurrently
+
+    A full queue blocks the stage feeding it (backpressure), so memory stays
+    bounded and throughput settles at the rate of the slowest stage rather
+    than the sum of all of them. The caller feeds items with ``feed()`` and
+    consumes finished items from ``results()`` on its own thread, calling
+    ``close()`` when it is done (in a ``finally``), so an early exit never
+    leaves a stage thread blocked on a queue nobody reads.
+    """
+
+    # Seconds between checks for close() while a thread waits on a queue
+    CLOSE_CHECK_INTERVAL = 0.5
+
+    def __init__(self, stages: List[Stage], output_size: int = 10):
+        self.stages = stages
+        self.output = queue.Queue(maxsize=output_size)
+        self.started = None
+        self._closed = threading.Event()
+
+    def start(self):
+        self.started = time.monotonic()
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1].input if index + 1 < len(self.stages) else self.output
+            for number in range(stage.workers):
+                threading.Thread(
+                    target=self._work,
+                    args=(stage, downstream),
+                    name=f'pipeline-{stage.name}-{number}',
+                    daemon=True
+                ).start()
+
+    def _put(self, target: queue.Queue, item) -> bool:
+        """Put ``item`` on ``target``, giving up (returning False) once the pipeline is closed"""
+        while not self._closed.is_set():
+            try:
+                target.put(item, timeout=self.CLOSE_CHECK_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, source: queue.Queue):
+        """Next item from ``source``, or _DONE once the pipeline is closed"""
+        while not self._closed.is_set():
+            try:
+                return source.get(timeout=self.CLOSE_CHECK_INTERVAL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def _work(self, stage: Stage, downstream: queue.Queue):
+        interrupted = False
+        try:
+            while True:
+                item = self._get(stage.input)
+                if item is _DONE:
+                    # Let the stage's other workers see the end of the stream too
+                    with stage._lock:
+                        stage._done_seen += 1
+                        others_waiting = stage._done_seen < stage.workers
+                    if others_waiting:
+                        self._put(stage.input, _DONE)
+                    break
+
+                if interrupted:
+                    item['status'] = 'interrupted'
+                    if not self._put(downstream, item):
+                        break
+                    continue
+
+                started = time.monotonic()
+                try:
+                    item = stage.func(item)
+                except JobInterrupted:
+                    interrupted = True
+                    item['status'] = 'interrupted'
+                except Exception as e:
+                    logger.exception(f"Pipeline stage {stage.name} failed on patient {item.get('patient_id')}")
+                    item['status'] = 'error'
+                    item['error'] = str(e)
+                with stage._lock:
+                    stage.processed += 1
+                    stage.busy_seconds += time.monotonic() - started
+
+                if not self._put(downstream, item):
+                    break
+        finally:
+            close_old_connections()
+            with stage._lock:
+                stage._finished_workers += 1
+                last_worker = stage._finished_workers == stage.workers
+            if last_worker:
+                self._put(downstream, _DONE)
+
+    def feed(self, items: Iterable[Dict], should_stop: Optional[Callable[[], bool]] = None):
+        """
+        Feed items into the first stage from a background thread
+
+        :param items: Work items
+        :param should_stop: Checked before each item; feeding ends once it returns True
+        """
+        def run():
+            try:
+                for item in items:
+                    if should_stop and should_stop():
+                        break
+                    if not self._put(self.stages[0].input, item):
+                        break
+            finally:
+                close_old_connections()
+                self._put(self.stages[0].input, _DONE)
+
+        threading.Thread(target=run, name='pipeline-feed', daemon=True).start()
+
+    def results(self) -> Iterator[Dict]:
+        """Yield finished items until every stage has drained"""
+        while True:
+            item = self._get(self.output)
+            if item is _DONE:
+                return
+            yield item
+
+    def close(self):
+        """
+        Stop the pipeline and release its threads
+
+        Feeding stops and every queue is drained; workers finish the item
+        they are on, drop the rest and exit (closing their database
+        connections). A no-op once the pipeline has drained normally.
+        """
+        self._closed.set()
+        for pending in [stage.input for stage in self.stages] + [self.output]:
+            try:
+                while True:
+                    pending.get_nowait()
+            except queue.Empty:
+                pass
+
+    def stats(self) -> Dict:
+        """Per-stage throughput and queue depth, plus the output backlog"""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        stats = {stage.name: stage.stats(elapsed) for stage in self.stages}
+        stats['output_queue_depth'] = self.output.qsize()
+        stats['elapsed_seconds'] = round(elapsed)
+        return stats
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PatientRatingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'patient_rating'
+
+    def ready(self):
+        # Registers the signal receivers that keep the config cache current
+        # and time each connection's queries
+        from . import config_cache, request_metrics  # noqa: F401
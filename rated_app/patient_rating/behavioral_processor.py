@@ -1,37 +1,97 @@
 from datetime import datetime, timedelta
+import logging
 import pytz
 
+from .scoring_plan import ScoringPlan
+
+try:
+    import numpy as np
+except ImportError:  # Optional - score_batch falls back to plain Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Minimum total score for each letter grade, best first
+GRADE_THRESHOLDS = [
+    (100, 'A+'),
+    (80, 'A'),
+    (60, 'B'),
+    (40, 'C'),
+    (20, 'D'),
+]
+
+# behavior_data categories, in scoring order
+SCORE_CATEGORIES = [
+    'future_appointments',
+    'age_demographics',
+    'yearly_spend',
+    'consecutive_attendance',
+    'referrer_score',
+    'open_dna_invoices',
+    'unpaid_invoices',
+    'cancellations',
+    'dna',
+    'likability',
+]
+
+# Per-patient inputs to score_batch, as produced by batch_features() or feature_row()
+BATCH_COLUMNS = [
+    'future_appointments',
+    'age',
+    'yearly_spend',
+    'consecutive_streak',
+    'referral_count',
+    'cancellation_count',
+    'dna_count',
+    'unpaid_count',
+    'has_open_dna',
+    'likability',
+]
+
 class BehavioralProcessor:
     @staticmethod
-    def process_patient_behavior(patient_data, config, settings):
+    def process_patient_behavior(patient_data, config, settings, likability=None):
         """
         Process patient behavioral metrics using the latest scoring logic
         
         :param patient_data: Normalized patient data dictionary
-        :param config: Active scoring configuration
+        :param config: Compiled ScoringPlan, or a scoring configuration to compile
         :param settings: RatedAppSettings with clinic timezone
+        :param likability: Saved likability by patient ID (see Patient.likability_map),
+                           or a callable taking the patient ID; patients missing
+                           from it score 0
         :return: Dictionary of behavioral metrics
         """
+        features = BehavioralProcessor.extract_features(patient_data, settings)
+        return BehavioralProcessor.score_features(features, config, settings, likability)
+    
+    @staticmethod
+    def extract_features(patient_data, settings):
+        """
+        Scoring inputs of a patient, independent of any scoring configuration
+        
+        The result is a small dictionary of plain values, so it can be cached
+        and rescored with score_features() whenever the weights change.
+        
+        :param patient_data: Normalized patient data dictionary
+        :param settings: RatedAppSettings with clinic timezone
+        :return: Dictionary with the patient id, age, referral_count and the
+                 counts from extract_activity()
+        """
         # Use clinic timezone from settings
         clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
         now_utc = datetime.now(pytz.UTC)
         
-        behavior_data = {}
-        
-        # 1. FUTURE APPOINTMENTS
-        future_appointments = [
-            appt for appt in patient_data.get('appointments', []) 
-            if datetime.fromisoformat(appt.get('starts_at', '').replace('Z', '+00:00')) > now_utc
-        ]
-        behavior_data['future_appointments'] = {
-            'count': len(future_appointments),
-            'points': config.future_appointments_weight if len(future_appointments) > 0 else 0,
-            'description': f"{len(future_appointments)} future appointments"
-        }
+        # Every count comes from one sweep over the appointments and invoices
+        features = BehavioralProcessor.extract_activity(
+            patient_data.get('appointments', []),
+            patient_data.get('invoices', []),
+            now_utc
+        )
         
-        # 2. AGE DEMOGRAPHICS
         dob = patient_data.get('date_of_birth')
         age = 0
+        next_age_change = None
         if dob:
             # Handle multiple date formats
             for date_format in ['%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y']:
@@ -39,26 +99,54 @@ class BehavioralProcessor:
                     birth_date = datetime.strptime(dob, date_format)
                     today = datetime.now(clinic_tz).date()
                     age = (today - birth_date.date()).days // 365
+                    # Start of the clinic day the age above next increases
+                    next_age_change = clinic_tz.localize(datetime.combine(
+                        birth_date.date() + timedelta(days=365 * (age + 1)), datetime.min.time()
+                    ))
                     break
                 except ValueError:
                     continue
             
             if age == 0 and dob:
-                print(f"Warning: Could not parse date of birth: {dob}")
+                logger.warning(f"Could not parse date of birth: {dob}")
         
-        # Find matching age bracket
-        matching_bracket = next(
-            (bracket for bracket in config.age_brackets.all() 
-             if bracket.min_age <= age <= bracket.max_age), 
-            None
+        features.update(
+            id=str(patient_data.get('id')),
+            age=age,
+            referral_count=len(patient_data.get('referrals', [])),
+            valid_until=BehavioralProcessor.earliest(features['valid_until'], next_age_change)
         )
+        return features
+    
+    @staticmethod
+    def score_features(features, config, settings, likability=None):
+        """
+        Score features from extract_features() with a scoring configuration
         
-        if matching_bracket:
-            points_awarded = int((matching_bracket.percentage / 100) * config.age_demographics_weight)
-            bracket_description = f"[{matching_bracket.min_age}-{matching_bracket.max_age}] ({matching_bracket.percentage}%)"
-        else:
-            points_awarded = 0
-            bracket_description = "No matching bracket"
+        :param features: Dictionary from extract_features()
+        :param config: Compiled ScoringPlan, or a scoring configuration to compile
+        :param settings: RatedAppSettings with clinic timezone
+        :param likability: As for process_patient_behavior
+        :return: Dictionary of behavioral metrics
+        """
+        # Callers scoring many patients compile once; single lookups compile here
+        plan = config if isinstance(config, ScoringPlan) else ScoringPlan.from_config(config)
+        clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
+        
+        behavior_data = {}
+        
+        # 1. FUTURE APPOINTMENTS
+        behavior_data['future_appointments'] = {
+            'count': features['future_count'],
+            'points': plan.future_appointments_weight if features['future_count'] > 0 else 0,
+            'description': f"{features['future_count']} future appointments"
+        }
+        
+        # 2. AGE DEMOGRAPHICS
+        age = features['age']
+        
+        # Find matching age bracket
+        points_awarded, bracket_description = plan.age_points(age)
         
         behavior_data['age_demographics'] = {
             'age': age,
@@ -67,30 +155,10 @@ class BehavioralProcessor:
         }
         
         # 3. YEARLY SPEND
-        twelve_months_ago = now_utc - timedelta(days=365)
-        yearly_invoices = [
-            inv for inv in patient_data.get('invoices', []) 
-            if inv.get('created_at') and 
-               datetime.fromisoformat(inv['created_at'].replace('Z', '+00:00')) >= twelve_months_ago
-        ]
-        yearly_spend = sum(float(inv.get('total_amount', 0)) for inv in yearly_invoices)
-        
-        # Dynamic spend bracket calculation
-        spend_brackets = config.spend_brackets.all().order_by('order')
-        bracket_percentage = 0
-        
-        for bracket in spend_brackets:
-            if bracket.min_spend <= yearly_spend <= bracket.max_spend:
-                bracket_percentage = bracket.percentage / 100
-                break
-        
-        # Fallback for amounts above highest bracket
-        if bracket_percentage == 0 and yearly_spend > 0 and spend_brackets.exists():
-            highest_bracket = spend_brackets.order_by('-max_spend').first()
-            if yearly_spend > highest_bracket.max_spend:
-                bracket_percentage = highest_bracket.percentage / 100
-        
-        points_awarded = round(config.yearly_spend_weight * bracket_percentage)
+        yearly_spend = features['yearly_spend']
+        
+        # Dynamic spend bracket calculation (amounts above the highest bracket get its points)
+        points_awarded = plan.spend_points(yearly_spend)
         
         behavior_data['yearly_spend'] = {
             'amount': yearly_spend,
@@ -99,20 +167,10 @@ class BehavioralProcessor:
         }
         
         # 4. CONSECUTIVE ATTENDANCE
-        sorted_appointments = sorted(
-            patient_data.get('appointments', []), 
-            key=lambda x: x.get('starts_at', ''), 
-            reverse=True
-        )
-        
-        consecutive_streak = 0
-        for appt in sorted_appointments:
-            if appt.get('cancelled_at') or appt.get('did_not_arrive'):
-                break
-            consecutive_streak += 1
+        consecutive_streak = features['consecutive_streak']
         
-        raw_points = consecutive_streak * config.points_per_consecutive_attendance
-        points_awarded = min(raw_points, config.consecutive_attendance_weight)
+        raw_points = consecutive_streak * plan.points_per_consecutive_attendance
+        points_awarded = min(raw_points, plan.consecutive_attendance_weight)
         
         behavior_data['consecutive_attendance'] = {
             'streak': consecutive_streak,
@@ -121,12 +179,11 @@ class BehavioralProcessor:
         }
         
         # 5. REFERRER SCORE
-        referrals = patient_data.get('referrals', [])
-        referral_count = len(referrals)
+        referral_count = features['referral_count']
         
         # Calculate referrer points with dynamic weighting
-        raw_points = referral_count * config.points_per_referral
-        referrer_points = min(raw_points, config.referrer_score_weight)
+        raw_points = referral_count * plan.points_per_referral
+        referrer_points = min(raw_points, plan.referrer_score_weight)
         
         behavior_data['referrer_score'] = {
             'points': referrer_points,
@@ -135,77 +192,49 @@ class BehavioralProcessor:
         }
         
         # 6. OPEN DNA INVOICES
-        unpaid_invoices = [
-            inv for inv in patient_data.get('invoices', []) 
-            if inv.get('closed_at') is None
-        ]
-        
-        # Check for DNA-related unpaid invoices by linking to appointments
-        dna_related_unpaid = []
-        for invoice in unpaid_invoices:
-            # Check if invoice is linked to a DNA appointment
-            if 'appointment' in invoice and invoice['appointment']:
-                appointment_link = invoice['appointment']['links']['self']
-                appointment_id = appointment_link.split('/')[-1]
-                
-                # Find the matching appointment in our appointments data
-                for appointment in patient_data.get('appointments', []):
-                    if str(appointment.get('id')) == appointment_id:
-                        # Check if this appointment is a DNA (did_not_arrive = True)
-                        if appointment.get('did_not_arrive', False):
-                            dna_related_unpaid.append(invoice)
-                        break
-        
-        has_open_dna = len(dna_related_unpaid) > 0
+        open_dna_count = features['open_dna_count']
+        
+        has_open_dna = open_dna_count > 0
         behavior_data['open_dna_invoices'] = {
             'has_open_dna': has_open_dna,
-            'count': len(dna_related_unpaid),
-            'points': -config.open_dna_invoice_weight if has_open_dna else 0,
-            'description': f"{len(dna_related_unpaid)} open DNA invoices"
+            'count': open_dna_count,
+            'points': -plan.open_dna_invoice_weight if has_open_dna else 0,
+            'description': f"{open_dna_count} open DNA invoices"
         }
         
         # 7. UNPAID INVOICES
-        unpaid_count = len(unpaid_invoices)
+        unpaid_count = features['unpaid_count']
         behavior_data['unpaid_invoices'] = {
             'count': unpaid_count,
-            'points': -min(config.points_per_unpaid_invoice * unpaid_count, config.unpaid_invoices_weight),
+            'points': -min(plan.points_per_unpaid_invoice * unpaid_count, plan.unpaid_invoices_weight),
             'description': f"{unpaid_count} unpaid invoices"
         }
         
         # 8. CANCELLATIONS
-        cancelled_appointments = [
-            appt for appt in patient_data.get('appointments', []) 
-            if appt.get('cancelled_at')
-        ]
-        cancellation_count = len(cancelled_appointments)
+        cancellation_count = features['cancellation_count']
         
         behavior_data['cancellations'] = {
             'count': cancellation_count,
-            'points': -min(config.points_per_cancellation * cancellation_count, config.cancellations_weight),
+            'points': -min(plan.points_per_cancellation * cancellation_count, plan.cancellations_weight),
             'description': f"{cancellation_count} total cancellations"
         }
         
         # 9. DNA APPOINTMENTS
-        dna_appointments = [
-            appt for appt in patient_data.get('appointments', []) 
-            if appt.get('did_not_arrive')
-        ]
-        dna_count = len(dna_appointments)
+        dna_count = features['dna_count']
         
         behavior_data['dna'] = {
             'count': dna_count,
-            'points': -min(config.points_per_dna * dna_count, config.dna_weight),
+            'points': -min(plan.points_per_dna * dna_count, plan.dna_weight),
             'description': f"{dna_count} DNA (Did Not Arrive)"
         }
         
         # 10. LIKABILITY (Manual)
-        # Check for saved likability in Patient model
-        try:
-            from patient_rating.models import Patient
-            patient_record = Patient.objects.filter(cliniko_patient_id=patient_data.get('id')).first()
-            saved_likability = patient_record.likability if patient_record else 0
-        except:
-            saved_likability = 0
+        # Saved likability is loaded by the caller, so scoring never touches the database
+        patient_id = features['id']
+        if callable(likability):
+            saved_likability = likability(patient_id) or 0
+        else:
+            saved_likability = (likability or {}).get(patient_id, 0)
         
         behavior_data['likability'] = {
             'score': saved_likability,
@@ -217,18 +246,7 @@ class BehavioralProcessor:
         total_score = round(sum(category.get('points', 0) for category in behavior_data.values()))
         
         # Calculate Letter Grade
-        if total_score >= 100:
-            letter_grade = 'A+'
-        elif total_score >= 80:
-            letter_grade = 'A'
-        elif total_score >= 60:
-            letter_grade = 'B'
-        elif total_score >= 40:
-            letter_grade = 'C'
-        elif total_score >= 20:
-            letter_grade = 'D'
-        else:
-            letter_grade = 'F'
+        letter_grade = BehavioralProcessor.letter_grade(total_score)
         
         return {
             'behavior_data': behavior_data,
@@ -236,3 +254,262 @@ class BehavioralProcessor:
             'letter_grade': letter_grade,
             'analysis_date': datetime.now(clinic_tz).isoformat()
         }
+    
+    @staticmethod
+    def extract_activity(appointments, invoices, now_utc):
+        """
+        Appointment and invoice counts for scoring, in a single linear pass
+        
+        Appointments are swept once (indexing DNA appointments by ID for the
+        invoice join) and then invoices once, so cost grows linearly with a
+        patient's history; both may be any iterable.
+        
+        The consecutive streak counts attended appointments after the latest
+        cancelled or DNA one, ties on start time resolved in list order as a
+        stable sort newest-first would.
+        
+        :param appointments: Appointment dictionaries from the integration
+        :param invoices: Invoice dictionaries from the integration
+        :param now_utc: Current time (aware, UTC)
+        :return: Dictionary with future_count, consecutive_streak,
+                 cancellation_count, dna_count, yearly_spend, unpaid_count,
+                 open_dna_count and valid_until (ISO time the counts next
+                 change through time passing alone, or None)
+        """
+        future_count = 0
+        next_future_start = None
+        cancellation_count = 0
+        dna_count = 0
+        attended_starts = []
+        latest_missed = None
+        # did_not_arrive of the first appointment seen with each ID
+        did_not_arrive_by_id = {}
+        
+        for appointment in appointments:
+            starts_at = appointment.get('starts_at', '')
+            starts = datetime.fromisoformat(starts_at.replace('Z', '+00:00'))
+            if starts > now_utc:
+                future_count += 1
+                if next_future_start is None or starts < next_future_start:
+                    next_future_start = starts
+            
+            cancelled = bool(appointment.get('cancelled_at'))
+            did_not_arrive = bool(appointment.get('did_not_arrive'))
+            cancellation_count += cancelled
+            dna_count += did_not_arrive
+            did_not_arrive_by_id.setdefault(str(appointment.get('id')), did_not_arrive)
+            
+            if cancelled or did_not_arrive:
+                if latest_missed is None or starts_at > latest_missed:
+                    latest_missed = starts_at
+                    attended_before_missed = len(attended_starts)
+            else:
+                attended_starts.append(starts_at)
+        
+        if latest_missed is None:
+            consecutive_streak = len(attended_starts)
+        else:
+            # Attended at the same time as the missed appointment only count
+            # when listed before it
+            consecutive_streak = sum(
+                1 for index, starts_at in enumerate(attended_starts)
+                if starts_at > latest_missed or (starts_at == latest_missed and index < attended_before_missed)
+            )
+        
+        twelve_months_ago = now_utc - timedelta(days=365)
+        yearly_amounts = []
+        unpaid_count = 0
+        open_dna_count = 0
+        oldest_in_window = None
+        
+        for invoice in invoices:
+            created_at = invoice.get('created_at')
+            if created_at:
+                created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+                if created >= twelve_months_ago:
+                    yearly_amounts.append(float(invoice.get('total_amount', 0)))
+                    if oldest_in_window is None or created < oldest_in_window:
+                        oldest_in_window = created
+            
+            if invoice.get('closed_at') is None:
+                unpaid_count += 1
+                if invoice.get('appointment'):
+                    appointment_id = invoice['appointment']['links']['self'].split('/')[-1]
+                    if did_not_arrive_by_id.get(appointment_id):
+                        open_dna_count += 1
+        
+        return {
+            'future_count': future_count,
+            'consecutive_streak': consecutive_streak,
+            'cancellation_count': cancellation_count,
+            'dna_count': dna_count,
+            # Summed in invoice order, as before, so totals match to the cent
+            'yearly_spend': sum(yearly_amounts),
+            'unpaid_count': unpaid_count,
+            'open_dna_count': open_dna_count,
+            'valid_until': BehavioralProcessor.earliest(
+                next_future_start,
+                oldest_in_window + timedelta(days=365) if oldest_in_window else None
+            ),
+        }
+    
+    @staticmethod
+    def earliest(*times):
+        """
+        Earliest of the given aware datetimes (None entries ignored), as ISO text
+        
+        Features only change with time when an appointment passes, an invoice
+        leaves the 12-month window or the patient's age changes; valid_until
+        is the first of those moments, or None if there is none to come.
+        """
+        times = [moment if isinstance(moment, datetime) else datetime.fromisoformat(moment)
+                 for moment in times if moment]
+        return min(times).isoformat() if times else None
+    
+    @staticmethod
+    def letter_grade(total_score):
+        """Letter grade for a total score"""
+        for minimum, grade in GRADE_THRESHOLDS:
+            if total_score >= minimum:
+                return grade
+        return 'F'
+    
+    @staticmethod
+    def batch_features(behavior_data):
+        """
+        Scoring inputs of one patient, keyed by BATCH_COLUMNS
+        
+        :param behavior_data: behavior_data from process_patient_behavior
+        :return: Dictionary of the patient's score_batch inputs
+        """
+        return {
+            'future_appointments': behavior_data['future_appointments']['count'],
+            'age': behavior_data['age_demographics']['age'],
+            'yearly_spend': behavior_data['yearly_spend']['amount'],
+            'consecutive_streak': behavior_data['consecutive_attendance']['streak'],
+            'referral_count': behavior_data['referrer_score']['count'],
+            'cancellation_count': behavior_data['cancellations']['count'],
+            'dna_count': behavior_data['dna']['count'],
+            'unpaid_count': behavior_data['unpaid_invoices']['count'],
+            'has_open_dna': behavior_data['open_dna_invoices']['has_open_dna'],
+            'likability': behavior_data['likability']['score'],
+        }
+    
+    @staticmethod
+    def feature_row(features, likability=0):
+        """
+        Scoring inputs of one patient from stored features, keyed by BATCH_COLUMNS
+        
+        :param features: Dictionary from extract_features()
+        :param likability: The patient's saved likability
+        :return: Dictionary of the patient's score_batch inputs
+        """
+        return {
+            'future_appointments': features['future_count'],
+            'age': features['age'],
+            'yearly_spend': features['yearly_spend'],
+            'consecutive_streak': features['consecutive_streak'],
+            'referral_count': features['referral_count'],
+            'cancellation_count': features['cancellation_count'],
+            'dna_count': features['dna_count'],
+            'unpaid_count': features['unpaid_count'],
+            'has_open_dna': features['open_dna_count'] > 0,
+            'likability': likability,
+        }
+    
+    @staticmethod
+    def score_batch(columns, plan):
+        """
+        Score a whole cohort from column arrays in one pass
+        
+        Gives exactly the points, totals and grades process_patient_behavior
+        would for the same inputs. Uses NumPy when installed, otherwise a
+        plain Python loop over the same plan.
+        
+        :param columns: Dictionary of equal-length sequences keyed by BATCH_COLUMNS
+        :param plan: Compiled ScoringPlan
+        :return: Dictionary with 'points' (list per category), 'total_score'
+                 and 'letter_grade' lists, in input order
+        """
+        if np is not None:
+            return BehavioralProcessor._score_batch_numpy(columns, plan)
+        return BehavioralProcessor._score_batch_python(columns, plan)
+    
+    @staticmethod
+    def _score_batch_python(columns, plan):
+        rows = zip(*(columns[column] for column in BATCH_COLUMNS))
+        points = {category: [] for category in SCORE_CATEGORIES}
+        totals = []
+        grades = []
+        
+        for (future, age, spend, streak, referrals, cancellations, dnas, unpaid, open_dna, likability) in rows:
+            patient_points = {
+                'future_appointments': plan.future_appointments_weight if future > 0 else 0,
+                'age_demographics': plan.age_points(age)[0],
+                'yearly_spend': plan.spend_points(spend),
+                'consecutive_attendance': min(streak * plan.points_per_consecutive_attendance, plan.consecutive_attendance_weight),
+                'referrer_score': min(referrals * plan.points_per_referral, plan.referrer_score_weight),
+                'open_dna_invoices': -plan.open_dna_invoice_weight if open_dna else 0,
+                'unpaid_invoices': -min(plan.points_per_unpaid_invoice * unpaid, plan.unpaid_invoices_weight),
+                'cancellations': -min(plan.points_per_cancellation * cancellations, plan.cancellations_weight),
+                'dna': -min(plan.points_per_dna * dnas, plan.dna_weight),
+                'likability': likability,
+            }
+            for category, value in patient_points.items():
+                points[category].append(value)
+            total = round(sum(patient_points.values()))
+            totals.append(total)
+            grades.append(BehavioralProcessor.letter_grade(total))
+        
+        return {'points': points, 'total_score': totals, 'letter_grade': grades}
+    
+    @staticmethod
+    def _score_batch_numpy(columns, plan):
+        def column(name, dtype=np.int64):
+            return np.asarray(columns[name], dtype=dtype)
+        
+        age = column('age')
+        spend = column('yearly_spend', np.float64)
+        
+        # Ages inside the lookup table index it directly; the rare rest scan the brackets
+        age_table = np.array([points for points, _ in plan.age_table] or [0], dtype=np.int64)
+        in_table = (age >= 0) & (age < len(plan.age_table))
+        age_points = np.where(in_table, age_table[np.where(in_table, age, 0)], 0)
+        for index in np.flatnonzero(~in_table):
+            age_points[index] = plan.age_points(int(age[index]))[0]
+        
+        # Spend amounts equal to an edge take that edge's points, others their gap's
+        edges = np.array(plan.spend_float_boundaries, dtype=np.float64)
+        position = np.searchsorted(edges, spend, side='left')
+        between = np.array(plan.spend_points_between, dtype=np.int64)[position]
+        if len(edges):
+            at_edge = np.array(plan.spend_points_at_float, dtype=np.int64)
+            clipped = np.minimum(position, len(edges) - 1)
+            spend_points = np.where((position < len(edges)) & (edges[clipped] == spend), at_edge[clipped], between)
+        else:
+            spend_points = between
+        
+        points = {
+            'future_appointments': np.where(column('future_appointments') > 0, plan.future_appointments_weight, 0),
+            'age_demographics': age_points,
+            'yearly_spend': spend_points,
+            'consecutive_attendance': np.minimum(column('consecutive_streak') * plan.points_per_consecutive_attendance, plan.consecutive_attendance_weight),
+            'referrer_score': np.minimum(column('referral_count') * plan.points_per_referral, plan.referrer_score_weight),
+            'open_dna_invoices': np.where(column('has_open_dna', bool), -plan.open_dna_invoice_weight, 0),
+            'unpaid_invoices': -np.minimum(plan.points_per_unpaid_invoice * column('unpaid_count'), plan.unpaid_invoices_weight),
+            'cancellations': -np.minimum(plan.points_per_cancellation * column('cancellation_count'), plan.cancellations_weight),
+            'dna': -np.minimum(plan.points_per_dna * column('dna_count'), plan.dna_weight),
+            'likability': column('likability'),
+        }
+        
+        totals = sum(points.values()) if len(age) else np.zeros(0, dtype=np.int64)
+        grade_index = np.searchsorted(
+            -np.array([minimum for minimum, _ in GRADE_THRESHOLDS]), -totals, side='left'
+        )
+        grades = np.array([grade for _, grade in GRADE_THRESHOLDS] + ['F'])[grade_index]
+        
+        return {
+            'points': {category: values.tolist() for category, values in points.items()},
+            'total_score': totals.tolist(),
+            'letter_grade': grades.tolist(),
+        }
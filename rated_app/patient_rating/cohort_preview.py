@@ -0,0 +1,150 @@
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.core.cache import cache
+
+from .behavioral_processor import BATCH_COLUMNS, BehavioralProcessor
+from .models import AnalyticsJob, Patient
+from .preset_comparison import GRADES
+from .scoring_plan import ScoringPlan
+
+# Seconds the cohort is kept in memory between previews (picks up likability edits)
+PREVIEW_CACHE_TTL = 300
+# Patients listed in a preview, biggest score change first
+PREVIEW_CHANGE_LIMIT = 100
+
+
+def draft_plan(draft: Dict, base_config) -> ScoringPlan:
+    """
+    Compile a configuration being edited without saving it
+
+    :param draft: Dictionary with optional weights ({field: value}),
+                  age_brackets ([{min_age, max_age, percentage}]) and
+                  spend_brackets ([{min_spend, max_spend, percentage}]), in
+                  display order; anything left out comes from ``base_config``
+    :param base_config: ScoringConfiguration the draft starts from
+    :return: Compiled ScoringPlan
+    """
+    weights = {field: getattr(base_config, field) for field in ScoringPlan.WEIGHT_FIELDS}
+    for field, value in (draft.get('weights') or {}).items():
+        if field in weights:
+            weights[field] = int(value)
+
+    if draft.get('age_brackets') is not None:
+        age_brackets = [
+            (int(bracket['min_age']), int(bracket['max_age']), int(bracket['percentage']))
+            for bracket in draft['age_brackets']
+        ]
+    else:
+        age_brackets = [
+            (bracket.min_age, bracket.max_age, bracket.percentage)
+            for bracket in base_config.age_brackets.all()
+        ]
+
+    if draft.get('spend_brackets') is not None:
+        spend_brackets = [
+            (Decimal(str(bracket['min_spend'])), Decimal(str(bracket['max_spend'])), int(bracket['percentage']))
+            for bracket in draft['spend_brackets']
+        ]
+    else:
+        spend_brackets = [
+            (bracket.min_spend, bracket.max_spend, bracket.percentage)
+            for bracket in base_config.spend_brackets.all()
+        ]
+
+    return ScoringPlan.from_parts(weights, age_brackets, spend_brackets)
+
+
+def cohort_version() -> str:
+    """Changes whenever an analytics run completes, so the cached cohort is replaced"""
+    latest = AnalyticsJob.objects.filter(
+        last_run_completed__isnull=False
+    ).order_by('-last_run_completed').values_list('id', 'last_run_completed').first()
+    return f"{latest[0]}:{latest[1].timestamp()}" if latest else 'none'
+
+
+def cohort_columns() -> Dict:
+    """
+    Stored features of the last analysed cohort as score_batch columns
+
+    The cohort is every patient the latest analytics run scored (or carried
+    forward) with features stored. It is read once and cached until the
+    next run completes, so previews don't touch the database.
+
+    :return: Dictionary of BATCH_COLUMNS lists plus patient_id, patient_name,
+             total_score and letter_grade (the stored score) lists, and
+             unfetched_categories - categories whose data some run skipped
+             because its presets didn't weight them
+    """
+    key = f"cohort_preview:{cohort_version()}"
+    columns = cache.get(key)
+    if columns is not None:
+        return columns
+
+    columns = {name: [] for name in BATCH_COLUMNS + ['patient_id', 'patient_name', 'total_score', 'letter_grade']}
+    unfetched = set()
+    patients = Patient.objects.filter(is_stale=False, scoring_features__isnull=False).order_by('pk').values_list(
+        'cliniko_patient_id', 'patient_name', 'total_score', 'calculated_rating', 'likability', 'scoring_features'
+    )
+    for patient_id, patient_name, total_score, letter_grade, likability, features in patients.iterator(chunk_size=2000):
+        for name, value in BehavioralProcessor.feature_row(features, likability).items():
+            columns[name].append(value)
+        columns['patient_id'].append(patient_id)
+        columns['patient_name'].append(patient_name)
+        columns['total_score'].append(total_score)
+        columns['letter_grade'].append(letter_grade)
+        unfetched.update(features.get('unfetched', ()))
+    columns['unfetched_categories'] = sorted(unfetched)
+
+    cache.set(key, columns, PREVIEW_CACHE_TTL)
+    return columns
+
+
+def preview_distribution(plan: ScoringPlan, columns: Optional[Dict] = None) -> Dict:
+    """
+    Grade distribution of the last analysed cohort under ``plan``
+
+    :param plan: Compiled draft configuration
+    :param columns: Cohort columns (defaults to cohort_columns())
+    :return: Dictionary with patients, distribution and current_distribution
+             (A+..F counts), changed (patients whose grade would change) and
+             changes - up to PREVIEW_CHANGE_LIMIT of them, biggest score
+             change first; unfetched_categories lists categories whose counts
+             are understated for some patients, so weighting them previews low
+    """
+    if columns is None:
+        columns = cohort_columns()
+    scored = BehavioralProcessor.score_batch(columns, plan)
+
+    distribution = dict.fromkeys(GRADES, 0)
+    current_distribution = dict.fromkeys(GRADES, 0)
+    changed = []
+    rows = zip(scored['letter_grade'], scored['total_score'], columns['letter_grade'], columns['total_score'])
+    for index, (grade, score, current_grade, current_score) in enumerate(rows):
+        distribution[grade] += 1
+        if current_grade in current_distribution:
+            current_distribution[current_grade] += 1
+        if grade != current_grade:
+            changed.append((abs(score - current_score), index))
+
+    changed.sort(key=lambda change: -change[0])
+    changes = [
+        {
+            'patient_id': columns['patient_id'][index],
+            'patient_name': columns['patient_name'][index],
+            'from_grade': columns['letter_grade'][index],
+            'to_grade': scored['letter_grade'][index],
+            'from_score': columns['total_score'][index],
+            'to_score': scored['total_score'][index],
+        }
+        for _, index in changed[:PREVIEW_CHANGE_LIMIT]
+    ]
+
+    return {
+        'patients': len(columns['patient_id']),
+        'distribution': distribution,
+        'current_distribution': current_distribution,
+        'changed': len(changed),
+        'changes': changes,
+        'unfetched_categories': columns.get('unfetched_categories', []),
+    }
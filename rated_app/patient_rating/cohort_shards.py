@@ -0,0 +1,261 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pytz
+from dateutil.relativedelta import relativedelta
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import AppointmentShard, Patient
+
+logger = logging.getLogger(__name__)
+
+API_FORMAT = '%Y-%m-%dT%H:%M:%S'
+# Patient IDs per name query, kept well under SQLite's parameter limit
+NAME_QUERY_CHUNK = 500
+
+
+def account_key(settings) -> str:
+    """Cache key for the API account, so switching accounts never reuses shards"""
+    return hashlib.sha1(f"{settings.base_url}|{settings.api_key}".encode()).hexdigest()
+
+
+def parse_api_time(value: str) -> datetime:
+    """Parse a UTC API timestamp, with or without the trailing Z"""
+    return datetime.fromisoformat(value.rstrip('Z')).replace(tzinfo=pytz.UTC)
+
+
+def summarise_appointments(appointments: List[Dict]) -> List[Dict]:
+    """First and last appointment per patient, in order of first appearance"""
+    patients = {}
+    for appointment in appointments:
+        link = (appointment.get('patient') or {}).get('links', {}).get('self', '')
+        if not link:
+            continue
+        patient_id = link.split('/')[-1]
+        starts_at = appointment.get('starts_at') or ''
+
+        entry = patients.get(patient_id)
+        if entry is None:
+            patients[patient_id] = {
+                'patient_id': patient_id,
+                'first_appointment': starts_at,
+                'last_appointment': starts_at,
+            }
+        elif starts_at:
+            entry['first_appointment'] = min(entry['first_appointment'] or starts_at, starts_at)
+            entry['last_appointment'] = max(entry['last_appointment'], starts_at)
+
+    return list(patients.values())
+
+
+class ShardedCohortDiscovery:
+    """
+    Cohort discovery split into calendar-month shards
+
+    Each month of the date range (in clinic timezone) is fetched as its own
+    window, several at a time. Months that ended more than the clinic's
+    shard_cache_horizon_months ago are frozen: they are fetched whole once,
+    stored as AppointmentShard rows and read from the database on every later
+    run. Only the recent months cost API calls, so a 5 year job costs about
+    the same as a short one once its history is cached.
+
+    Patient names come from the local Patient table where known; only new
+    patients are looked up in the integration.
+    """
+
+    def __init__(self, client, settings, workers: int = 1):
+        self.client = client
+        self.clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
+        self.horizon_months = settings.shard_cache_horizon_months
+        self.account_key = account_key(settings)
+        self.workers = max(1, workers)
+        self.stats = {
+            'shards': 0,
+            'cached_shards': 0,
+            'fetched_shards': 0,
+            'appointments_fetched': 0,
+            'name_lookups': 0,
+        }
+
+    def frozen_before(self) -> datetime:
+        """Months ending on or before this moment are served from the cache"""
+        local = timezone.now().astimezone(self.clinic_tz)
+        current_month = datetime(local.year, local.month, 1)
+        return self.clinic_tz.localize(current_month - relativedelta(months=self.horizon_months))
+
+    def plan(self, start_date: str, end_date: str) -> List[Dict]:
+        """
+        Month shards covering a date range, oldest first
+
+        Frozen shards span their whole month so the cached result is reusable
+        by any later range; live shards are clipped to the range.
+
+        :param start_date: Range start (UTC API timestamp)
+        :param end_date: Range end (UTC API timestamp)
+        :return: Shard dictionaries with month_start, frozen, fetch_start and fetch_end
+        """
+        start = parse_api_time(start_date)
+        end = parse_api_time(end_date)
+        frozen_before = self.frozen_before()
+
+        local = start.astimezone(self.clinic_tz)
+        month = datetime(local.year, local.month, 1)
+        shards = []
+        while True:
+            month_start = self.clinic_tz.localize(month)
+            if month_start > end:
+                break
+            month = month + relativedelta(months=1)
+            month_end = self.clinic_tz.localize(month)
+            frozen = month_end <= frozen_before
+
+            window_start = month_start if frozen else max(month_start, start)
+            window_end = month_end - timedelta(seconds=1)
+            if not frozen:
+                window_end = min(window_end, end)
+
+            shards.append({
+                'month_start': month_start,
+                'month_end': month_end,
+                'frozen': frozen,
+                'fetch_start': window_start.astimezone(pytz.UTC).strftime(API_FORMAT),
+                'fetch_end': window_end.astimezone(pytz.UTC).strftime(API_FORMAT),
+            })
+
+        return shards
+
+    def cached_shards(self, shards: List[Dict]) -> Dict[datetime, AppointmentShard]:
+        """Stored results for the frozen shards in ``shards``, by month start"""
+        months = [shard['month_start'] for shard in shards if shard['frozen']]
+        if not months:
+            return {}
+        return {
+            row.month_start: row
+            for row in AppointmentShard.objects.filter(account_key=self.account_key, month_start__in=months)
+        }
+
+    def discover(self, start_date: str, end_date: str) -> Optional[List[Dict]]:
+        """
+        Unique patients with appointments in a date range
+
+        :param start_date: Range start (UTC API timestamp)
+        :param end_date: Range end (UTC API timestamp)
+        :return: Patient dictionaries (patient_id, name, appointment_start), or
+                 None if the integration can't fetch appointment shards
+        """
+        shards = self.plan(start_date, end_date)
+        cached = self.cached_shards(shards)
+        to_fetch = [shard for shard in shards if shard['month_start'] not in cached]
+
+        fetched = self.run_parallel(
+            lambda shard: self.client.get_appointment_shard(shard['fetch_start'], shard['fetch_end']),
+            to_fetch
+        )
+        if any(appointments is None for appointments in fetched):
+            return None
+
+        summaries = {month_start: row.patients for month_start, row in cached.items()}
+        new_rows = []
+        for shard, appointments in zip(to_fetch, fetched):
+            summaries[shard['month_start']] = summarise_appointments(appointments)
+            self.stats['appointments_fetched'] += len(appointments)
+            if shard['frozen']:
+                new_rows.append(AppointmentShard(
+                    account_key=self.account_key,
+                    month_start=shard['month_start'],
+                    month_end=shard['month_end'],
+                    appointment_count=len(appointments),
+                    patients=summaries[shard['month_start']]
+                ))
+        if new_rows:
+            AppointmentShard.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+        self.stats.update(
+            shards=len(shards),
+            cached_shards=len(cached),
+            fetched_shards=len(to_fetch),
+        )
+
+        # Whole frozen months can start before the range; drop patients whose
+        # visits in that month all precede it
+        range_start = parse_api_time(start_date)
+        seen = set()
+        cohort = []
+        for shard in shards:
+            for entry in summaries[shard['month_start']]:
+                patient_id = entry['patient_id']
+                if patient_id in seen:
+                    continue
+                if shard['frozen'] and entry['last_appointment'] and parse_api_time(entry['last_appointment']) < range_start:
+                    continue
+                seen.add(patient_id)
+                cohort.append({
+                    'patient_id': patient_id,
+                    'appointment_start': entry['first_appointment'],
+                })
+
+        self.attach_names(cohort)
+        logger.info(
+            f"Cohort discovery: {self.stats['shards']} month shards "
+            f"({self.stats['cached_shards']} cached, {self.stats['fetched_shards']} fetched), "
+            f"{self.stats['name_lookups']} patient lookups"
+        )
+        return cohort
+
+    def attach_names(self, cohort: List[Dict]):
+        """Fill in patient names, looking up only patients unknown locally"""
+        names = {}
+        patient_ids = [patient['patient_id'] for patient in cohort]
+        for offset in range(0, len(patient_ids), NAME_QUERY_CHUNK):
+            names.update(
+                Patient.objects.filter(
+                    cliniko_patient_id__in=patient_ids[offset:offset + NAME_QUERY_CHUNK]
+                ).exclude(patient_name='').values_list('cliniko_patient_id', 'patient_name')
+            )
+
+        unknown = [patient for patient in cohort if patient['patient_id'] not in names]
+        self.stats['name_lookups'] = len(unknown)
+        looked_up = self.run_parallel(self.lookup_name, unknown)
+
+        for patient, name in zip(unknown, looked_up):
+            names[patient['patient_id']] = name
+        for patient in cohort:
+            patient['name'] = names[patient['patient_id']] or f"Patient {patient['patient_id']}"
+
+    def lookup_name(self, patient: Dict) -> str:
+        try:
+            patients = self.client.get_patients(filters={'id': patient['patient_id']})
+        except Exception as e:
+            logger.warning(f"Error fetching details for patient {patient['patient_id']}: {e}")
+            return ''
+        if not patients:
+            return ''
+        return f"{patients[0].get('first_name', '')} {patients[0].get('last_name', '')}".strip()
+
+    def run_parallel(self, func: Callable, items: Iterable) -> List:
+        """Map ``func`` over ``items`` on the worker pool, keeping order"""
+        items = list(items)
+        if not items:
+            return []
+
+        def run(item):
+            try:
+                return func(item)
+            finally:
+                # Pool threads open their own connections (shard rows, rate
+                # budget, job control) and are never handed a request cycle
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cohort-shard') as pool:
+            futures = [pool.submit(run, item) for item in items]
+            try:
+                return [future.result() for future in futures]
+            except BaseException:
+                # Pause/cancel or an API error - don't start the rest
+                for future in futures:
+                    future.cancel()
+                raise
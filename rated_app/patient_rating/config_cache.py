@@ -0,0 +1,127 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AgeBracket, AnalyticsJob, ConfigVersion, RatedAppSettings, ScoringConfiguration, SpendBracket
+
+# ConfigVersion row shared by every process
+VERSION_NAME = 'config'
+# Seconds between checks of the shared version (one small query each)
+VERSION_CHECK_SECONDS = 0.1
+
+
+class ConfigCache:
+    """
+    Clinic settings and active scoring configuration, kept in this process
+
+    Almost every request reads them, but they change rarely. Entries are
+    dropped when the shared ConfigVersion counter moves: saves in this process
+    bump it (and clear the entries) through model signals, and other workers
+    and the analytics process see the new version on their next check, at
+    most VERSION_CHECK_SECONDS later. The default cache backend is local to
+    each process, which is why the version lives in the database.
+
+    Cached values are shared between threads, so callers must copy anything
+    they change (the model helpers return copies).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Any] = {}
+        self._generation = 0
+        self._version = None
+        self._updated_at = None
+        self._checked = 0.0
+
+    def get(self, key: str, loader: Callable[[], Any]) -> Any:
+        """
+        The cached value for ``key``, loading it on a miss
+
+        :param key: Entry name
+        :param loader: Zero-argument call that reads the current value
+        :return: Cached or freshly loaded value
+        """
+        with self._lock:
+            self._sync()
+            if key in self._entries:
+                return self._entries[key]
+            generation = self._generation
+
+        value = loader()
+
+        # Values read inside a transaction may still be rolled back
+        if not connection.in_atomic_block:
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = value
+        return value
+
+    def stamp(self) -> Tuple[int, Optional[datetime]]:
+        """
+        The shared version and when it last changed, as of the last check
+
+        Changes with any settings, preset or bracket change, so it can
+        validate responses built from them.
+
+        :return: (version, time of the last bump or None before the first)
+        """
+        with self._lock:
+            self._sync()
+            return self._version, self._updated_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._checked = 0.0
+
+    def bump(self):
+        """Record a change for every process and drop this process's entries"""
+        changes = {'version': F('version') + 1, 'updated_at': timezone.now()}
+        bumped = ConfigVersion.objects.filter(name=VERSION_NAME).update(**changes)
+        if not bumped:
+            _, created = ConfigVersion.objects.get_or_create(name=VERSION_NAME, defaults={'version': 1})
+            if not created:
+                ConfigVersion.objects.filter(name=VERSION_NAME).update(**changes)
+
+        self.clear()
+        # Reads made before the commit could still see the old rows
+        transaction.on_commit(self.clear)
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked < VERSION_CHECK_SECONDS:
+            return
+        version, updated_at = ConfigVersion.objects.filter(name=VERSION_NAME).values_list(
+            'version', 'updated_at'
+        ).first() or (0, None)
+        if version != self._version:
+            self._entries.clear()
+            self._generation += 1
+            self._version = version
+            self._updated_at = updated_at
+        self._checked = now
+
+
+config_cache = ConfigCache()
+
+
+@receiver(post_save, sender=RatedAppSettings, dispatch_uid='config_cache_settings_saved')
+@receiver(post_delete, sender=RatedAppSettings, dispatch_uid='config_cache_settings_deleted')
+@receiver(post_save, sender=ScoringConfiguration, dispatch_uid='config_cache_config_saved')
+@receiver(post_delete, sender=ScoringConfiguration, dispatch_uid='config_cache_config_deleted')
+@receiver(post_save, sender=AgeBracket, dispatch_uid='config_cache_age_bracket_saved')
+@receiver(post_delete, sender=AgeBracket, dispatch_uid='config_cache_age_bracket_deleted')
+@receiver(post_save, sender=SpendBracket, dispatch_uid='config_cache_spend_bracket_saved')
+@receiver(post_delete, sender=SpendBracket, dispatch_uid='config_cache_spend_bracket_deleted')
+@receiver(post_delete, sender=AnalyticsJob, dispatch_uid='config_cache_job_deleted')
+def config_changed(sender, **kwargs):
+    # Deleting a job clears the settings' analytics_last_job without a save
+    config_cache.bump()
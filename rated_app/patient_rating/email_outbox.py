@@ -0,0 +1,246 @@
+import logging
+import smtplib
+import threading
+import time
+from datetime import timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from django.db import close_old_connections
+from django.db.models import Min
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import OutboxEmail, RatedAppSettings
+
+logger = logging.getLogger(__name__)
+
+DUE_STATUSES = ['pending', 'sending']
+
+
+def queue_email(subject: str, body: str, from_address: str, to_address: str, job=None) -> OutboxEmail:
+    """
+    Queue a plain-text email for the outbox sender
+
+    :param job: Optional AnalyticsJob the email reports on
+    :return: The queued OutboxEmail
+    """
+    return OutboxEmail.objects.create(
+        job=job,
+        subject=subject,
+        body=body,
+        from_address=from_address,
+        to_address=to_address
+    )
+
+
+class OutboxSender:
+    """
+    Delivers queued OutboxEmail rows over a reused SMTP connection
+
+    Each due email is claimed with a lease on next_attempt_at before it is
+    sent, so two senders never send the same email and one interrupted
+    mid-send is retried once the lease runs out. Failed sends are retried
+    with exponential backoff up to MAX_ATTEMPTS. The SMTP connection stays
+    open between emails and is closed after IDLE_TIMEOUT without mail.
+
+    Queueing an email wakes the sender in the same process immediately;
+    emails queued elsewhere are picked up within POLL_INTERVAL.
+    """
+
+    POLL_INTERVAL = 60
+    IDLE_TIMEOUT = 30
+    SMTP_TIMEOUT = 30
+    CLAIM_LEASE = 300
+    BATCH_SIZE = 20
+    MAX_ATTEMPTS = 6
+    RETRY_BASE = 60  # seconds before the first retry; doubles per attempt
+
+    _wake = threading.Event()
+    _running = threading.Event()
+
+    def __init__(self):
+        self._smtp = None
+        self._smtp_key = None
+        self._last_used = 0.0
+        self._stop = threading.Event()
+
+    @classmethod
+    def notify(cls):
+        """Wake the sender in this process to look for due email"""
+        cls._wake.set()
+
+    @classmethod
+    def is_running(cls) -> bool:
+        """Whether a sender loop is running in this process"""
+        return cls._running.is_set()
+
+    def start(self) -> threading.Thread:
+        """Run the sender loop in a daemon thread"""
+        thread = threading.Thread(target=self.run_forever, name='email-outbox', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+        self.notify()
+
+    def run_forever(self):
+        """Send due email as it is queued until stop() is called"""
+        self._running.set()
+        try:
+            while not self._stop.is_set():
+                try:
+                    while self.send_due() == self.BATCH_SIZE:
+                        pass
+                    timeout = self.seconds_until_due()
+                except Exception as e:
+                    logger.error(f"Email outbox error: {e}")
+                    timeout = self.POLL_INTERVAL
+                finally:
+                    close_old_connections()
+
+                if self._smtp:
+                    idle = time.monotonic() - self._last_used
+                    if idle >= self.IDLE_TIMEOUT:
+                        self.disconnect()
+                    else:
+                        timeout = min(timeout, self.IDLE_TIMEOUT - idle)
+
+                self._wake.wait(max(timeout, 0))
+                self._wake.clear()
+        finally:
+            self.disconnect()
+            self._running.clear()
+
+    def drain(self):
+        """Make one delivery attempt for every due email, then disconnect"""
+        try:
+            while self.send_due() == self.BATCH_SIZE:
+                pass
+        finally:
+            self.disconnect()
+
+    def seconds_until_due(self) -> float:
+        """Seconds until the next queued email is due, capped at POLL_INTERVAL"""
+        next_due = OutboxEmail.objects.filter(status__in=DUE_STATUSES).aggregate(
+            next_due=Min('next_attempt_at')
+        )['next_due']
+        if next_due is None:
+            return self.POLL_INTERVAL
+        return min(max((next_due - timezone.now()).total_seconds(), 0), self.POLL_INTERVAL)
+
+    def send_due(self) -> int:
+        """
+        Claim and send a batch of due email
+
+        :return: Number of due emails found (BATCH_SIZE means there may be more)
+        """
+        now = timezone.now()
+        due = list(
+            OutboxEmail.objects.filter(
+                status__in=DUE_STATUSES,
+                next_attempt_at__lte=now
+            ).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:self.BATCH_SIZE]
+        )
+
+        for email_id in due:
+            claimed = OutboxEmail.objects.filter(
+                id=email_id,
+                status__in=DUE_STATUSES,
+                next_attempt_at__lte=now
+            ).update(status='sending', next_attempt_at=now + timedelta(seconds=self.CLAIM_LEASE))
+            if claimed:
+                self.deliver(OutboxEmail.objects.get(id=email_id))
+
+        return len(due)
+
+    def deliver(self, email: OutboxEmail) -> bool:
+        """Send one claimed email and record the outcome"""
+        email.attempts += 1
+        try:
+            settings = RatedAppSettings.cached()
+            if not settings or not settings.smtp_username:
+                raise ValueError("Email not configured")
+
+            self.connection(settings).send_message(self.build_message(email))
+            self._last_used = time.monotonic()
+        except Exception as e:
+            # The connection may be half-open after an error; start fresh next time
+            self.disconnect()
+            self.record_failure(email, e)
+            return False
+
+        email.status = 'sent'
+        email.sent_at = timezone.now()
+        email.last_error = ''
+        email.save(update_fields=['status', 'sent_at', 'attempts', 'last_error'])
+        logger.info(f"Email '{email.subject}' sent to {email.to_address}")
+        return True
+
+    def record_failure(self, email: OutboxEmail, error: Exception):
+        email.last_error = str(error)
+        if email.attempts >= self.MAX_ATTEMPTS:
+            email.status = 'failed'
+            logger.error(f"Giving up on email '{email.subject}' after {email.attempts} attempts: {error}")
+        else:
+            email.status = 'pending'
+            delay = self.RETRY_BASE * 2 ** (email.attempts - 1)
+            email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            logger.warning(f"Failed to send email '{email.subject}' (attempt {email.attempts}), retrying in {delay}s: {error}")
+        email.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error'])
+
+    @staticmethod
+    def build_message(email: OutboxEmail) -> MIMEMultipart:
+        msg = MIMEMultipart()
+        msg['From'] = email.from_address
+        msg['To'] = email.to_address
+        msg['Subject'] = email.subject
+        msg.attach(MIMEText(email.body, 'plain'))
+        return msg
+
+    def connection(self, settings) -> smtplib.SMTP:
+        """Open SMTP connection for the clinic settings, reused while still alive"""
+        key = (
+            settings.smtp_host,
+            settings.smtp_port,
+            settings.smtp_username,
+            settings.smtp_password,
+            settings.smtp_use_tls,
+        )
+        if self._smtp and self._smtp_key == key:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        self.disconnect()
+
+        server = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=self.SMTP_TIMEOUT)
+        try:
+            if settings.smtp_use_tls:
+                server.starttls()
+            server.login(settings.smtp_username, settings.smtp_password)
+        except Exception:
+            server.close()
+            raise
+
+        self._smtp, self._smtp_key = server, key
+        return server
+
+    def disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+        self._smtp_key = None
+
+
+@receiver(post_save, sender=OutboxEmail, dispatch_uid='email_outbox_queued')
+def email_queued(sender, instance, created=False, **kwargs):
+    if created:
+        OutboxSender.notify()
@@ -0,0 +1,152 @@
+import contextvars
+from concurrent.futures import Executor
+from dataclasses import dataclass, fields
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+
+API_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Data each score category is calculated from (age and likability need none)
+CATEGORY_SOURCES = {
+    'future_appointments': ('future_appointments',),
+    'yearly_spend': ('invoices',),
+    'consecutive_attendance': ('appointment_history', 'cancelled_appointments'),
+    'referrer_score': ('referrals',),
+    'open_dna_invoices': ('appointment_history', 'cancelled_appointments', 'invoices'),
+    'unpaid_invoices': ('invoices',),
+    'cancellations': ('cancelled_appointments',),
+    'dna': ('appointment_history', 'cancelled_appointments'),
+}
+
+
+def scored_categories(plan) -> List[str]:
+    """Categories that can award points (positive or negative) under a ScoringPlan"""
+    weights = {
+        'future_appointments': plan.future_appointments_weight,
+        'yearly_spend': plan.yearly_spend_weight,
+        'consecutive_attendance': plan.consecutive_attendance_weight and plan.points_per_consecutive_attendance,
+        'referrer_score': plan.referrer_score_weight and plan.points_per_referral,
+        'open_dna_invoices': plan.open_dna_invoice_weight,
+        'unpaid_invoices': plan.unpaid_invoices_weight and plan.points_per_unpaid_invoice,
+        'cancellations': plan.cancellations_weight and plan.points_per_cancellation,
+        'dna': plan.dna_weight and plan.points_per_dna,
+    }
+    return [category for category, weight in weights.items() if weight]
+
+
+@dataclass(frozen=True)
+class FetchPlan:
+    """
+    Which patient records to request for scoring
+
+    Built from the scoring plans a run uses, so data no weighted category
+    reads is never requested:
+
+    - appointment_history: every active appointment, past and future
+    - future_appointments: active and cancelled appointments from now on
+      (implied by the two full-history sources)
+    - cancelled_appointments: every cancelled appointment
+    - invoices: every invoice (one page covers most patients, so windowing
+      by date would usually cost an extra request for open invoices)
+    - referrals: patients referred by the patient
+
+    Scores are exactly those of a full fetch; only the counts of categories
+    in unfetched_categories() (which score 0) may be lower.
+    """
+
+    appointment_history: bool = True
+    future_appointments: bool = True
+    cancelled_appointments: bool = True
+    invoices: bool = True
+    referrals: bool = True
+
+    @classmethod
+    def full(cls) -> 'FetchPlan':
+        """Everything any category needs, for features rescored under other weights"""
+        return cls()
+
+    @classmethod
+    def for_plans(cls, plans: Iterable) -> 'FetchPlan':
+        """Smallest fetch that scores every one of ``plans`` exactly"""
+        sources = {
+            source
+            for plan in plans
+            for category in scored_categories(plan)
+            for source in CATEGORY_SOURCES[category]
+        }
+        return cls(**{field.name: field.name in sources for field in fields(cls)})
+
+    def unfetched_categories(self) -> List[str]:
+        """Categories whose counts this plan doesn't fetch the data for"""
+        return [
+            category for category, sources in CATEGORY_SOURCES.items()
+            if not all(self.covers(source) for source in sources)
+        ]
+
+    def covers(self, source: str) -> bool:
+        if source == 'future_appointments':
+            return self.future_appointments or (self.appointment_history and self.cancelled_appointments)
+        return getattr(self, source)
+
+    def requests(self, client, patient_id: str, now: Optional[datetime] = None) -> List[Tuple[str, Callable]]:
+        """
+        The planned requests for one patient, without making them
+
+        :param client: Integration client
+        :param patient_id: Patient to fetch
+        :param now: Reference time for future-only appointments (defaults to the current time)
+        :return: (result key, zero-argument call) pairs in result order
+        """
+        now = now or datetime.now(pytz.UTC)
+        from_now = now.astimezone(pytz.UTC).strftime(API_FORMAT)
+
+        calls = []
+        if self.appointment_history:
+            calls.append(('appointments', partial(client.get_appointments, patient_id, include_cancelled=False)))
+        elif self.future_appointments:
+            calls.append(('appointments', partial(
+                client.get_appointments, patient_id, start_date=from_now, include_cancelled=False
+            )))
+
+        if self.cancelled_appointments:
+            calls.append(('appointments', partial(client.get_cancelled_appointments, patient_id)))
+        elif self.future_appointments:
+            calls.append(('appointments', partial(client.get_cancelled_appointments, patient_id, start_date=from_now)))
+
+        if self.invoices:
+            calls.append(('invoices', partial(client.get_invoices, patient_id)))
+        if self.referrals:
+            calls.append(('referral_data', partial(client.get_referrals, patient_id)))
+        return calls
+
+    def fetch(self, client, patient_id: str, now: Optional[datetime] = None, pool: Optional[Executor] = None) -> Dict:
+        """
+        Request the planned records for one patient
+
+        Appointments come back active first, then cancelled, as get_appointments
+        returns them.
+
+        :param client: Integration client
+        :param patient_id: Patient to fetch
+        :param now: Reference time for future-only appointments (defaults to the current time)
+        :param pool: Executor to make the requests concurrently on (serially if omitted)
+        :return: Dictionary with appointments, invoices and referral_data
+        """
+        calls = self.requests(client, patient_id, now)
+        if pool is None:
+            results = [call() for _, call in calls]
+        else:
+            # Each call runs in a copy of this context, so request metrics follow it
+            futures = [pool.submit(contextvars.copy_context().run, call) for _, call in calls]
+            results = [future.result() for future in futures]
+
+        records = {'appointments': [], 'invoices': [], 'referral_data': {}}
+        for (key, _), result in zip(calls, results):
+            if key == 'appointments':
+                records[key] += result
+            else:
+                records[key] = result
+        return records
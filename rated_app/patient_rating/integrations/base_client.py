@@ -1,8 +1,18 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
+import threading
+import time
+
+import requests
+
+from ..request_metrics import record_api_call
+from .rate_budget import RateBudget, INTERACTIVE
 
 class BaseClient(ABC):
+    # (connect, read) seconds - no outbound call may hang a worker indefinitely
+    REQUEST_TIMEOUT = (5, 30)
+
     def __init__(self, settings):
         """
         Initialize client with software-specific settings
@@ -12,6 +22,75 @@ class BaseClient(ABC):
         self.settings = settings
         self.base_url = settings.base_url
         self.api_key = settings.api_key
+        # Optional JobControl attached by analytics jobs for pause/cancel
+        self.control = None
+        # Rate budget lane; analytics jobs switch their client to BACKGROUND
+        self.lane = INTERACTIVE
+        # Outbound requests made through this client (analytics stages share it)
+        self.requests_made = 0
+        self._requests_lock = threading.Lock()
+
+    def rate_budget(self) -> RateBudget:
+        """
+        Shared per-account request budget for this client
+        
+        :return: RateBudget sized from get_rate_limits() and the clinic's
+                 interactive reserve setting
+        """
+        return RateBudget.for_account(
+            f"{self.base_url}|{self.api_key}",
+            self.get_rate_limits().get('requests_per_minute', 200),
+            getattr(self.settings, 'interactive_rate_share', 25)
+        )
+
+    def request_timeout(self) -> Tuple[int, int]:
+        """
+        Reserve rate budget for the next outbound API request and return its timeout
+        
+        Blocks until the request fits this client's lane of the shared rate
+        budget. If a job control is attached, raises JobInterrupted instead when
+        pause or cancel has been requested, so no new request is started.
+        
+        :return: (connect, read) timeout in seconds
+        """
+        check = self.control.check if self.control else None
+        if check:
+            check()
+        self.rate_budget().acquire(self.lane, check=check)
+        with self._requests_lock:
+            self.requests_made += 1
+        return self.REQUEST_TIMEOUT
+
+    def send(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Make one outbound API request within the rate budget
+        
+        The time it takes is counted towards the current web request's
+        metrics (see request_metrics).
+        
+        :param method: HTTP method
+        :param url: Request URL
+        :param kwargs: Further arguments for requests.request (headers, params, json)
+        :return: Response
+        """
+        timeout = self.request_timeout()
+        started = time.perf_counter()
+        try:
+            return requests.request(method, url, timeout=timeout, **kwargs)
+        finally:
+            record_api_call(time.perf_counter() - started)
+
+    def pause(self, seconds: float):
+        """
+        Rate-limit delay that is cut short by pause or cancel requests
+        
+        :param seconds: Delay in seconds
+        """
+        if self.control:
+            if self.control.wait(seconds):
+                self.control.check()
+        else:
+            time.sleep(seconds)
 
     @abstractmethod
     def get_patients(
@@ -52,7 +131,8 @@ class BaseClient(ABC):
         self, 
         patient_id: str, 
         start_date: Optional[str] = None, 
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        include_cancelled: bool = True
     ) -> List[Dict]:
         """
         Retrieve appointments for a specific patient
@@ -60,10 +140,30 @@ class BaseClient(ABC):
         :param patient_id: Unique identifier for the patient
         :param start_date: Optional start date for filtering
         :param end_date: Optional end date for filtering
+        :param include_cancelled: Also return the patient's cancelled appointments
         :return: List of appointment data
         """
         pass
 
+    def get_cancelled_appointments(
+        self,
+        patient_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retrieve cancelled appointments for a specific patient
+        
+        :param patient_id: Unique identifier for the patient
+        :param start_date: Optional start date for filtering
+        :param end_date: Optional end date for filtering
+        :return: List of cancelled appointment data
+        """
+        return [
+            appointment for appointment in self.get_appointments(patient_id, start_date, end_date)
+            if appointment.get('cancelled_at')
+        ]
+
     @abstractmethod
     def get_invoices(
         self, 
@@ -167,6 +267,52 @@ class BaseClient(ABC):
         """
         pass
     
+    def sample_appointments_in_range(
+        self,
+        start_date: str,
+        end_date: str
+    ) -> Optional[Tuple[int, List[Dict]]]:
+        """
+        Get the first page of appointments in a date range and the total count
+        
+        Used to estimate an analytics run without fetching the whole range.
+        
+        :param start_date: Start date in ISO format (UTC)
+        :param end_date: End date in ISO format (UTC)
+        :return: (total appointments, first page), or None if unsupported
+        """
+        return None
+    
+    def get_appointment_shard(
+        self,
+        start_date: str,
+        end_date: str
+    ) -> Optional[List[Dict]]:
+        """
+        Get every appointment in one window of a sharded cohort discovery
+        
+        Unlike get_appointments_by_date_range this raises on API errors, so an
+        incomplete window is never cached as if it were complete.
+        
+        :param start_date: Start date in ISO format (UTC)
+        :param end_date: End date in ISO format (UTC)
+        :return: Appointments in the window, or None if unsupported
+        """
+        return None
+    
+    def get_patient_changes_since(self, since: str) -> Optional[Dict[str, str]]:
+        """
+        Get the latest update time per patient for records changed since a cut-off
+        
+        Covers patient, appointment, invoice and referral records. Integrations
+        without a change feed return None, which makes incremental analytics
+        rescore every patient.
+        
+        :param since: Cut-off in ISO format (UTC)
+        :return: Mapping of patient ID to latest updated_at, or None if unsupported
+        """
+        return None
+
     @abstractmethod
     def get_rate_limits(self) -> Dict[str, Any]:
         """
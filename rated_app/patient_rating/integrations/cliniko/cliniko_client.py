@@ -1,3 +1,4 @@
+import logging
 import requests
 import pytz
 import time
@@ -8,6 +9,8 @@ from typing import Dict, Any, List, Optional, Tuple
 from ..base_client import BaseClient
 from ...software_integrations import AuthenticationHandler
 
+logger = logging.getLogger(__name__)
+
 class ClinikoClient(BaseClient):
     def get_patients(
             self, 
@@ -35,7 +38,8 @@ class ClinikoClient(BaseClient):
                     params['q[]'] = f'id:={filters["id"]}'
             
             # Make API request
-            response = requests.get(
+            response = self.send(
+                'GET',
                 f"{self.base_url}patients", 
                 headers=AuthenticationHandler.get_headers(self.settings), 
                 params=params
@@ -56,17 +60,21 @@ class ClinikoClient(BaseClient):
             return raw_patients
         
         except requests.RequestException as e:
-            print(f"Cliniko patient retrieval error: {e}")
+            logger.error(f"Cliniko patient retrieval error: {e}")
             return []
 
     def get_appointments(
         self, 
         patient_id: str, 
         start_date: Optional[str] = None, 
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        include_cancelled: bool = True
     ) -> List[Dict]:
         """
         Retrieve appointments for a specific patient
+        
+        Cancelled appointments are included from the patient's whole history
+        regardless of the date filters.
         """
         try:
             # Prepare filters
@@ -84,36 +92,59 @@ class ClinikoClient(BaseClient):
                 filter_params, 
                 f'appointments for patient {patient_id}'
             )
+            self._convert_appointment_times(active_appointments)
             
-            # Retrieve cancelled appointments
+            if not include_cancelled:
+                return active_appointments
+            
+            return active_appointments + self.get_cancelled_appointments(patient_id)
+        
+        except Exception as e:
+            logger.error(f"Cliniko appointments retrieval error: {e}")
+            return []
+
+    def get_cancelled_appointments(
+        self,
+        patient_id: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retrieve cancelled appointments for a specific patient
+        """
+        try:
             cancelled_filter_params = {
                 'q[]': [
                     f'patient_id:={patient_id}', 
                     'cancelled_at:?'
                 ]
             }
+            if start_date:
+                cancelled_filter_params['q[]'].append(f'starts_at:>={start_date}')
+            if end_date:
+                cancelled_filter_params['q[]'].append(f'starts_at:<={end_date}')
+            
             cancelled_appointments = self._get_paginated_data(
                 'individual_appointments', 
                 cancelled_filter_params, 
                 f'cancelled appointments for patient {patient_id}'
             )
-            
-            # Combine and convert timestamps
-            all_appointments = active_appointments + cancelled_appointments
-            for appointment in all_appointments:
-                if 'starts_at' in appointment:
-                    appointment['starts_at'] = self._convert_timestamp(appointment['starts_at'])
-                if 'ends_at' in appointment:
-                    appointment['ends_at'] = self._convert_timestamp(appointment['ends_at'])
-                if 'cancelled_at' in appointment and appointment['cancelled_at']:
-                    appointment['cancelled_at'] = self._convert_timestamp(appointment['cancelled_at'])
-            
-            return all_appointments
+            self._convert_appointment_times(cancelled_appointments)
+            return cancelled_appointments
         
         except Exception as e:
-            print(f"Cliniko appointments retrieval error: {e}")
+            logger.error(f"Cliniko cancelled appointments retrieval error: {e}")
             return []
 
+    def _convert_appointment_times(self, appointments: List[Dict]):
+        for appointment in appointments:
+            if 'starts_at' in appointment:
+                appointment['starts_at'] = self._convert_timestamp(appointment['starts_at'])
+            if 'ends_at' in appointment:
+                appointment['ends_at'] = self._convert_timestamp(appointment['ends_at'])
+            if 'cancelled_at' in appointment and appointment['cancelled_at']:
+                appointment['cancelled_at'] = self._convert_timestamp(appointment['cancelled_at'])
+
     def get_invoices(
         self, 
         patient_id: str, 
@@ -152,7 +183,7 @@ class ClinikoClient(BaseClient):
             return invoices
         
         except Exception as e:
-            print(f"Cliniko invoices retrieval error: {e}")
+            logger.error(f"Cliniko invoices retrieval error: {e}")
             return []
 
     def get_referrals(self, patient_id: str) -> List[Dict]:
@@ -185,7 +216,7 @@ class ClinikoClient(BaseClient):
             }
         
         except Exception as e:
-            print(f"Cliniko referrals retrieval error: {e}")
+            logger.error(f"Cliniko referrals retrieval error: {e}")
             return {'referral_count': 0, 'referred_patient_ids': []}
 
     def search_patients(
@@ -211,7 +242,8 @@ class ClinikoClient(BaseClient):
             }
             
             # Make API request
-            response = requests.get(
+            response = self.send(
+                'GET',
                 f"{self.base_url}patients", 
                 headers=AuthenticationHandler.get_headers(self.settings), 
                 params=params
@@ -261,7 +293,7 @@ class ClinikoClient(BaseClient):
             return filtered_patients
         
         except requests.RequestException as e:
-            print(f"Patient search error: {e}")
+            logger.error(f"Patient search error: {e}")
             return []
 
     def validate_connection(self) -> bool:
@@ -270,9 +302,17 @@ class ClinikoClient(BaseClient):
         """
         return AuthenticationHandler.validate_credentials(self.settings)
 
-    def _get_paginated_data(self, endpoint: str, params: Dict, description: str) -> List[Dict]:
+    def _get_paginated_data(
+        self,
+        endpoint: str,
+        params: Dict,
+        description: str,
+        raise_errors: bool = False
+    ) -> List[Dict]:
         """
         Get all paginated data from Cliniko API
+        
+        :param raise_errors: Raise on API errors instead of returning partial data
         """
         all_data = []
         page = 1
@@ -285,14 +325,17 @@ class ClinikoClient(BaseClient):
             url = f"{self.base_url}{endpoint}"
             
             try:
-                response = requests.get(
+                response = self.send(
+                    'GET',
                     url, 
                     headers=AuthenticationHandler.get_headers(self.settings), 
                     params=current_params
                 )
                 
                 if response.status_code != 200:
-                    print(f"❌ Cliniko API Error {response.status_code}: {response.text}")
+                    logger.error(f"❌ Cliniko API Error {response.status_code}: {response.text}")
+                    if raise_errors:
+                        response.raise_for_status()
                     break
                 
                 data = response.json()
@@ -318,7 +361,9 @@ class ClinikoClient(BaseClient):
                 page += 1
             
             except Exception as e:
-                print(f"Cliniko data retrieval error: {e}")
+                logger.error(f"Cliniko data retrieval error: {e}")
+                if raise_errors:
+                    raise
                 break
         
         return all_data
@@ -338,7 +383,7 @@ class ClinikoClient(BaseClient):
             
             return converted_time.isoformat()
         except Exception as e:
-            print(f"Timestamp conversion error: {e}")
+            logger.error(f"Timestamp conversion error: {e}")
             return timestamp_str
 
     def get_appointments_by_date_range(
@@ -377,9 +422,61 @@ class ClinikoClient(BaseClient):
             return appointments
             
         except Exception as e:
-            print(f"Error fetching appointments by date range: {e}")
+            logger.error(f"Error fetching appointments by date range: {e}")
             return []
     
+    def sample_appointments_in_range(
+        self,
+        start_date: str,
+        end_date: str
+    ) -> Optional[Tuple[int, List[Dict]]]:
+        """
+        Get the first page of appointments in a date range and Cliniko's total_entries
+        """
+        try:
+            response = self.send(
+                'GET',
+                f"{self.base_url}individual_appointments",
+                headers=AuthenticationHandler.get_headers(self.settings),
+                params={
+                    'q[]': [
+                        f"starts_at:>={start_date.rstrip('Z')}Z",
+                        f"starts_at:<={end_date.rstrip('Z')}Z"
+                    ],
+                    'page': 1,
+                    'per_page': 100
+                }
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            appointments = data.get('individual_appointments', [])
+            return data.get('total_entries', len(appointments)), appointments
+            
+        except requests.RequestException as e:
+            logger.error(f"Error sampling appointments by date range: {e}")
+            return None
+    
+    def get_appointment_shard(
+        self,
+        start_date: str,
+        end_date: str
+    ) -> Optional[List[Dict]]:
+        """
+        Get every appointment in one cohort discovery window, raising on API errors
+        """
+        return self._get_paginated_data(
+            'individual_appointments',
+            {
+                'q[]': [
+                    f"starts_at:>={start_date.rstrip('Z')}Z",
+                    f"starts_at:<={end_date.rstrip('Z')}Z"
+                ]
+            },
+            f'appointment shard {start_date} to {end_date}',
+            raise_errors=True
+        )
+    
     def update_appointment_notes(
         self, 
         appointment_id: str, 
@@ -390,20 +487,35 @@ class ClinikoClient(BaseClient):
         Update appointment notes in Cliniko
         Note: Cliniko uses 'notes' field on appointments
         """
+        return self.write_appointment_notes(appointment_id, notes, append) is not None
+    
+    def write_appointment_notes(
+        self,
+        appointment_id: str,
+        notes: str,
+        append: bool = True
+    ) -> Optional[Dict]:
+        """
+        Update appointment notes in Cliniko, skipping the PUT if they would not change
+        
+        :return: The appointment as it now stands (the PUT response, or the
+                 unchanged appointment), or None if it could not be updated
+        """
         try:
             # First, get current appointment to preserve existing notes if appending
             url = f"{self.base_url}appointments/{appointment_id}"
-            response = requests.get(
+            response = self.send(
+                'GET',
                 url,
                 headers=AuthenticationHandler.get_headers(self.settings)
             )
             
             if response.status_code != 200:
-                print(f"Failed to get appointment {appointment_id}: {response.status_code}")
-                return False
+                logger.error(f"Failed to get appointment {appointment_id}: {response.status_code}")
+                return None
             
             appointment = response.json()
-            current_notes = appointment.get('notes', '')
+            current_notes = appointment.get('notes') or ''
             
             if append and current_notes:
                 # Remove any existing rating (pattern: Rated [A-F+])
@@ -413,22 +525,33 @@ class ClinikoClient(BaseClient):
             else:
                 new_notes = notes
             
+            if new_notes == current_notes:
+                # Same rating as last time - a PUT would only bump updated_at
+                return appointment
+            
             # Update appointment with new notes
             update_data = {
                 'notes': new_notes
             }
             
-            response = requests.put(
+            response = self.send(
+                'PUT',
                 url,
                 headers=AuthenticationHandler.get_headers(self.settings),
                 json=update_data
             )
             
-            return response.status_code == 200
+            if response.status_code != 200:
+                return None
+            try:
+                return response.json()
+            except ValueError:
+                # Updated, but no body to read the new updated_at from
+                return {**appointment, 'notes': new_notes, 'updated_at': datetime.now(pytz.utc).isoformat()}
             
         except Exception as e:
-            print(f"Error updating appointment notes: {e}")
-            return False
+            logger.error(f"Error updating appointment notes: {e}")
+            return None
     
     def batch_get_patients(
         self, 
@@ -453,15 +576,15 @@ class ClinikoClient(BaseClient):
                         patients.extend(patient_data)
                     
                     # Small delay between requests
-                    time.sleep(0.3)
+                    self.pause(0.3)
                     
                 except Exception as e:
-                    print(f"Error fetching patient {patient_id}: {e}")
+                    logger.error(f"Error fetching patient {patient_id}: {e}")
                     continue
             
             # Longer pause between chunks
             if i + chunk_size < len(patient_ids):
-                time.sleep(2)
+                self.pause(2)
         
         return patients
     
@@ -508,18 +631,69 @@ class ClinikoClient(BaseClient):
                         patient_info['email'] = patient.get('email')
                     
                     # Rate limiting
-                    time.sleep(0.5)
+                    self.pause(0.5)
                     
                 except Exception as e:
-                    print(f"Error fetching details for patient {patient_info['patient_id']}: {e}")
+                    logger.error(f"Error fetching details for patient {patient_info['patient_id']}: {e}")
                     patient_info['name'] = f"Patient {patient_info['patient_id']}"
             
             return patient_details
             
         except Exception as e:
-            print(f"Error getting patients with appointments: {e}")
+            logger.error(f"Error getting patients with appointments: {e}")
             return []
     
+    def get_patient_changes_since(self, since: str) -> Optional[Dict[str, str]]:
+        """
+        Get the latest update time per patient for records changed since a cut-off
+        
+        One filtered scan per endpoint instead of refetching every patient.
+        Returns None if any scan fails, so no change is silently missed.
+        """
+        if not since.endswith('Z'):
+            since = f"{since}Z"
+        
+        changed = {'q[]': [f'updated_at:>{since}']}
+        changed_cancelled = {'q[]': [f'updated_at:>{since}', 'cancelled_at:?']}
+        
+        scans = [
+            ('patients', changed, lambda record: record.get('id')),
+            ('individual_appointments', changed, lambda record: self._linked_id(record, 'patient')),
+            ('individual_appointments', changed_cancelled, lambda record: self._linked_id(record, 'patient')),
+            ('invoices', changed, lambda record: self._linked_id(record, 'patient')),
+            ('referral_sources', changed, lambda record: self._linked_id(record, 'referrer')),
+        ]
+        
+        latest = {}
+        try:
+            for endpoint, params, patient_of in scans:
+                records = self._get_paginated_data(
+                    endpoint,
+                    params,
+                    f'{endpoint} changed since {since}',
+                    raise_errors=True
+                )
+                for record in records:
+                    patient_id = patient_of(record)
+                    updated_at = record.get('updated_at')
+                    if not patient_id or not updated_at:
+                        continue
+                    patient_id = str(patient_id)
+                    updated_at = datetime.fromisoformat(updated_at.replace('Z', '+00:00'))
+                    if patient_id not in latest or updated_at > latest[patient_id]:
+                        latest[patient_id] = updated_at
+        except Exception as e:
+            logger.error(f"Cliniko change feed error: {e}")
+            return None
+        
+        return {patient_id: updated_at.isoformat() for patient_id, updated_at in latest.items()}
+    
+    @staticmethod
+    def _linked_id(record: Dict, relation: str) -> Optional[str]:
+        """Extract the ID from a Cliniko ``{relation: {links: {self: ...}}}`` link"""
+        link = (record.get(relation) or {}).get('links', {}).get('self', '')
+        return link.split('/')[-1] if link else None
+    
     def get_rate_limits(self) -> Dict[str, Any]:
         """
         Return Cliniko's rate limit information
@@ -536,18 +710,21 @@ class ClinikoClient(BaseClient):
         self,
         patient_id: str,
         rating_text: str
-    ) -> bool:
+    ) -> Optional[Dict]:
         """
         Update the most recent appointment notes for a patient
         Used by analytics processing
+        
+        :return: The appointment after the update (its updated_at is part of
+                 the analytics fingerprint), or None if nothing was updated
         """
         try:
             # Get patient's most recent appointment
             appointments = self.get_appointments(patient_id)
             
             if not appointments:
-                print(f"No appointments found for patient {patient_id}")
-                return False
+                logger.debug(f"No appointments found for patient {patient_id}")
+                return None
             
             # Sort by start time and get most recent
             sorted_appointments = sorted(
@@ -560,12 +737,12 @@ class ClinikoClient(BaseClient):
             appointment_id = most_recent.get('id')
             
             if not appointment_id:
-                print(f"No appointment ID found for patient {patient_id}")
-                return False
+                logger.debug(f"No appointment ID found for patient {patient_id}")
+                return None
             
             # Update the appointment notes
-            return self.update_appointment_notes(appointment_id, rating_text, append=True)
+            return self.write_appointment_notes(appointment_id, rating_text, append=True)
             
         except Exception as e:
-            print(f"Error updating patient appointment notes: {e}")
-            return False
+            logger.error(f"Error updating patient appointment notes: {e}")
+            return None
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.db import DatabaseError
+from django.utils import timezone
+
+from ..models import ApiDemand
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+
+class RateBudget:
+    """
+    Shared requests-per-minute budget for one API account
+
+    Requests are split into two lanes over a sliding 60 second window:
+
+    - interactive (dashboard lookups, patient search) may use the whole budget
+    - background (analytics jobs) is held to the budget minus a reserved share
+      for interactive calls
+
+    While the interactive lane has been idle for a full window, background work
+    borrows half of the reserve; the other half stays free so the first lookups
+    after a quiet spell are never queued. As soon as an interactive call is
+    waiting or has run in the window, background requests stop until the window
+    drains back under their limit, so front desk lookups are not queued behind
+    a job's backlog.
+
+    One budget is shared by every client in the process using the same API key.
+    Other processes have their own windows, so interactive demand is also
+    recorded in ApiDemand: background work only borrows when no process has
+    made an interactive request for the account in the last window (as of the
+    last check, at most SHARED_CHECK_INTERVAL old).
+    """
+
+    WINDOW = 60.0
+    # Longest single wait, so an attached job control is re-checked regularly
+    CHECK_INTERVAL = 1.0
+    # Seconds between reads and writes of the shared ApiDemand row
+    SHARED_CHECK_INTERVAL = 5.0
+
+    _budgets = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, capacity: int, interactive_share: int, account_key: str = ''):
+        self._cond = threading.Condition()
+        self._sent = deque()  # (monotonic time, lane) of requests in the window
+        self._interactive_sent = 0
+        self._interactive_waiting = 0
+        self._account = hashlib.sha256(account_key.encode()).hexdigest()
+        self._demand_noted = -math.inf
+        self._demand_checked = -math.inf
+        self._demand_elsewhere = True
+        self.configure(capacity, interactive_share)
+
+    @classmethod
+    def for_account(cls, account_key: str, capacity: int, interactive_share: int) -> 'RateBudget':
+        """
+        Get the process-wide budget for an API account
+
+        :param account_key: Identifies the upstream account (e.g. the API key)
+        :param capacity: Requests allowed per minute
+        :param interactive_share: Percentage of capacity reserved for interactive calls
+        :return: Shared RateBudget
+        """
+        with cls._registry_lock:
+            budget = cls._budgets.get(account_key)
+            if budget is None:
+                budget = cls._budgets[account_key] = cls(capacity, interactive_share, account_key)
+            else:
+                budget.configure(capacity, interactive_share)
+            return budget
+
+    def configure(self, capacity: int, interactive_share: int):
+        """Update capacity and interactive reserve (keeps the current window)"""
+        with self._cond:
+            self.capacity = max(1, capacity)
+            share = min(max(interactive_share, 0), 100)
+            self.reserve = min(self.capacity - 1, math.ceil(self.capacity * share / 100))
+            self._cond.notify_all()
+
+    def _expire(self, now: float):
+        while self._sent and now - self._sent[0][0] >= self.WINDOW:
+            _, lane = self._sent.popleft()
+            if lane == INTERACTIVE:
+                self._interactive_sent -= 1
+
+    def _note_demand(self):
+        """Tell other processes an interactive request is being made"""
+        now = time.monotonic()
+        with self._cond:
+            if now - self._demand_noted < self.SHARED_CHECK_INTERVAL:
+                return
+            self._demand_noted = now
+        try:
+            ApiDemand.objects.update_or_create(account=self._account, defaults={'interactive_at': timezone.now()})
+        except DatabaseError as e:
+            logger.warning(f"Could not record interactive API demand: {e}")
+
+    def _check_demand(self):
+        """Refresh whether another process has made interactive requests in the window"""
+        now = time.monotonic()
+        with self._cond:
+            if now - self._demand_checked < self.SHARED_CHECK_INTERVAL:
+                return
+            self._demand_checked = now
+        try:
+            last = ApiDemand.objects.filter(account=self._account).values_list('interactive_at', flat=True).first()
+            # Allow for the writer only noting demand every SHARED_CHECK_INTERVAL
+            recent = timedelta(seconds=self.WINDOW + self.SHARED_CHECK_INTERVAL)
+            elsewhere = last is not None and timezone.now() - last < recent
+        except DatabaseError as e:
+            # Without a view of the other processes, don't borrow their reserve
+            logger.warning(f"Could not read interactive API demand: {e}")
+            elsewhere = True
+        with self._cond:
+            self._demand_elsewhere = elsewhere
+
+    def _background_limit(self) -> int:
+        if self._interactive_sent or self._interactive_waiting or self._demand_elsewhere:
+            return self.capacity - self.reserve
+        # Interactive lane idle for a whole window - borrow half its reserve
+        return self.capacity - math.ceil(self.reserve / 2)
+
+    def acquire(self, lane: str = INTERACTIVE, check: Optional[Callable[[], None]] = None):
+        """
+        Block until a request may be sent on ``lane``
+
+        :param lane: INTERACTIVE or BACKGROUND
+        :param check: Optional callable run between waits; may raise to abandon
+                      the request (used for analytics pause/cancel)
+        """
+        interactive = lane == INTERACTIVE
+        if interactive:
+            self._note_demand()
+        else:
+            self._check_demand()
+
+        with self._cond:
+            if interactive:
+                self._interactive_waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+
+                    if interactive:
+                        allowed = len(self._sent) < self.capacity
+                    else:
+                        allowed = (
+                            not self._interactive_waiting
+                            and len(self._sent) < self._background_limit()
+                        )
+
+                    if allowed:
+                        self._sent.append((now, lane))
+                        if interactive:
+                            self._interactive_sent += 1
+                        return
+
+                    timeout = self._sent[0][0] + self.WINDOW - now if self._sent else self.WINDOW
+                    if check:
+                        timeout = min(timeout, self.CHECK_INTERVAL)
+                    self._cond.wait(max(timeout, 0))
+
+                    if check:
+                        check()
+                    if not interactive:
+                        self._check_demand()
+            finally:
+                if interactive:
+                    self._interactive_waiting -= 1
+                    self._cond.notify_all()
+
+    def usage(self) -> dict:
+        """Requests sent in the current window, per lane"""
+        with self._cond:
+            self._expire(time.monotonic())
+            return {
+                'capacity': self.capacity,
+                'reserve': self.reserve,
+                'interactive': self._interactive_sent,
+                'background': len(self._sent) - self._interactive_sent,
+            }
@@ -0,0 +1,140 @@
+import threading
+import time
+import uuid
+
+from django.utils import timezone
+
+
+class JobInterrupted(BaseException):
+    """
+    Raised inside a running analytics job once pause or cancel is requested
+
+    Derives from BaseException (like KeyboardInterrupt) so the broad
+    ``except Exception`` handlers in the integration clients cannot swallow it
+    and let a patient be scored on half-fetched data.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class JobControl:
+    """
+    Cooperative pause/cancel signal for a running AnalyticsJob
+
+    The worker calls ``check()`` before each unit of work and ``wait()``
+    instead of ``time.sleep``. Views set the ``pause_requested`` /
+    ``cancel_requested`` flags on the job and call ``JobControl.signal()``:
+    a worker in the same process wakes immediately, a worker in another
+    process sees the flag on its next poll (at most POLL_INTERVAL later).
+
+    The control also holds the job's lease: ``take_lease()`` records a token
+    for this run and polls renew it every LEASE_RENEW_INTERVAL. Every API
+    request, rate-budget wait and fed patient polls, so the lease only lapses
+    when the worker has stopped. If another process has taken the job over
+    meanwhile, the renewal fails and the run stops with reason 'lease_lost'
+    without saving anything over the new run.
+    """
+
+    POLL_INTERVAL = 2  # seconds between DB flag checks while waiting
+    LEASE_RENEW_INTERVAL = 60  # seconds between lease renewals
+
+    _events = {}
+    _lock = threading.Lock()
+
+    def __init__(self, job):
+        self.job_id = job.id
+        self.reason = None
+        self.token = uuid.uuid4().hex
+        self._last_poll = 0.0
+        self._renewed = None
+
+        with JobControl._lock:
+            self._event = JobControl._events.setdefault(job.id, threading.Event())
+        self._event.clear()
+
+    @classmethod
+    def signal(cls, job_id: int):
+        """Wake the worker for ``job_id`` if it is running in this process"""
+        with cls._lock:
+            event = cls._events.get(job_id)
+        if event:
+            event.set()
+
+    def release(self):
+        """Unregister this control once the worker has finished with the job"""
+        with JobControl._lock:
+            if JobControl._events.get(self.job_id) is self._event:
+                del JobControl._events[self.job_id]
+
+    def take_lease(self):
+        """Hold the job for this run; poll() renews the lease from here on"""
+        from .models import AnalyticsJob
+
+        AnalyticsJob.objects.filter(id=self.job_id).update(
+            lease_owner=self.token,
+            lease_expires_at=timezone.now() + AnalyticsJob.RUN_LEASE
+        )
+        self._renewed = time.monotonic()
+
+    def renew_lease(self) -> bool:
+        """Extend the lease, returning False if another run has taken the job"""
+        from .models import AnalyticsJob
+
+        self._renewed = time.monotonic()
+        return bool(AnalyticsJob.objects.filter(id=self.job_id, lease_owner=self.token).update(
+            lease_expires_at=timezone.now() + AnalyticsJob.RUN_LEASE
+        ))
+
+    def poll(self, force: bool = False):
+        """
+        Return 'pause', 'cancel' or 'lease_lost' if the run must stop, otherwise None
+
+        Hits the database at most once per POLL_INTERVAL unless signalled.
+        """
+        if self.reason:
+            return self.reason
+
+        now = time.monotonic()
+        if not force and not self._event.is_set() and now - self._last_poll < self.POLL_INTERVAL:
+            return None
+        self._last_poll = now
+
+        from .models import AnalyticsJob
+
+        flags = AnalyticsJob.objects.filter(id=self.job_id).values(
+            'cancel_requested', 'pause_requested'
+        ).first()
+
+        if flags is None or flags['cancel_requested']:
+            self.reason = 'cancel'
+        elif flags['pause_requested']:
+            self.reason = 'pause'
+        elif self._renewed is not None and now - self._renewed >= self.LEASE_RENEW_INTERVAL and not self.renew_lease():
+            self.reason = 'lease_lost'
+        else:
+            self._event.clear()
+
+        return self.reason
+
+    def check(self):
+        """Raise JobInterrupted if pause or cancel has been requested"""
+        if self.poll():
+            raise JobInterrupted(self.reason)
+
+    def wait(self, seconds: float) -> bool:
+        """
+        Sleep for up to ``seconds``, returning True early if interrupted
+
+        :param seconds: Maximum time to wait
+        :return: True if pause/cancel was requested during the wait
+        """
+        deadline = time.monotonic() + seconds
+        while True:
+            if self.poll():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._event.wait(min(remaining, self.POLL_INTERVAL))
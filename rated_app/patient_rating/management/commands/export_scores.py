@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from patient_rating.score_export import EXPORT_CHUNK_SIZE, stream_csv
+
+
+class Command(BaseCommand):
+    help = 'Export every patient score as CSV, streamed in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='File to write (defaults to stdout)'
+        )
+        parser.add_argument(
+            '--categories',
+            action='store_true',
+            help='Include per-category points from the latest analytics run'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Patients read from the database per query'
+        )
+
+    def handle(self, *args, **options):
+        """Write the CSV export"""
+        lines = stream_csv(options['categories'], options['chunk_size'])
+
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stdout.write(
+            self.style.SUCCESS(f"Patient scores exported to {options['output']}")
+        )
@@ -3,32 +3,138 @@ import time
 import pytz
 from patient_rating.views import send_analytics_email_log
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional
 
 from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.db import DatabaseError, transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from patient_rating.models import (
     RatedAppSettings, 
     ScoringConfiguration,
     AnalyticsJob,
-    Patient
+    Patient,
+    PatientScoreSnapshot,
+    PresetComparisonResult
 )
 from patient_rating.integrations.factory import IntegrationFactory
+from patient_rating.integrations.rate_budget import BACKGROUND
 from patient_rating.behavioral_processor import BehavioralProcessor
+from patient_rating.scoring_plan import ScoringPlan
+from patient_rating.analytics_pipeline import Pipeline, Stage
+from patient_rating.cohort_shards import ShardedCohortDiscovery
+from patient_rating.fetch_planner import FetchPlan
+from patient_rating.email_outbox import OutboxSender
+from patient_rating.preset_comparison import comparison_plans, comparison_scores
+from patient_rating.job_control import JobControl, JobInterrupted
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s: %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Patient fields written by analytics; everything else (likability, overrides) is left alone
+SCORE_FIELDS = [
+    'patient_name',
+    'total_score',
+    'calculated_rating',
+    'last_calculated',
+    'source_updated_at',
+    'scored_config_signature',
+    'scored_likability',
+    'scored_valid_until',
+    'is_stale',
+    'scoring_features',
+    'updated_at',
+]
+
+# Fingerprint of a score that reached Cliniko (see write_back_rating)
+FINGERPRINT_FIELDS = [
+    'source_updated_at',
+    'scored_config_signature',
+    'scored_likability',
+    'scored_valid_until',
+]
+
+# Written for scores without a fingerprint, so an earlier good one is kept
+UNVERIFIED_SCORE_FIELDS = [field for field in SCORE_FIELDS if field not in FINGERPRINT_FIELDS]
+
+# Keeps id__in lookups well under SQLite's bound parameter limit
+QUERY_CHUNK_SIZE = 500
+
+
+def latest_update(patient: Dict, *record_lists: List[Dict]) -> Optional[datetime]:
+    """Latest updated_at across a patient record and their related records"""
+    timestamps = [patient.get('updated_at')]
+    for records in record_lists:
+        timestamps.extend(record.get('updated_at') for record in records)
+    
+    parsed = [
+        datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        for ts in timestamps if ts
+    ]
+    return max(parsed) if parsed else None
+
+
+def date_range_utc(date_range: str, clinic_timezone: Optional[str]) -> tuple:
+    """Convert an AnalyticsJob date range to UTC API timestamps (start, end)"""
+    from dateutil.relativedelta import relativedelta
+    
+    # Use clinic timezone
+    clinic_tz = pytz.timezone(clinic_timezone or 'Australia/Sydney')
+    
+    # For "1 day", use the current time as end and exactly 24 hours back as start
+    if date_range == '1d':
+        # Current moment in clinic timezone
+        end_date = datetime.now(clinic_tz)
+        # Exactly 24 hours (1 day) back
+        start_date = end_date - timedelta(hours=24)
+    else:
+        # For other ranges, use end of today and calculate back
+        end_date = datetime.now(clinic_tz).replace(
+            hour=23, minute=59, second=59, microsecond=999999
+        )
+        
+        # Handle different date range formats
+        if date_range == '3':
+            # 3 months
+            start_date = end_date - relativedelta(months=3)
+        elif date_range == '6':
+            # 6 months  
+            start_date = end_date - relativedelta(months=6)
+        elif date_range == '1y':
+            # 1 year
+            start_date = end_date - relativedelta(years=1)
+        elif date_range == '2y':
+            # 2 years
+            start_date = end_date - relativedelta(years=2)
+        elif date_range == '5y':
+            # 5 years
+            start_date = end_date - relativedelta(years=5)
+        elif date_range == '10y':
+            # 10 years
+            start_date = end_date - relativedelta(years=10)
+        else:
+            # Default to 3 months if unrecognized
+            start_date = end_date - relativedelta(months=3)
+        
+        # Set to beginning of day for non-1-day ranges
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    # Convert to UTC
+    start_utc = start_date.astimezone(pytz.UTC)
+    end_utc = end_date.astimezone(pytz.UTC)
+    
+    # Format for API
+    start_str = start_utc.strftime('%Y-%m-%dT%H:%M:%S')
+    end_str = end_utc.strftime('%Y-%m-%dT%H:%M:%S')
+    
+    return start_str, end_str
+
 
 class Command(BaseCommand):
     help = 'Process analytics jobs for patient rating'
     
+    BATCH_SIZE = 10  # scores persisted per bulk write
+    
     def __init__(self):
         super().__init__()
         self.current_job = None
@@ -36,9 +142,36 @@ class Command(BaseCommand):
         self.normalizer = None
         self.processor = None
         self.settings = None
+        self.control = None
+        self.unchanged_ids = set()
+        self.pending_scores = []
+        self.pending_unverified_scores = []
+        self.pending_snapshots = {}
+        self.pending_comparisons = []
+        self.comparison_plans = []
+        self.fetch_plan = FetchPlan.full()
+        self.carried_forward = []
+        self._signature = None
+        self._signature_for = None
+        
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--job-id',
+            type=int,
+            help='Process only this job (used by the analytics scheduler and dashboard)'
+        )
         
     def handle(self, *args, **options):
         """Main entry point for the management command"""
+        if options.get('job_id'):
+            job = AnalyticsJob.objects.filter(id=options['job_id']).first()
+            if job:
+                self.process_job(job)
+            else:
+                logger.warning(f"Analytics job {options['job_id']} not found")
+            self.deliver_queued_email()
+            return
+        
         try:
             # Find jobs that need processing
             jobs = AnalyticsJob.objects.filter(
@@ -52,54 +185,137 @@ class Command(BaseCommand):
                 # Process scheduled jobs if it's time
                 elif job.should_run_now():
                     self.process_job(job)
-                # Resume running jobs (recovery from crash)
-                elif job.status == 'running':
+                # Resume running jobs whose worker stopped (recovery from crash)
+                elif job.status == 'running' and job.take_over():
                     self.process_job(job)
                     
         except Exception as e:
             logger.error(f"Error in analytics processor: {e}")
+        
+        self.deliver_queued_email()
+    
+    def deliver_queued_email(self):
+        """
+        Send queued report email when no outbox sender runs in this process
+        
+        Jobs are already saved as finished by now, so mail server latency
+        only delays this command's exit. Failures stay queued for retry.
+        """
+        if OutboxSender.is_running():
+            return
+        try:
+            OutboxSender().drain()
+        except Exception as e:
+            logger.error(f"Failed to deliver queued email: {e}")
             
     def process_job(self, job: AnalyticsJob):
         """Process a single analytics job"""
         self.current_job = job
+        self.control = None
+        self.pending_snapshots = {}
+        self.carried_forward = []
         
         try:
-            logger.info(f"Starting analytics job {job.id}")
+            # A stored cohort means a paused or interrupted run to pick up again
+            resuming = bool(job.cohort)
+            logger.info(f"{'Resuming' if resuming else 'Starting'} analytics job {job.id}")
             
             # Update job status
             job.status = 'running'
-            job.last_run_started = timezone.now()
+            job.pause_requested = False
+            if not resuming:
+                # Records changed since the previous run decide who is rescored
+                job.changes_since = job.last_run_started if job.incremental else None
+                job.last_run_started = timezone.now()
+                job.patients_processed = 0
+                job.patients_failed = 0
+                job.patients_skipped = 0
+                job.api_calls = 0
+                job.processed_patient_ids = []
+                job.failed_patient_ids = []
+                if job.is_test_mode:
+                    job.test_results = {}
+                job.comparison_results.all().delete()
             job.save()
             
             # Initialize components
             self.initialize_components(job)
             
-            # Get date range
-            start_date, end_date = self.get_date_range_utc(job)
+            if resuming:
+                done_ids = set(job.processed_patient_ids)
+                done_ids.update(failed['id'] for failed in job.failed_patient_ids)
+                patient_details = [p for p in job.cohort if p['patient_id'] not in done_ids]
+                logger.info(f"Resuming with {len(patient_details)} of {len(job.cohort)} patients remaining")
+            else:
+                # Get date range
+                start_date, end_date = self.get_date_range_utc(job)
+                
+                # Get patients with appointments in range
+                logger.info(f"Fetching patients with appointments from {start_date} to {end_date}")
+                patient_details = self.get_patients_in_range(start_date, end_date)
+                
+                interrupted = self.control.poll(force=True)
+                if interrupted == 'lease_lost':
+                    logger.warning(f"Analytics job {job.id} was taken over by another run during discovery")
+                    return
+                if interrupted:
+                    # Cohort discovery was cut short - a resume starts it again
+                    job.status = 'paused' if interrupted == 'pause' else 'cancelled'
+                    job.save(update_fields=['status', 'updated_at'])
+                    logger.info(f"Analytics job {job.id} {job.status} before processing started")
+                    return
+                
+                if not patient_details:
+                    logger.warning("No patients found in date range")
+                    job.status = 'completed'
+                    job.last_run_completed = timezone.now()
+                    job.patients_processed = 0
+                    job.save()
+                    return
+                
+                # Keep the cohort so a paused run can resume without refetching
+                job.cohort = [
+                    {'patient_id': p['patient_id'], 'name': p.get('name', f"Patient {p['patient_id']}")}
+                    for p in patient_details
+                ]
+                job.total_patients = len(patient_details)
+                job.save(update_fields=['cohort', 'total_patients', 'updated_at'])
+                
+                logger.info(f"Found {len(patient_details)} unique patients to process")
+            
+            # Further presets to score every patient with, from the same fetched data
+            self.comparison_plans = comparison_plans(job)
             
-            # Get patients with appointments in range
-            logger.info(f"Fetching patients with appointments from {start_date} to {end_date}")
-            patient_details = self.get_patients_in_range(start_date, end_date)
+            # Work out which patients can keep their previous score (comparisons need everyone scored)
+            if self.comparison_plans:
+                self.unchanged_ids = set()
+            else:
+                self.unchanged_ids = self.find_unchanged_patients(
+                    job, {p['patient_id'] for p in patient_details}
+                )
             
-            if not patient_details:
-                logger.warning("No patients found in date range")
-                job.status = 'completed'
-                job.last_run_completed = timezone.now()
-                job.patients_processed = 0
-                job.save()
+            # Process patients in batches
+            outcome = self.process_patients_batch(patient_details, job)
+            if outcome == 'lease_lost':
+                # The run holding the job now owns its status and progress
+                logger.warning(f"Analytics job {job.id} was taken over by another run, stopping")
                 return
             
-            # Update job with total patients
-            job.total_patients = len(patient_details)
-            job.save()
+            # Score history for everything finished so far (a resume adds the rest)
+            self.write_snapshots(job)
             
-            logger.info(f"Found {len(patient_details)} unique patients to process")
+            # API usage accumulates across pause/resume for the estimate comparison
+            job.api_calls += self.client.requests_made
             
-            # Process patients in batches
-            self.process_patients_batch(patient_details, job)
+            if outcome == 'pause':
+                # Keep cohort and progress; analytics_resume picks up from here
+                job.status = 'paused'
+                job.save(update_fields=['status', 'api_calls', 'updated_at'])
+                logger.info(f"Analytics job {job.id} paused: {job.patients_processed}/{job.total_patients} processed")
+                return
             
             # Mark job as completed
-            if job.cancel_requested:
+            if outcome == 'cancel':
                 job.status = 'cancelled'
             elif job.patients_failed > 0:
                 job.status = 'partial'
@@ -107,25 +323,33 @@ class Command(BaseCommand):
                 job.status = 'completed'
                 
             job.last_run_completed = timezone.now()
+            job.cohort = []
+            
+            if job.status in ['completed', 'partial'] and not job.is_test_mode:
+                self.flag_stale_patients(job)
             
             # Calculate next run if recurring
-            if job.frequency in ['daily', 'weekly'] and not job.cancel_requested:
+            if job.frequency in ['daily', 'weekly'] and outcome != 'cancel':
                 job.calculate_next_run()
                 job.status = 'pending'  # Ready for next run
                 
-            job.save()
+            job.save(update_fields=['status', 'last_run_completed', 'cohort', 'next_run', 'api_calls', 'updated_at'])
             # Send email log if completed successfully
             if job.status in ['completed', 'partial']:
                 try:
                     send_analytics_email_log(job, self.settings)
                 except Exception as e:
-                    logger.error(f"Failed to send analytics email log: {e}")
+                    logger.error(f"Failed to queue analytics email log: {e}")
             
             logger.info(f"Analytics job {job.id} completed: {job.patients_processed}/{job.total_patients} processed")
             
         except Exception as e:
             logger.error(f"Error processing job {job.id}: {e}")
             job.mark_failed(str(e))
+        
+        finally:
+            if self.control:
+                self.control.release()
             
     def initialize_components(self, job: AnalyticsJob):
         """Initialize plugin components and settings"""
@@ -138,71 +362,49 @@ class Command(BaseCommand):
         self.normalizer = IntegrationFactory.get_normalizer(self.settings)
         self.processor = BehavioralProcessor()
         
+        # Pause/cancel signal shared with the client so waits and requests stop early
+        self.control = JobControl(job)
+        self.control.take_lease()
+        self.client.control = self.control
+        
+        # Analytics yields API quota to interactive dashboard lookups
+        self.client.lane = BACKGROUND
+        
         # Get rate limits for this integration
         self.rate_limits = self.client.get_rate_limits()
         
+    def config_signature(self, config: ScoringConfiguration) -> str:
+        """Scoring signature of ``config``, computed once per run"""
+        if self._signature_for != config.pk:
+            self._signature_for = config.pk
+            self._signature = config.scoring_signature()
+        return self._signature
+    
     def get_date_range_utc(self, job: AnalyticsJob) -> tuple:
         """Convert job date range to UTC timestamps"""
-        from datetime import datetime, timedelta
-        from dateutil.relativedelta import relativedelta
-        import pytz
-        
-        # Use clinic timezone
-        clinic_tz = pytz.timezone(self.settings.clinic_timezone or 'Australia/Sydney')
-        
-        # For "1 day", use the current time as end and exactly 24 hours back as start
-        if job.date_range == '1d':
-            # Current moment in clinic timezone
-            end_date = datetime.now(clinic_tz)
-            # Exactly 24 hours (1 day) back
-            start_date = end_date - timedelta(hours=24)
-        else:
-            # For other ranges, use end of today and calculate back
-            end_date = datetime.now(clinic_tz).replace(
-                hour=23, minute=59, second=59, microsecond=999999
-            )
-            
-            # Handle different date range formats
-            if job.date_range == '3':
-                # 3 months
-                start_date = end_date - relativedelta(months=3)
-            elif job.date_range == '6':
-                # 6 months  
-                start_date = end_date - relativedelta(months=6)
-            elif job.date_range == '1y':
-                # 1 year
-                start_date = end_date - relativedelta(years=1)
-            elif job.date_range == '2y':
-                # 2 years
-                start_date = end_date - relativedelta(years=2)
-            elif job.date_range == '5y':
-                # 5 years
-                start_date = end_date - relativedelta(years=5)
-            elif job.date_range == '10y':
-                # 10 years
-                start_date = end_date - relativedelta(years=10)
-            else:
-                # Default to 3 months if unrecognized
-                start_date = end_date - relativedelta(months=3)
-            
-            # Set to beginning of day for non-1-day ranges
-            start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Convert to UTC
-        start_utc = start_date.astimezone(pytz.UTC)
-        end_utc = end_date.astimezone(pytz.UTC)
-        
-        # Format for API
-        start_str = start_utc.strftime('%Y-%m-%dT%H:%M:%S')
-        end_str = end_utc.strftime('%Y-%m-%dT%H:%M:%S')
+        start_str, end_str = date_range_utc(job.date_range, self.settings.clinic_timezone)
         
         logger.info(f"Date range for {job.date_range}: {start_str} to {end_str}")
         
         return start_str, end_str
     
     def get_patients_in_range(self, start_date: str, end_date: str) -> List[Dict]:
-        """Get unique patients with appointments in date range"""
+        """
+        Get unique patients with appointments in date range
+        
+        Uses month-sharded discovery, which serves months older than the cache
+        horizon from AppointmentShard rows, when the integration supports it.
+        """
         try:
+            discovery = ShardedCohortDiscovery(
+                self.client,
+                self.settings,
+                workers=self.rate_limits.get('concurrent_requests', 1)
+            )
+            patients = discovery.discover(start_date, end_date)
+            if patients is not None:
+                return patients
+            
             return self.client.get_patients_with_appointments_in_range(
                 start_date, 
                 end_date
@@ -210,200 +412,504 @@ class Command(BaseCommand):
         except Exception as e:
             logger.error(f"Error fetching patients: {e}")
             return []
+        except JobInterrupted as e:
+            logger.info(f"Patient discovery interrupted ({e.reason})")
+            return []
+    
+    def find_unchanged_patients(self, job: AnalyticsJob, patient_ids: set) -> set:
+        """
+        Find patients whose stored score can be carried forward unchanged
+        
+        A patient is unchanged when their stored score was verified during or
+        after the previous run with the same configuration signature and
+        likability, the change feed shows no record updated after their
+        stored fingerprint, and time alone hasn't changed the score since
+        (scored_valid_until - e.g. a future appointment has now passed).
+        """
+        if not job.incremental or not job.changes_since or job.is_test_mode:
+            return set()
+        
+        since = job.changes_since.astimezone(pytz.UTC).strftime('%Y-%m-%dT%H:%M:%S')
+        try:
+            changes = self.client.get_patient_changes_since(since)
+        except JobInterrupted:
+            # Nothing skipped; the batch loop stops on its first control check
+            return set()
+        
+        if changes is None:
+            logger.info("Change feed unavailable - rescoring all patients")
+            return set()
+        
+        signature = self.config_signature(job.preset)
+        stored = Patient.objects.filter(
+            Q(scored_valid_until__isnull=True) | Q(scored_valid_until__gt=timezone.now()),
+            scored_config_signature=signature,
+            last_calculated__gte=job.changes_since
+        ).values_list('cliniko_patient_id', 'source_updated_at', 'likability', 'scored_likability')
+        
+        unchanged = set()
+        for patient_id, source_updated_at, likability, scored_likability in stored:
+            if patient_id not in patient_ids or likability != scored_likability:
+                continue
+            changed_at = changes.get(patient_id)
+            if changed_at is None or (
+                source_updated_at and datetime.fromisoformat(changed_at.replace('Z', '+00:00')) <= source_updated_at
+            ):
+                unchanged.add(patient_id)
+        
+        # Their scores are verified as of this run, keeping them eligible next time
+        Patient.objects.filter(cliniko_patient_id__in=unchanged).update(
+            last_calculated=timezone.now(),
+            is_stale=False
+        )
+        
+        logger.info(
+            f"Incremental run: {len(unchanged)} of {len(patient_ids)} patients unchanged "
+            f"since {since}, {len(changes)} patients with changed records"
+        )
+        return unchanged
+    
+    def flag_stale_patients(self, job: AnalyticsJob):
+        """Flag patients this run did not rescore (or carry forward) as stale"""
+        stale_count = Patient.objects.filter(
+            Q(last_calculated__lt=job.last_run_started) | Q(last_calculated__isnull=True),
+            is_stale=False
+        ).update(is_stale=True)
+        
+        if stale_count:
+            logger.info(f"Flagged {stale_count} patients not scored by this run as stale")
+    
+    def flush_scores(self):
+        """
+        Write buffered patient scores (and preset comparisons) in a single upsert each
+        
+        Scores whose write-back failed carry no fingerprint, and are written
+        without touching the fingerprint columns. The patient's last good
+        fingerprint still matches their unchanged records, and anything that
+        made this run rescore them (new records, weights, likability, time)
+        still applies next run.
+        """
+        if self.pending_comparisons:
+            self.upsert(
+                PresetComparisonResult,
+                self.pending_comparisons,
+                unique_fields=['job', 'cliniko_patient_id'],
+                update_fields=['patient_name', 'scores']
+            )
+            self.pending_comparisons = []
+        
+        for scores, fields in ((self.pending_scores, SCORE_FIELDS), (self.pending_unverified_scores, UNVERIFIED_SCORE_FIELDS)):
+            if scores:
+                failed = self.upsert(Patient, scores, unique_fields=['cliniko_patient_id'], update_fields=fields)
+                for score in failed:
+                    # No history row for a score that wasn't stored
+                    self.pending_snapshots.pop(score.cliniko_patient_id, None)
+                logger.info(f"Saved scores for {len(scores) - len(failed)} patients")
+        self.pending_scores = []
+        self.pending_unverified_scores = []
+    
+    def upsert(self, model, rows: List, **options) -> List:
+        """
+        Upsert a batch in one statement, falling back to one row at a time
+        
+        A row the database rejects would otherwise fail its whole batch and
+        abort the job; it is logged and left out instead.
+        
+        :param model: Model class of the rows
+        :param rows: Unsaved instances
+        :param options: unique_fields and update_fields for bulk_create
+        :return: Rows that could not be saved
+        """
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(rows, update_conflicts=True, **options)
+            return []
+        except DatabaseError as e:
+            logger.error(f"Saving {len(rows)} {model.__name__} rows failed, retrying one at a time: {e}")
+        
+        failed = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    model.objects.bulk_create([row], update_conflicts=True, **options)
+            except DatabaseError as e:
+                logger.error(f"Could not save {model.__name__} for patient {row.cliniko_patient_id}: {e}")
+                failed.append(row)
+        return failed
+    
+    def write_snapshots(self, job: AnalyticsJob):
+        """
+        Append this run's scores to the patient score history in bulk
+        
+        Carried-forward patients get a copy of their previous snapshot so every
+        run has a complete cohort. A rerun on the same day replaces that day's rows.
+        """
+        if job.is_test_mode or not (self.pending_snapshots or self.carried_forward):
+            return
+        
+        clinic_tz = pytz.timezone(self.settings.clinic_timezone or 'Australia/Sydney')
+        snapshot_date = job.last_run_started.astimezone(clinic_tz).date()
+        
+        patient_ids = list(self.pending_snapshots) + self.carried_forward
+        stored = {}
+        for i in range(0, len(patient_ids), QUERY_CHUNK_SIZE):
+            stored.update(
+                (row[0], row[1:]) for row in Patient.objects.filter(
+                    cliniko_patient_id__in=patient_ids[i:i + QUERY_CHUNK_SIZE]
+                ).values_list('cliniko_patient_id', 'id', 'total_score', 'calculated_rating')
+            )
+        
+        # Category breakdown of each carried-forward patient's previous score
+        carried_pks = [stored[pid][0] for pid in self.carried_forward if pid in stored]
+        previous_points = {}
+        for i in range(0, len(carried_pks), QUERY_CHUNK_SIZE):
+            previous = PatientScoreSnapshot.objects.filter(
+                patient_id__in=carried_pks[i:i + QUERY_CHUNK_SIZE],
+                created_at__gte=job.changes_since
+            ).order_by('created_at', 'id').values_list('patient_id', 'category_points')
+            previous_points.update(previous)
+        
+        snapshots = []
+        for patient_id, (total_score, letter_grade, category_points) in self.pending_snapshots.items():
+            if patient_id in stored:
+                snapshots.append(PatientScoreSnapshot(
+                    patient_id=stored[patient_id][0],
+                    job=job,
+                    snapshot_date=snapshot_date,
+                    total_score=total_score,
+                    letter_grade=letter_grade,
+                    category_points=category_points
+                ))
+        for patient_id in self.carried_forward:
+            if patient_id in stored:
+                patient_pk, total_score, letter_grade = stored[patient_id]
+                snapshots.append(PatientScoreSnapshot(
+                    patient_id=patient_pk,
+                    job=job,
+                    snapshot_date=snapshot_date,
+                    total_score=total_score,
+                    letter_grade=letter_grade,
+                    category_points=previous_points.get(patient_pk, {}),
+                    carried_forward=True
+                ))
+        
+        PatientScoreSnapshot.objects.bulk_create(
+            snapshots,
+            batch_size=QUERY_CHUNK_SIZE,
+            update_conflicts=True,
+            unique_fields=['patient', 'job', 'snapshot_date'],
+            update_fields=['total_score', 'letter_grade', 'category_points', 'carried_forward']
+        )
+        logger.info(f"Recorded {len(snapshots)} score snapshots for {snapshot_date}")
+        
+        self.pending_snapshots = {}
+        self.carried_forward = []
+    
+    def build_pipeline(self, job: AnalyticsJob) -> Pipeline:
+        """
+        Fetch -> score -> write-back stages, persisted by the caller's thread
+        
+        Persisting comes last so a patient's stored fingerprint reflects whether
+        their Cliniko write-back succeeded. I/O stages get the integration's
+        concurrent_requests workers; the shared rate budget still caps the
+        combined request rate.
+        """
+        io_workers = self.rate_limits.get('concurrent_requests', 1)
+        queue_size = self.BATCH_SIZE * 2
+        # Brackets are read once here; scoring itself makes no queries
+        plan = job.preset.compile()
+        
+        # Only request the records some preset in this run actually scores
+        self.fetch_plan = FetchPlan.for_plans([plan] + [p for _, p in self.comparison_plans])
+        unfetched = self.fetch_plan.unfetched_categories()
+        if unfetched:
+            logger.info(f"Skipping data for unweighted categories: {', '.join(unfetched)}")
+        
+        return Pipeline([
+            Stage('fetch', self.fetch_patient_data, workers=io_workers, queue_size=queue_size),
+            Stage('score', lambda item: self.score_patient(item, job.preset, plan), queue_size=queue_size),
+            Stage('write_back', lambda item: self.write_back_rating(item, job.is_test_mode), workers=io_workers, queue_size=queue_size),
+        ], output_size=queue_size)
+    
+    def with_likability(self, items: Iterable[Dict]) -> Iterator[Dict]:
+        """Attach saved likability to work items, loaded with one query per batch"""
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == self.BATCH_SIZE:
+                yield from self.attach_likability(batch)
+                batch = []
+        if batch:
+            yield from self.attach_likability(batch)
+    
+    def attach_likability(self, batch: List[Dict]) -> List[Dict]:
+        likability = Patient.likability_map(item['patient_id'] for item in batch)
+        for item in batch:
+            item['likability'] = likability.get(str(item['patient_id']), 0)
+        return batch
     
     def process_patients_batch(
         self, 
         patient_details: List[Dict], 
         job: AnalyticsJob
-    ):
-        """Process patients in batches with rate limiting"""
-        batch_size = min(10, self.rate_limits.get('batch_size', 10))
-        delay_between_patients = self.rate_limits.get('recommended_delay', 0.5)
-        delay_between_batches = 30  # Normal pause between batches
-        
-        processed = 0
-        failed = 0
-        test_results = []
-        
-        # Clear existing patient records only if NOT test mode
-        if not job.is_test_mode:
-            Patient.objects.all().delete()
-            logger.info("Cleared existing patient records")
-        else:
-            logger.info("[TEST MODE] Skipping patient record clearing")
-        
-        for i in range(0, len(patient_details), batch_size):
-            # Check for cancellation before each batch
-            job.refresh_from_db()
-            if job.cancel_requested:
-                logger.info(f"Job {job.id} cancelled by user")
-                break
-            
-            batch = patient_details[i:i + batch_size]
-            
-            for patient_info in batch:
-                # Check cancellation before EACH patient (more responsive)
-                job.refresh_from_db()
-                if job.cancel_requested:
-                    logger.info(f"Job {job.id} cancelled by user (mid-batch)")
-                    break
-                    
-                patient_id = patient_info['patient_id']
-                patient_name = patient_info.get('name', f'Patient {patient_id}')
+    ) -> Optional[str]:
+        """
+        Process patients through the staged pipeline
+        
+        Carried-forward patients go straight to persistence. Scores are
+        buffered and written once per batch by flush_scores.
+        
+        :return: 'pause', 'cancel' or 'lease_lost' if interrupted, otherwise None
+        """
+        # Counters carry on from any earlier (paused) part of this run
+        processed = job.patients_processed
+        failed = job.patients_failed
+        skipped = job.patients_skipped
+        test_results = job.test_results.get('patients', []) if job.is_test_mode else []
+        
+        pipeline = self.build_pipeline(job)
+        pipeline.start()
+        pipeline.feed(
+            self.with_likability(
+                {
+                    'patient_id': patient_info['patient_id'],
+                    'patient_name': patient_info.get('name', f"Patient {patient_info['patient_id']}"),
+                }
+                for patient_info in patient_details
+                if patient_info['patient_id'] not in self.unchanged_ids
+            ),
+            should_stop=self.control.poll
+        )
+        
+        # Source data and configuration unchanged - keep previous score
+        for patient_info in patient_details:
+            if patient_info['patient_id'] in self.unchanged_ids:
+                processed += 1
+                skipped += 1
+                self.carried_forward.append(patient_info['patient_id'])
+                job.processed_patient_ids.append(patient_info['patient_id'])
+        job.patients_processed = processed
+        job.patients_skipped = skipped
+        
+        try:
+            for item in pipeline.results():
+                patient_id = item['patient_id']
+                patient_name = item['patient_name']
+                status = item.get('status', 'success')
                 
-                try:
-                    # Process single patient with test mode flag
-                    success = self.process_single_patient(
-                        patient_id, 
-                        patient_name,
-                        job.preset,
-                        is_test_mode=job.is_test_mode
-                    )
-                    
-                    if success:
-                        processed += 1
-                        job.processed_patient_ids.append(patient_id)
-                        if job.is_test_mode:
-                            test_results.append({
-                                'id': patient_id,
-                                'name': patient_name,
-                                'status': 'success'
-                            })
+                if status == 'interrupted':
+                    # Stopped mid-fetch - patient stays unprocessed for the resume
+                    continue
+                
+                if 'score' in item:
+                    if item['fingerprinted']:
+                        self.pending_scores.append(item['score'])
                     else:
-                        failed += 1
-                        job.failed_patient_ids.append({
-                            'id': patient_id,
-                            'name': patient_name,
-                            'error': 'Processing failed'
-                        })
-                        if job.is_test_mode:
-                            test_results.append({
-                                'id': patient_id,
-                                'name': patient_name,
-                                'status': 'failed'
-                            })
-                    
-                except Exception as e:
-                    logger.error(f"Error processing {patient_name}: {e}")
+                        self.pending_unverified_scores.append(item['score'])
+                    self.pending_snapshots[patient_id] = item['snapshot']
+                
+                if 'comparison' in item:
+                    self.pending_comparisons.append(PresetComparisonResult(
+                        job=job,
+                        cliniko_patient_id=patient_id,
+                        patient_name=patient_name,
+                        scores=item['comparison']
+                    ))
+                
+                if status == 'success':
+                    processed += 1
+                    job.processed_patient_ids.append(patient_id)
+                else:
                     failed += 1
                     job.failed_patient_ids.append({
                         'id': patient_id,
                         'name': patient_name,
-                        'error': str(e)
+                        'error': item.get('error', 'Processing failed')
                     })
-                    if job.is_test_mode:
-                        test_results.append({
-                            'id': patient_id,
-                            'name': patient_name,
-                            'status': 'error',
-                            'error': str(e)
-                        })
                 
-                # Update job progress
+                if job.is_test_mode:
+                    result = {'id': patient_id, 'name': patient_name, 'status': status}
+                    if status == 'error':
+                        result['error'] = item['error']
+                    test_results.append(result)
+                
+                if len(self.pending_scores) + len(self.pending_unverified_scores) + len(self.pending_comparisons) >= self.BATCH_SIZE:
+                    self.flush_scores()
+                    job.pipeline_stats = self.pipeline_stats(pipeline)
+                    logger.info(f"Processed {processed}/{job.total_patients} patients. Pipeline: {job.pipeline_stats}")
+                
+                # Update job progress (only progress fields, so control flags set by views survive)
                 job.patients_processed = processed
                 job.patients_failed = failed
                 if job.is_test_mode:
                     job.test_results = {'patients': test_results}
-                job.save()
-                
-                # Rate limiting between patients
-                time.sleep(delay_between_patients)
-                
-                # If cancellation requested, use shorter delay
-                if job.cancel_requested:
-                    break
-            
-            # If cancellation requested, exit immediately
-            if job.cancel_requested:
-                break
-                
-            # Pause between batches (shorter if cancellation pending)
-            if i + batch_size < len(patient_details):
-                if job.cancel_requested:
-                    logger.info(f"Cancellation requested, exiting...")
-                    break
-                else:
-                    logger.info(f"Processed {processed}/{len(patient_details)} patients. Pausing...")
-                    time.sleep(delay_between_batches)
+                job.save(update_fields=[
+                    'patients_processed', 'patients_failed', 'patients_skipped',
+                    'processed_patient_ids', 'failed_patient_ids',
+                    'test_results', 'pipeline_stats', 'updated_at'
+                ])
+        finally:
+            # Releases the stage threads if this loop stops early
+            pipeline.close()
+        
+        # Persist the remainder, including after a pause/cancel so finished patients are kept
+        self.flush_scores()
+        job.pipeline_stats = self.pipeline_stats(pipeline)
+        job.save(update_fields=[
+            'patients_processed', 'patients_skipped', 'processed_patient_ids',
+            'pipeline_stats', 'updated_at'
+        ])
+        
+        if self.control.reason:
+            logger.info(f"Job {job.id} stopping: {self.control.reason}")
+        return self.control.reason
     
-    def process_single_patient(
-        self, 
-        patient_id: str, 
-        patient_name: str,
-        config: ScoringConfiguration,
-        is_test_mode: bool = False
-    ) -> bool:
-        """Process a single patient and update their rating"""
+    def pipeline_stats(self, pipeline: Pipeline) -> Dict:
+        """Per-stage throughput plus this process's use of the shared rate budget"""
+        return {**pipeline.stats(), 'rate_budget': self.client.rate_budget().usage()}
+    
+    def fetch_patient_data(self, item: Dict) -> Dict:
+        """Pipeline stage: fetch the patient's record, appointments, invoices and referrals"""
+        patient_id = item['patient_id']
         try:
-            # Get patient data
             patients = self.client.get_patients(filters={'id': patient_id})
             
             if not patients:
                 logger.warning(f"No patient found for ID: {patient_id}")
-                return False
+                item['status'] = 'failed'
+                return item
             
-            raw_patient = patients[0]
-            normalized_patient = self.normalizer.normalize_patient(raw_patient)
+            item['raw_patient'] = patients[0]
+            item['normalized_patient'] = self.normalizer.normalize_patient(patients[0])
             
-            # Get appointments, invoices, referrals
-            appointments = self.client.get_appointments(patient_id)
-            invoices = self.client.get_invoices(patient_id)
-            referral_data = self.client.get_referrals(patient_id)
+            # Get the appointments, invoices and referrals the run's presets score
+            item.update(self.fetch_plan.fetch(self.client, patient_id))
             
-            # Prepare data for behavioral processor
+        except JobInterrupted:
+            item['status'] = 'interrupted'
+        except Exception as e:
+            logger.error(f"Error fetching patient {patient_id}: {e}")
+            item['status'] = 'error'
+            item['error'] = str(e)
+        
+        return item
+    
+    def score_patient(self, item: Dict, config: ScoringConfiguration, plan: ScoringPlan) -> Dict:
+        """Pipeline stage: run the behavioral processor with the run's compiled plan (and any comparison presets)"""
+        if item.get('status'):
+            return item
+        
+        try:
+            referral_data = item['referral_data']
             patient_data = {
-                'id': patient_id,
-                'date_of_birth': normalized_patient['date_of_birth'],
-                'appointments': appointments,
-                'invoices': invoices,
+                'id': item['patient_id'],
+                'date_of_birth': item['normalized_patient']['date_of_birth'],
+                'appointments': item['appointments'],
+                'invoices': item['invoices'],
                 'referrals': referral_data.get('referred_patient_ids', []) 
                             if isinstance(referral_data, dict) else []
             }
             
-            # Process behavior
-            result = self.processor.process_patient_behavior(
-                patient_data, 
-                config, 
-                self.settings
-            )
-            result['patient_name'] = patient_name
-            
-            # Save to database
-            patient_obj, created = Patient.objects.update_or_create(
-                cliniko_patient_id=patient_id,
-                defaults={
-                    'patient_name': patient_name,
-                    'total_score': result['total_score'],
-                    'calculated_rating': result['letter_grade'],
-                    'last_calculated': timezone.now()
-                }
-            )
+            # Features are extracted once and scored under every preset
+            features = self.processor.extract_features(patient_data, self.settings)
+            likability = {str(item['patient_id']): item['likability']}
+            item['result'] = self.processor.score_features(features, plan, self.settings, likability)
+            item['features'] = features
+            item['config'] = config
             
-            logger.info(
-                f"{'[TEST MODE] ' if is_test_mode else ''}"
-                f"Patient: {patient_name}, "
-                f"Score: {result['total_score']}, "
-                f"Rating: {result['letter_grade']}"
-            )
+            if self.comparison_plans:
+                item['comparison'] = {str(config.pk): comparison_scores(item['result'])}
+                for preset_id, comparison_plan in self.comparison_plans:
+                    item['comparison'][preset_id] = comparison_scores(
+                        self.processor.score_features(features, comparison_plan, self.settings, likability)
+                    )
             
+        except Exception as e:
+            logger.error(f"Error scoring patient {item['patient_id']}: {e}")
+            item['status'] = 'error'
+            item['error'] = str(e)
+        
+        return item
+    
+    def stored_features(self, features: Dict) -> Dict:
+        """Features persisted for previews, noting categories this run didn't fetch data for"""
+        stored = {key: value for key, value in features.items() if key != 'id'}
+        stored['unfetched'] = self.fetch_plan.unfetched_categories()
+        return stored
+    
+    def write_back_rating(self, item: Dict, is_test_mode: bool) -> Dict:
+        """Pipeline stage: write the rating to Cliniko and build the buffered score row"""
+        if item.get('status'):
+            return item
+        
+        patient_id = item['patient_id']
+        patient_name = item['patient_name']
+        result = item['result']
+        
+        logger.info(
+            f"{'[TEST MODE] ' if is_test_mode else ''}"
+            f"Patient: {patient_name}, "
+            f"Score: {result['total_score']}, "
+            f"Rating: {result['letter_grade']}"
+        )
+        
+        try:
             # Update appointment notes in Cliniko (skip if test mode)
             if not is_test_mode:
                 rating_text = f"Rated {result['letter_grade']}"
-                update_result = self.client.update_patient_appointment_notes(
+                written = self.client.update_patient_appointment_notes(
                     patient_id, 
                     rating_text
                 )
+                update_result = bool(written)
                 
                 if update_result:
                     logger.info(f"Successfully updated notes for {patient_name}")
-                    return True
                 else:
                     logger.error(f"Failed to update notes for {patient_name}")
-                    return False
             else:
                 logger.info(f"[TEST MODE] Would update notes for {patient_name} with rating {result['letter_grade']}")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Error processing patient {patient_id}: {e}")
-            return False
+                update_result = True
+        except JobInterrupted:
+            # Scored but not written back - rescored on resume
+            item['status'] = 'interrupted'
+            return item
+        
+        if is_test_mode:
+            # Test runs leave the stored production scores alone
+            return item
+        
+        score = Patient(
+            cliniko_patient_id=patient_id,
+            patient_name=patient_name,
+            total_score=result['total_score'],
+            calculated_rating=result['letter_grade'],
+            last_calculated=timezone.now(),
+            scoring_features=self.stored_features(item['features'])
+        )
+        
+        # Fingerprint only scores that reached Cliniko, so a failed
+        # write-back is never carried forward by an incremental run
+        if update_result:
+            # Include the appointment as written, so the run's own note
+            # edit doesn't count as a change next time
+            written_records = [written] if isinstance(written, dict) else []
+            score.source_updated_at = latest_update(
+                item['raw_patient'], item['appointments'], item['invoices'], written_records
+            )
+            score.scored_config_signature = self.config_signature(item['config'])
+            score.scored_likability = result['behavior_data']['likability']['score']
+            valid_until = item['features'].get('valid_until')
+            score.scored_valid_until = datetime.fromisoformat(valid_until) if valid_until else None
+        
+        item['score'] = score
+        item['fingerprinted'] = bool(update_result)
+        item['snapshot'] = (
+            result['total_score'],
+            result['letter_grade'],
+            {category: data['points'] for category, data in result['behavior_data'].items()}
+        )
+        if not update_result:
+            item['status'] = 'failed'
+        
+        return item
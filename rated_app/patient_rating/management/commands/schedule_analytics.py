@@ -1,33 +1,37 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from django_cron import CronJobBase, Schedule
-from patient_rating.models import AnalyticsJob
+from patient_rating.email_outbox import OutboxSender
+from patient_rating.scheduler import AnalyticsScheduler
 
 
-class AnalyticsCronJob(CronJobBase):
-    """
-    Cron job to check and run scheduled analytics
-    """
-    RUN_EVERY_MINS = 5  # Run every 5 minutes
-    
-    schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
-    code = 'patient_rating.analytics_cron'
-    
-    def do(self):
-        """Check for and run pending analytics jobs"""
-        from django.core.management import call_command
-        call_command('process_analytics')
+class Command(BaseCommand):
+    help = 'Run the analytics scheduler, starting scheduled jobs when they are due'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process pending and due jobs once and exit (manual trigger)'
+        )
 
-class Command(BaseCommand):
-    help = 'Manually trigger analytics cron job'
-    
     def handle(self, *args, **options):
-        """Manually run the analytics cron job"""
-        self.stdout.write('Manually triggering analytics cron job...')
-        
-        job = AnalyticsCronJob()
-        job.do()
-        
-        self.stdout.write(
-            self.style.SUCCESS('Successfully triggered analytics cron job')
-        )
\ No newline at end of file
+        """Run the scheduler until interrupted"""
+        if options['once']:
+            self.stdout.write('Manually triggering analytics jobs...')
+            call_command('process_analytics')
+            self.stdout.write(
+                self.style.SUCCESS('Successfully triggered analytics jobs')
+            )
+            return
+
+        self.stdout.write('Analytics scheduler started')
+        # Report emails from scheduled runs go out on a shared SMTP connection
+        sender = OutboxSender()
+        sender.start()
+        scheduler = AnalyticsScheduler()
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.stop()
+            sender.stop()
+            self.stdout.write('Analytics scheduler stopped')
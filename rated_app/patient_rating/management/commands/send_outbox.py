@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from patient_rating.email_outbox import OutboxSender
+
+
+class Command(BaseCommand):
+    help = 'Send queued email from the outbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Make one delivery attempt for every due email and exit'
+        )
+
+    def handle(self, *args, **options):
+        """Run the outbox sender until interrupted"""
+        sender = OutboxSender()
+        if options['once']:
+            sender.drain()
+            return
+
+        self.stdout.write('Email outbox sender started')
+        try:
+            sender.run_forever()
+        except KeyboardInterrupt:
+            sender.stop()
+            self.stdout.write('Email outbox sender stopped')
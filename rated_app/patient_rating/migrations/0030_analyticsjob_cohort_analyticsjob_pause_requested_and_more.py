@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0029_ratedappsettings_smtp_host_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='cohort',
+            field=models.JSONField(blank=True, default=list, help_text='Patients selected for the current run, kept so a paused or interrupted run can resume'),
+        ),
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='pause_requested',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='analyticsjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Analysing...'), ('paused', 'Paused'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled'), ('partial', 'Partial Completion')], default='pending', max_length=20),
+        ),
+    ]
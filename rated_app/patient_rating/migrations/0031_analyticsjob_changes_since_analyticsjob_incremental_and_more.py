@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0030_analyticsjob_cohort_analyticsjob_pause_requested_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='changes_since',
+            field=models.DateTimeField(blank=True, help_text="Cut-off used for the current run's change feed", null=True),
+        ),
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='incremental',
+            field=models.BooleanField(default=True, help_text='Only rescore patients whose source data or scoring configuration changed since the last run'),
+        ),
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='patients_skipped',
+            field=models.IntegerField(default=0, help_text='Patients whose previous score was carried forward unchanged'),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='scored_config_signature',
+            field=models.CharField(blank=True, help_text='Scoring configuration signature the stored score was calculated with', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='scored_likability',
+            field=models.IntegerField(blank=True, help_text='Likability the stored score was calculated with', null=True),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='source_updated_at',
+            field=models.DateTimeField(blank=True, help_text="Latest updated_at across the patient's source records when last scored", null=True),
+        ),
+    ]
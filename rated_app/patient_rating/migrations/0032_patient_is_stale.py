@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0031_analyticsjob_changes_since_analyticsjob_incremental_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='is_stale',
+            field=models.BooleanField(default=False, help_text='Not rescored by the most recent completed analytics run'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0032_patient_is_stale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientScoreSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField(help_text='Run date in clinic timezone')),
+                ('total_score', models.IntegerField()),
+                ('letter_grade', models.CharField(max_length=2)),
+                ('category_points', models.JSONField(default=dict, help_text='Points per behavior category')),
+                ('carried_forward', models.BooleanField(default=False, help_text='Copied from the previous snapshot by an incremental run')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(blank=True, help_text='Analytics job that produced the score (kept when the job is deleted)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='score_snapshots', to='patient_rating.analyticsjob')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_snapshots', to='patient_rating.patient')),
+            ],
+            options={
+                'ordering': ['snapshot_date'],
+                'indexes': [models.Index(fields=['patient', 'snapshot_date'], name='patient_rat_patient_534297_idx'), models.Index(fields=['snapshot_date', 'letter_grade'], name='patient_rat_snapsho_cf3179_idx')],
+                'unique_together': {('patient', 'job', 'snapshot_date')},
+            },
+        ),
+    ]
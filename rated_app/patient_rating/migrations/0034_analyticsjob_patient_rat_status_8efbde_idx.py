@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-18 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0033_patientscoresnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='analyticsjob',
+            index=models.Index(fields=['status', 'next_run'], name='patient_rat_status_8efbde_idx'),
+        ),
+    ]
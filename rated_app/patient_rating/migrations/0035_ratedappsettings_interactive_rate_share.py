@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:00
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0034_analyticsjob_patient_rat_status_8efbde_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratedappsettings',
+            name='interactive_rate_share',
+            field=models.IntegerField(default=25, help_text='Percentage of the API rate limit reserved for dashboard lookups while analytics runs', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(90)]),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0035_ratedappsettings_interactive_rate_share'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='api_calls',
+            field=models.IntegerField(default=0, help_text='Outbound API requests made by the current/last run'),
+        ),
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='estimate',
+            field=models.JSONField(blank=True, default=dict, help_text='Pre-run cost and duration estimate shown when the job was configured'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0036_analyticsjob_api_calls_analyticsjob_estimate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='pipeline_stats',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-stage throughput and queue depth of the current/last run'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:11
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0037_analyticsjob_pipeline_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratedappsettings',
+            name='shard_cache_horizon_months',
+            field=models.IntegerField(default=3, help_text='Months of appointments re-fetched on every analytics run; older months are served from the shard cache', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(24)]),
+        ),
+        migrations.CreateModel(
+            name='AppointmentShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_key', models.CharField(help_text='Hash of the API account the shard was fetched from', max_length=40)),
+                ('month_start', models.DateTimeField(help_text='Start of the month in clinic timezone')),
+                ('month_end', models.DateTimeField()),
+                ('appointment_count', models.PositiveIntegerField(default=0)),
+                ('patients', models.JSONField(default=list, help_text='One entry per patient: patient_id, first_appointment and last_appointment (API timestamps)')),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['month_start'],
+                'unique_together': {('account_key', 'month_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0039_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='compare_presets',
+            field=models.ManyToManyField(blank=True, help_text="Further presets every patient is also scored with, compared against the job's preset", related_name='comparison_jobs', to='patient_rating.scoringconfiguration'),
+        ),
+        migrations.CreateModel(
+            name='PresetComparisonResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cliniko_patient_id', models.CharField(max_length=50)),
+                ('patient_name', models.CharField(blank=True, max_length=200)),
+                ('scores', models.JSONField(default=dict, help_text='By preset ID: total_score, letter_grade and category_points')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comparison_results', to='patient_rating.analyticsjob')),
+            ],
+            options={
+                'unique_together': {('job', 'cliniko_patient_id')},
+            },
+        ),
+    ]
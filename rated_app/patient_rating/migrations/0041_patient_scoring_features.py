@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 00:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0040_analyticsjob_compare_presets_presetcomparisonresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='scoring_features',
+            field=models.JSONField(blank=True, help_text='Behavior features the stored score was calculated from (BehavioralProcessor.extract_features)', null=True),
+        ),
+    ]
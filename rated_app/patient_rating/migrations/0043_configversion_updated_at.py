@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0042_configversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configversion',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
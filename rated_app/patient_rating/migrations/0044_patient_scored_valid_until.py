@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:35
+
+from django.db import migrations, models
+
+
+def clear_fingerprints(apps, schema_editor):
+    # Scores fingerprinted before valid_until existed may already be out of
+    # date, so each is rescored once by the next incremental run
+    Patient = apps.get_model('patient_rating', 'Patient')
+    Patient.objects.exclude(scored_config_signature='').update(scored_config_signature='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0043_configversion_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='scored_valid_until',
+            field=models.DateTimeField(blank=True, help_text='When the stored score goes out of date with no record changes (appointment passing, invoice leaving the 12-month window, age change)', null=True),
+        ),
+        migrations.RunPython(clear_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0044_patient_scored_valid_until'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='adminoverride',
+            name='original_rating',
+            field=models.CharField(max_length=2),
+        ),
+        migrations.AlterField(
+            model_name='adminoverride',
+            name='override_rating',
+            field=models.CharField(max_length=2),
+        ),
+        migrations.AlterField(
+            model_name='patient',
+            name='calculated_rating',
+            field=models.CharField(blank=True, max_length=2),
+        ),
+        migrations.AlterField(
+            model_name='patient',
+            name='override_rating',
+            field=models.CharField(blank=True, max_length=2),
+        ),
+    ]
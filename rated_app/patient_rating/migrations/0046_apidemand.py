@@ -0,0 +1,21 @@
+# Generated by Django 5.2.3 on 2026-10-19 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0045_widen_rating_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiDemand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(help_text='SHA-256 of the account key', max_length=64, unique=True)),
+                ('interactive_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def create_default_configuration(apps, schema_editor):
+    # Reads of the active configuration no longer create one, so make sure
+    # there is one from the start
+    ScoringConfiguration = apps.get_model('patient_rating', 'ScoringConfiguration')
+    if ScoringConfiguration.objects.filter(is_active_for_behavior=True).exists():
+        return
+
+    config = ScoringConfiguration.objects.order_by('id').first()
+    if config:
+        config.is_active_for_behavior = True
+        config.save(update_fields=['is_active_for_behavior'])
+    else:
+        ScoringConfiguration.objects.create(
+            name="Default Configuration",
+            description="Standard RatedApp scoring weights",
+            is_active_for_behavior=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0046_apidemand'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_configuration, migrations.RunPython.noop),
+    ]
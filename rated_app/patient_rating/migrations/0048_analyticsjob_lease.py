@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-19 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patient_rating', '0047_default_scoring_configuration'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='The job may be taken over by the scheduler after this unless renewed', null=True),
+        ),
+        migrations.AddField(
+            model_name='analyticsjob',
+            name='lease_owner',
+            field=models.CharField(blank=True, help_text='Token of the run currently holding the job', max_length=32),
+        ),
+    ]
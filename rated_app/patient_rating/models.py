@@ -1,8 +1,13 @@
+import copy
+from datetime import timedelta
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 from django.utils import timezone
 
+from .scoring_plan import ScoringPlan
+
 # Software Integration Choices
 SOFTWARE_CHOICES = [
     ('cliniko', 'Cliniko'),
@@ -80,16 +85,33 @@ class Patient(models.Model):
     cliniko_patient_id = models.CharField(max_length=50, unique=True)
     patient_name = models.CharField(max_length=200, blank=True)
     total_score = models.IntegerField(default=0)
-    calculated_rating = models.CharField(max_length=1, blank=True)
+    calculated_rating = models.CharField(max_length=2, blank=True)
     override_active = models.BooleanField(default=False)
-    override_rating = models.CharField(max_length=1, blank=True)
+    override_rating = models.CharField(max_length=2, blank=True)
     last_calculated = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Data fingerprint of the last analytics score (used by incremental runs)
+    source_updated_at = models.DateTimeField(null=True, blank=True, help_text="Latest updated_at across the patient's source records when last scored")
+    scored_config_signature = models.CharField(max_length=40, blank=True, help_text="Scoring configuration signature the stored score was calculated with")
+    scored_likability = models.IntegerField(null=True, blank=True, help_text="Likability the stored score was calculated with")
+    scored_valid_until = models.DateTimeField(null=True, blank=True, help_text="When the stored score goes out of date with no record changes (appointment passing, invoice leaving the 12-month window, age change)")
+    is_stale = models.BooleanField(default=False, help_text="Not rescored by the most recent completed analytics run")
+    scoring_features = models.JSONField(null=True, blank=True, help_text="Behavior features the stored score was calculated from (BehavioralProcessor.extract_features)")
+    
     # Individual patient attributes (manual input, default 0)
     likability = models.IntegerField(default=0, validators=[MinValueValidator(-100), MaxValueValidator(100)], help_text="Patient likability score from -100 (very unlikable) to +100 (very likable)")
     
+    @classmethod
+    def likability_map(cls, cliniko_patient_ids):
+        """Saved likability by Cliniko patient ID, in one query (unknown patients are left out)"""
+        patients = cls.objects.only('cliniko_patient_id', 'likability').in_bulk(
+            [str(patient_id) for patient_id in cliniko_patient_ids],
+            field_name='cliniko_patient_id'
+        )
+        return {patient_id: patient.likability for patient_id, patient in patients.items()}
+    
     def get_letter_grade(self):
         """Convert total score to A+ through F rating"""
         if self.override_active and self.override_rating:
@@ -155,8 +177,8 @@ class PatientRawData(models.Model):
 class AdminOverride(models.Model):
     """Track admin overrides for audit purposes"""
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='overrides')
-    original_rating = models.CharField(max_length=1)
-    override_rating = models.CharField(max_length=1)
+    original_rating = models.CharField(max_length=2)
+    override_rating = models.CharField(max_length=2)
     admin_user = models.CharField(max_length=100)
     reason = models.TextField(blank=True)
     override_date = models.DateTimeField(auto_now_add=True)
@@ -169,6 +191,25 @@ class AdminOverride(models.Model):
 class ScoringConfiguration(models.Model):
     """Store configurable scoring weights for behavioral analysis"""
     
+    # Every field that affects a patient's score (brackets are related models)
+    SCORING_FIELDS = [
+        'future_appointments_weight',
+        'age_demographics_weight',
+        'yearly_spend_weight',
+        'consecutive_attendance_weight',
+        'referrer_score_weight',
+        'points_per_consecutive_attendance',
+        'points_per_referral',
+        'likability_weight',
+        'cancellations_weight',
+        'points_per_cancellation',
+        'dna_weight',
+        'points_per_dna',
+        'unpaid_invoices_weight',
+        'points_per_unpaid_invoice',
+        'open_dna_invoice_weight',
+    ]
+    
     name = models.CharField(max_length=100, default="Default Configuration")
     description = models.TextField(blank=True)
     
@@ -219,18 +260,69 @@ class ScoringConfiguration(models.Model):
             ScoringConfiguration.objects.filter(is_active_for_analytics=True).exclude(id=self.id).update(is_active_for_analytics=False)
         super().save(*args, **kwargs)
     
+    def scoring_signature(self):
+        """
+        Hash of all weights and brackets that affect scoring
+        
+        Two configurations with the same signature produce identical scores,
+        so incremental analytics can carry scores forward while it is unchanged.
+        """
+        import hashlib
+        import json
+        
+        payload = {
+            'weights': [getattr(self, field) for field in self.SCORING_FIELDS],
+            'age_brackets': [
+                [bracket.min_age, bracket.max_age, bracket.percentage]
+                for bracket in self.age_brackets.all().order_by('order')
+            ],
+            'spend_brackets': [
+                [str(bracket.min_spend), str(bracket.max_spend), bracket.percentage]
+                for bracket in self.spend_brackets.all().order_by('order')
+            ],
+        }
+        return hashlib.sha1(json.dumps(payload).encode()).hexdigest()
+    
+    def compile(self):
+        """
+        Precompute weights and brackets into an immutable ScoringPlan
+        
+        Scoring with the plan needs no database access, so runs compile once
+        instead of querying brackets for every patient.
+        """
+        return ScoringPlan.from_config(self)
+    
     @classmethod
     def get_active_config(cls):
-        """Get the currently active scoring configuration for behavior"""
-        try:
-            return cls.objects.get(is_active_for_behavior=True)
-        except cls.DoesNotExist:
-            # Create default configuration if none exists
-            return cls.objects.create(
-                name="Default Configuration",
-                description="Standard RatedApp scoring weights",
-                is_active_for_behavior=True
-            )
+        """
+        Get the currently active scoring configuration for behavior
+        
+        Served from the process-wide config cache with its brackets
+        prefetched; each caller gets its own copy, so unsaved edits (testing
+        weights) never leak into other requests. None if no configuration is
+        active.
+        """
+        from .config_cache import config_cache
+        return copy.copy(config_cache.get('active_behavior_config', cls._load_active_config))
+    
+    @classmethod
+    def active_plan(cls):
+        """
+        Compiled ScoringPlan of the active behavior configuration, cached like
+        get_active_config(); None if no configuration is active
+        """
+        from .config_cache import config_cache
+        
+        def compile_active():
+            config = cls.get_active_config()
+            return config.compile() if config else None
+        
+        return config_cache.get('active_behavior_plan', compile_active)
+    
+    @classmethod
+    def _load_active_config(cls):
+        # The default configuration is created by migration 0047, not on read
+        return cls.objects.filter(is_active_for_behavior=True).prefetch_related('age_brackets', 'spend_brackets').first()
 
 class AgeBracket(models.Model):
     config = models.ForeignKey(ScoringConfiguration, on_delete=models.CASCADE, related_name='age_brackets')
@@ -372,6 +464,18 @@ class RatedAppSettings(models.Model):
     def __str__(self):
         return f"{self.clinic_name} Settings ({self.software_type})"
 
+    @classmethod
+    def cached(cls):
+        """
+        The clinic settings row, from the process-wide config cache
+        
+        For read paths; each caller gets its own copy. Code that changes and
+        saves the settings should load them with objects.first() instead.
+        """
+        from .config_cache import config_cache
+        settings = config_cache.get('settings', lambda: cls.objects.first())
+        return copy.copy(settings) if settings is not None else None
+
     class Meta:
         verbose_name = "RatedApp Clinic Settings"
         verbose_name_plural = "RatedApp Clinic Settings"
@@ -397,10 +501,23 @@ class RatedAppSettings(models.Model):
         related_name='+',
         help_text="Reference to the current/last analytics job"
     )
+    interactive_rate_share = models.IntegerField(
+        default=25,
+        validators=[MinValueValidator(0), MaxValueValidator(90)],
+        help_text="Percentage of the API rate limit reserved for dashboard lookups while analytics runs"
+    )
+    shard_cache_horizon_months = models.IntegerField(
+        default=3,
+        validators=[MinValueValidator(1), MaxValueValidator(24)],
+        help_text="Months of appointments re-fetched on every analytics run; older months are served from the shard cache"
+    )
 
 class AnalyticsJob(models.Model):
     """Manages scheduled analytics processing jobs"""
     
+    # A running job's worker renews its lease well within this (see JobControl)
+    RUN_LEASE = timedelta(minutes=10)
+    
     FREQUENCY_CHOICES = [
         ('daily', 'Daily'),
         ('weekly', 'Weekly'),
@@ -410,6 +527,7 @@ class AnalyticsJob(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('running', 'Analysing...'),
+        ('paused', 'Paused'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
         ('cancelled', 'Cancelled'),
@@ -489,6 +607,11 @@ class AnalyticsJob(models.Model):
     patients_failed = models.IntegerField(default=0)
     
     # Processing state (for resumability)
+    cohort = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Patients selected for the current run, kept so a paused or interrupted run can resume"
+    )
     processed_patient_ids = models.JSONField(
         default=list, 
         blank=True,
@@ -508,6 +631,58 @@ class AnalyticsJob(models.Model):
     
     # Cancellation flag
     cancel_requested = models.BooleanField(default=False)
+    pause_requested = models.BooleanField(default=False)
+    
+    # Lease held by the worker running the job
+    lease_owner = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Token of the run currently holding the job"
+    )
+    lease_expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="The job may be taken over by the scheduler after this unless renewed"
+    )
+    
+    # Incremental processing
+    incremental = models.BooleanField(
+        default=True,
+        help_text="Only rescore patients whose source data or scoring configuration changed since the last run"
+    )
+    changes_since = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Cut-off used for the current run's change feed"
+    )
+    patients_skipped = models.IntegerField(
+        default=0,
+        help_text="Patients whose previous score was carried forward unchanged"
+    )
+    
+    # Preset comparison
+    compare_presets = models.ManyToManyField(
+        ScoringConfiguration,
+        blank=True,
+        related_name='comparison_jobs',
+        help_text="Further presets every patient is also scored with, compared against the job's preset"
+    )
+    
+    # Cost tracking
+    estimate = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Pre-run cost and duration estimate shown when the job was configured"
+    )
+    api_calls = models.IntegerField(
+        default=0,
+        help_text="Outbound API requests made by the current/last run"
+    )
+    pipeline_stats = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Per-stage throughput and queue depth of the current/last run"
+    )
     
     # Metadata
     created_by = models.CharField(max_length=100, blank=True)
@@ -518,105 +693,100 @@ class AnalyticsJob(models.Model):
         ordering = ['-created_at']
         verbose_name = "Analytics Job"
         verbose_name_plural = "Analytics Jobs"
+        indexes = [
+            # Scheduler lookup of due jobs
+            models.Index(fields=['status', 'next_run']),
+        ]
     
     def __str__(self):
         return f"Analytics Job - {self.get_status_display()} - {self.created_at}"
     
-    def calculate_next_run(self):
-        """Calculate next run time based on frequency and schedule"""
-        from datetime import datetime, timedelta
-        import pytz
-        
-        settings = RatedAppSettings.objects.first()
-        clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
-        now = datetime.now(clinic_tz)
-        
-        # Create scheduled datetime for today
-        scheduled = now.replace(
-            hour=self.scheduled_time.hour,
-            minute=self.scheduled_time.minute,
-            second=0,
-            microsecond=0
+    def hold_lease(self):
+        """Cover a run being started until its worker takes the lease (caller saves)"""
+        self.lease_owner = ''
+        self.lease_expires_at = timezone.now() + self.RUN_LEASE
+    
+    @classmethod
+    def lapsed(cls):
+        """Running jobs whose worker has stopped renewing its lease"""
+        now = timezone.now()
+        return cls.objects.filter(status='running').filter(
+            models.Q(lease_expires_at__lt=now) |
+            # Started before leases were recorded
+            models.Q(lease_expires_at__isnull=True, updated_at__lt=now - cls.RUN_LEASE)
         )
-        
-        if self.frequency == 'daily':
-            # If scheduled time has passed today, schedule for tomorrow
-            if scheduled <= now:
-                scheduled += timedelta(days=1)
-                
-        elif self.frequency == 'weekly':
-            # Find next occurrence of scheduled day
-            days_ahead = self.scheduled_day - now.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
-                days_ahead += 7
-            scheduled += timedelta(days=days_ahead)
-            
-        self.next_run = scheduled
-        return scheduled
     
-    def calculate_next_run(self):
-        """Calculate next run time based on frequency and schedule"""
-        from datetime import datetime, timedelta
-        import pytz
+    def take_over(self) -> bool:
+        """
+        Claim this running job for a new run if its lease has lapsed
         
-        settings = RatedAppSettings.objects.first()
-        clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
-        now = datetime.now(clinic_tz)
+        Conditional on the lease being unchanged since the job was loaded, so
+        only one scheduler or sweep wins; the new run's worker then takes the
+        lease with its own token.
         
-        # Create scheduled datetime for today
-        scheduled = now.replace(
-            hour=self.scheduled_time.hour,
-            minute=self.scheduled_time.minute,
-            second=0,
-            microsecond=0
-        )
-        
-        if self.frequency == 'daily':
-            # If scheduled time has passed today, schedule for tomorrow
-            if scheduled <= now:
-                scheduled += timedelta(days=1)
-                
-        elif self.frequency == 'weekly':
-            # Find next occurrence of scheduled day
-            days_ahead = self.scheduled_day - now.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
-                days_ahead += 7
-            scheduled += timedelta(days=days_ahead)
-            
-        self.next_run = scheduled
-        return scheduled
+        :return: True if this caller now holds the job
+        """
+        return bool(AnalyticsJob.lapsed().filter(
+            id=self.pk,
+            lease_owner=self.lease_owner,
+            lease_expires_at=self.lease_expires_at
+        ).update(lease_owner='', lease_expires_at=timezone.now() + self.RUN_LEASE))
     
-    def calculate_next_run(self):
-        """Calculate next run time based on frequency and schedule"""
+    def calculate_next_run(self, now=None):
+        """
+        Calculate next run time based on frequency and schedule
+        
+        Works on the clinic's calendar date and localizes the result, so the run
+        stays at scheduled_time across DST changes. A time that falls in the
+        spring-forward gap runs an hour later that day.
+        
+        :param now: Time to schedule from (defaults to the current time)
+        """
         from datetime import datetime, timedelta
         import pytz
         
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
-        now = datetime.now(clinic_tz)
+        now = now.astimezone(clinic_tz) if now else datetime.now(clinic_tz)
         
-        # Create scheduled datetime for today
-        scheduled = now.replace(
-            hour=self.scheduled_time.hour,
-            minute=self.scheduled_time.minute,
-            second=0,
-            microsecond=0
-        )
+        def scheduled_on(day):
+            naive = datetime.combine(day, self.scheduled_time.replace(second=0, microsecond=0))
+            return clinic_tz.normalize(clinic_tz.localize(naive))
+        
+        day = now.date()
         
         if self.frequency == 'daily':
             # If scheduled time has passed today, schedule for tomorrow
-            if scheduled <= now:
-                scheduled += timedelta(days=1)
+            if scheduled_on(day) <= now:
+                day += timedelta(days=1)
                 
         elif self.frequency == 'weekly':
-            # Find next occurrence of scheduled day
+            # Find next occurrence of scheduled day (later today still counts)
             days_ahead = self.scheduled_day - now.weekday()
-            if days_ahead <= 0:  # Target day already happened this week
+            if days_ahead < 0 or (days_ahead == 0 and scheduled_on(day) <= now):
                 days_ahead += 7
-            scheduled += timedelta(days=days_ahead)
+            day += timedelta(days=days_ahead)
             
-        self.next_run = scheduled
-        return scheduled
+        self.next_run = scheduled_on(day)
+        return self.next_run
+    
+    def estimate_comparison(self):
+        """Pre-run estimate next to the actual numbers of the finished run"""
+        if not self.estimate or not self.last_run_started or not self.last_run_completed:
+            return None
+        
+        return {
+            'estimated': {
+                'cohort': self.estimate.get('cohort'),
+                'api_calls': self.estimate.get('api_calls'),
+                'duration_seconds': self.estimate.get('duration_seconds'),
+            },
+            'actual': {
+                'cohort': self.total_patients,
+                'api_calls': self.api_calls,
+                'duration_seconds': round((self.last_run_completed - self.last_run_started).total_seconds()),
+            },
+        }
     
     def get_date_range_dates(self):
         """Get actual start and end dates based on date_range setting"""
@@ -624,7 +794,7 @@ class AnalyticsJob(models.Model):
         from dateutil.relativedelta import relativedelta
         import pytz
         
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
         
         end_date = datetime.now(clinic_tz)
@@ -647,7 +817,7 @@ class AnalyticsJob(models.Model):
     def mark_completed(self):
         """Mark job as completed and calculate next run"""
         self.status = 'completed'
-        self.last_run_completed = datetime.now()
+        self.last_run_completed = timezone.now()
         
         if self.frequency in ['daily', 'weekly']:
             self.calculate_next_run()
@@ -658,13 +828,13 @@ class AnalyticsJob(models.Model):
     def mark_failed(self, error_message):
         """Mark job as failed with error message"""
         self.status = 'failed'
-        self.error_log = f"{self.error_log}\n{datetime.now()}: {error_message}".strip()
+        self.error_log = f"{self.error_log}\n{timezone.now()}: {error_message}".strip()
         self.save()
     
     def mark_completed(self):
         """Mark job as completed and calculate next run"""
         self.status = 'completed'
-        self.last_run_completed = datetime.now()
+        self.last_run_completed = timezone.now()
         
         if self.frequency in ['daily', 'weekly']:
             self.calculate_next_run()
@@ -675,13 +845,13 @@ class AnalyticsJob(models.Model):
     def mark_failed(self, error_message):
         """Mark job as failed with error message"""
         self.status = 'failed'
-        self.error_log = f"{self.error_log}\n{datetime.now()}: {error_message}".strip()
+        self.error_log = f"{self.error_log}\n{timezone.now()}: {error_message}".strip()
         self.save()
     
     def mark_completed(self):
         """Mark job as completed and calculate next run"""
         self.status = 'completed'
-        self.last_run_completed = datetime.now()
+        self.last_run_completed = timezone.now()
         
         if self.frequency in ['daily', 'weekly']:
             self.calculate_next_run()
@@ -692,26 +862,209 @@ class AnalyticsJob(models.Model):
     def mark_failed(self, error_message):
         """Mark job as failed with error message"""
         self.status = 'failed'
-        self.error_log = f"{self.error_log}\n{datetime.now()}: {error_message}".strip()
+        self.error_log = f"{self.error_log}\n{timezone.now()}: {error_message}".strip()
         self.save()
     
     def should_run_now(self):
         """Check if job should run based on schedule"""
-        from datetime import datetime
-        import pytz
-        
         if self.status != 'pending':
             return False
             
         if self.frequency == 'manual':
             return False
-            
-        settings = RatedAppSettings.objects.first()
-        clinic_tz = pytz.timezone(settings.clinic_timezone or 'Australia/Sydney')
-        now = datetime.now(clinic_tz)
         
-        if self.next_run and now >= self.next_run:
+        # next_run is timezone-aware, so no clinic timezone lookup is needed
+        if self.next_run and timezone.now() >= self.next_run:
             return True
             
         return False
 
+
+
+class PatientScoreSnapshot(models.Model):
+    """Append-only history of analytics scores, one row per patient per job run"""
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='score_snapshots')
+    job = models.ForeignKey(
+        AnalyticsJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='score_snapshots',
+        help_text="Analytics job that produced the score (kept when the job is deleted)"
+    )
+    snapshot_date = models.DateField(help_text="Run date in clinic timezone")
+    total_score = models.IntegerField()
+    letter_grade = models.CharField(max_length=2)
+    category_points = models.JSONField(default=dict, help_text="Points per behavior category")
+    carried_forward = models.BooleanField(default=False, help_text="Copied from the previous snapshot by an incremental run")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['snapshot_date']
+        unique_together = ['patient', 'job', 'snapshot_date']
+        indexes = [
+            models.Index(fields=['patient', 'snapshot_date']),
+            models.Index(fields=['snapshot_date', 'letter_grade']),
+        ]
+    
+    def __str__(self):
+        return f"{self.patient.cliniko_patient_id} {self.snapshot_date}: {self.letter_grade} ({self.total_score}pts)"
+    
+    @classmethod
+    def trend(cls, cliniko_patient_id, start_date=None, end_date=None):
+        """Score history for one patient, oldest first"""
+        snapshots = cls.objects.filter(patient__cliniko_patient_id=cliniko_patient_id)
+        if start_date:
+            snapshots = snapshots.filter(snapshot_date__gte=start_date)
+        if end_date:
+            snapshots = snapshots.filter(snapshot_date__lte=end_date)
+        
+        return snapshots.order_by('snapshot_date', 'id').values(
+            'snapshot_date', 'total_score', 'letter_grade', 'category_points', 'job_id'
+        )
+    
+    @classmethod
+    def grade_migration(cls, from_date, to_date, job=None):
+        """
+        Count patients by (grade on from_date, grade on to_date)
+        
+        Patients without a snapshot on from_date are reported with a
+        from grade of None (new to the cohort).
+        """
+        snapshots = cls.objects.filter(snapshot_date=to_date)
+        earlier = cls.objects.filter(patient=models.OuterRef('patient'), snapshot_date=from_date)
+        if job:
+            snapshots = snapshots.filter(job=job)
+            earlier = earlier.filter(job=job)
+        
+        return snapshots.annotate(
+            from_grade=models.Subquery(earlier.order_by('-id').values('letter_grade')[:1])
+        ).values('from_grade', 'letter_grade').annotate(
+            patients=models.Count('id')
+        ).order_by('from_grade', 'letter_grade')
+
+
+class PresetComparisonResult(models.Model):
+    """
+    One patient's score under each preset of a comparison job
+    
+    Scored from the same fetched data as the job's own score, so comparing
+    presets costs no extra API calls. Rows are replaced when the job reruns.
+    """
+    job = models.ForeignKey(AnalyticsJob, on_delete=models.CASCADE, related_name='comparison_results')
+    cliniko_patient_id = models.CharField(max_length=50)
+    patient_name = models.CharField(max_length=200, blank=True)
+    scores = models.JSONField(
+        default=dict,
+        help_text="By preset ID: total_score, letter_grade and category_points"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['job', 'cliniko_patient_id']
+    
+    def __str__(self):
+        return f"Job {self.job_id} comparison for {self.cliniko_patient_id}"
+
+
+class AppointmentShard(models.Model):
+    """
+    Cohort discovery result for one calendar month of appointments
+    
+    Only months older than the clinic's shard_cache_horizon_months are stored.
+    They are treated as frozen and never re-fetched, so long analytics date
+    ranges only pull the recent months from the API.
+    """
+    account_key = models.CharField(max_length=40, help_text="Hash of the API account the shard was fetched from")
+    month_start = models.DateTimeField(help_text="Start of the month in clinic timezone")
+    month_end = models.DateTimeField()
+    appointment_count = models.PositiveIntegerField(default=0)
+    patients = models.JSONField(
+        default=list,
+        help_text="One entry per patient: patient_id, first_appointment and last_appointment (API timestamps)"
+    )
+    fetched_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['month_start']
+        unique_together = ['account_key', 'month_start']
+    
+    def __str__(self):
+        return f"{self.month_start:%Y-%m}: {len(self.patients)} patients"
+
+
+class OutboxEmail(models.Model):
+    """
+    Queued outgoing email, delivered by the background outbox sender
+    
+    SMTP credentials are read from RatedAppSettings at send time, so only the
+    rendered message is stored here.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    job = models.ForeignKey(
+        AnalyticsJob,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails',
+        help_text="Analytics job the report belongs to"
+    )
+    from_address = models.EmailField(max_length=254)
+    to_address = models.EmailField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the sender may next pick this email up (retry backoff, or the claim lease while sending)"
+    )
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.to_address} ({self.status})"
+
+
+class ConfigVersion(models.Model):
+    """
+    Change counter for data cached in every process (see config_cache)
+    
+    Bumped whenever clinic settings or scoring configurations change, so
+    other workers drop their cached copies on their next version check.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    # Set on every bump (queryset updates skip auto_now)
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ApiDemand(models.Model):
+    """
+    When each API account last had an interactive request, in any process
+    
+    Rate budgets are kept per process, so the analytics process only learns
+    that web workers are serving lookups from this row (see
+    integrations.rate_budget).
+    """
+    account = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the account key")
+    interactive_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.account[:12]} at {self.interactive_at}"
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from .behavioral_processor import GRADE_THRESHOLDS, SCORE_CATEGORIES
+
+# Letter grades, best first
+GRADES = [grade for _, grade in GRADE_THRESHOLDS] + ['F']
+
+
+def comparison_scores(result: Dict) -> Dict:
+    """Compact form of a process_patient_behavior result stored per preset"""
+    return {
+        'total_score': result['total_score'],
+        'letter_grade': result['letter_grade'],
+        'category_points': {category: data['points'] for category, data in result['behavior_data'].items()},
+    }
+
+
+def comparison_plans(job) -> List:
+    """(preset ID, compiled ScoringPlan) for each preset compared with the job's own"""
+    return [
+        (str(preset.pk), preset.compile())
+        for preset in job.compare_presets.exclude(pk=job.preset_id).prefetch_related('age_brackets', 'spend_brackets')
+    ]
+
+
+def comparison_report(job) -> Dict:
+    """
+    Compare the grades a comparison job's presets gave the same cohort
+
+    The job's own preset is the baseline every other preset is compared with.
+
+    :param job: AnalyticsJob with compare_presets
+    :return: Dictionary with presets (baseline first), patients,
+             grade_distribution and score/category averages by preset ID,
+             grade transitions and category deltas against the baseline by
+             preset ID, and changes - the patients whose grade differs from
+             the baseline under any preset
+    """
+    baseline = str(job.preset_id)
+    presets = [job.preset] + [preset for preset in job.compare_presets.order_by('id') if preset.pk != job.preset_id]
+    preset_ids = [str(preset.pk) for preset in presets]
+    others = preset_ids[1:]
+
+    patients = 0
+    grade_distribution = {preset_id: dict.fromkeys(GRADES, 0) for preset_id in preset_ids}
+    score_totals = dict.fromkeys(preset_ids, 0)
+    category_totals = {preset_id: dict.fromkeys(SCORE_CATEGORIES, 0) for preset_id in preset_ids}
+    transitions = {preset_id: defaultdict(int) for preset_id in others}
+    changes = []
+
+    rows = job.comparison_results.order_by('id').values_list('cliniko_patient_id', 'patient_name', 'scores')
+    for patient_id, patient_name, scores in rows.iterator():
+        # Presets added after the row was scored can't be compared for it
+        if any(preset_id not in scores for preset_id in preset_ids):
+            continue
+        patients += 1
+
+        for preset_id in preset_ids:
+            score = scores[preset_id]
+            grade_distribution[preset_id][score['letter_grade']] += 1
+            score_totals[preset_id] += score['total_score']
+            for category, points in score['category_points'].items():
+                category_totals[preset_id][category] = category_totals[preset_id].get(category, 0) + points
+
+        baseline_grade = scores[baseline]['letter_grade']
+        changed = False
+        for preset_id in others:
+            grade = scores[preset_id]['letter_grade']
+            if grade != baseline_grade:
+                transitions[preset_id][f"{baseline_grade}->{grade}"] += 1
+                changed = True
+
+        if changed:
+            changes.append({
+                'patient_id': patient_id,
+                'patient_name': patient_name,
+                'grades': {preset_id: scores[preset_id]['letter_grade'] for preset_id in preset_ids},
+                'scores': {preset_id: scores[preset_id]['total_score'] for preset_id in preset_ids},
+            })
+
+    def average(total):
+        return round(total / patients, 2) if patients else 0
+
+    average_points = {
+        preset_id: {category: average(total) for category, total in category_totals[preset_id].items()}
+        for preset_id in preset_ids
+    }
+
+    return {
+        'baseline': baseline,
+        'presets': [{'id': str(preset.pk), 'name': preset.name} for preset in presets],
+        'patients': patients,
+        'grade_distribution': grade_distribution,
+        'average_score': {preset_id: average(total) for preset_id, total in score_totals.items()},
+        'average_category_points': average_points,
+        'grade_transitions': {preset_id: dict(counts) for preset_id, counts in transitions.items()},
+        'category_deltas': {
+            preset_id: {
+                category: average(total - category_totals[baseline].get(category, 0))
+                for category, total in category_totals[preset_id].items()
+            }
+            for preset_id in others
+        },
+        'changes': changes,
+    }
+
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import AnalyticsJob, RatedAppSettings
+
+# Seconds between change-stamp queries while a job is running / otherwise
+RUNNING_CHECK_SECONDS = 1
+IDLE_CHECK_SECONDS = 5
+# Seconds between a stream's looks at the shared snapshot (no queries)
+STREAM_TICK_SECONDS = 1
+# Comment sent on a quiet stream so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+# A stream is closed after this long; the browser reconnects with Last-Event-ID
+STREAM_SECONDS = 300
+# Browser reconnect delay after a stream ends (ms)
+RETRY_MS = 2000
+# Without ASGI each event is its own request, so the reconnect delay is the
+# poll interval the dashboard used before (ms)
+WSGI_RUNNING_RETRY_MS = 2000
+WSGI_IDLE_RETRY_MS = 30000
+
+ACTIVE_STATUSES = ('running', 'paused')
+
+
+def analytics_status_data() -> Dict:
+    """Status of the latest analytics job, as returned by the analytics status endpoint"""
+    settings = RatedAppSettings.objects.select_related('analytics_last_job').first()
+    if not settings or not settings.analytics_last_job:
+        return {
+            'success': True,
+            'status': 'not_configured'
+        }
+
+    job = settings.analytics_last_job
+
+    # Calculate progress percentage
+    progress = 0
+    if job.total_patients > 0:
+        progress = int((job.patients_processed / job.total_patients) * 100)
+
+    data = {
+        'success': True,
+        'status': job.status,
+        'progress': progress,
+        'patients_processed': job.patients_processed,
+        'total_patients': job.total_patients,
+        'patients_failed': job.patients_failed,
+        'patients_skipped': job.patients_skipped,
+        'pause_requested': job.pause_requested,
+        'last_run_started': job.last_run_started.isoformat() if job.last_run_started else None,
+        'last_run_completed': job.last_run_completed.isoformat() if job.last_run_completed else None,
+        'next_run': job.next_run.isoformat() if job.next_run else None,
+        'api_calls': job.api_calls,
+        'pipeline_stats': job.pipeline_stats,
+        'estimate_comparison': job.estimate_comparison() if job.status in ['completed', 'partial', 'pending'] else None,
+    }
+
+    # Format status message
+    if job.status == 'running':
+        data['message'] = f'Analysing... ({job.patients_processed}/{job.total_patients})'
+    elif job.status == 'paused':
+        data['message'] = f'Paused ({job.patients_processed}/{job.total_patients})'
+    elif job.status == 'completed':
+        if job.last_run_completed:
+            completed_time = job.last_run_completed.strftime('%Y-%m-%d %H:%M')
+            data['message'] = f'Completed ({completed_time})'
+        else:
+            data['message'] = 'Completed'
+    elif job.status == 'partial':
+        data['message'] = f'Partial Completion ({job.patients_processed}/{job.total_patients})'
+    elif job.status == 'failed':
+        data['message'] = 'Failed - Check error log'
+    elif job.status == 'cancelled':
+        data['message'] = 'Cancelled by user'
+    else:
+        data['message'] = 'Ready to run'
+
+    # Add error information if available
+    if job.error_log:
+        data['errors'] = job.error_log[-500:]  # Last 500 chars of error log
+
+    return data
+
+
+class StatusHub:
+    """
+    Latest analytics status, shared by every open stream in this process
+
+    Streams read the cached snapshot; it is only rebuilt when the job has
+    changed. Saves made in this process mark it stale straight away through
+    model signals, and changes made elsewhere (the scheduler process, queryset
+    updates) are found by one change-stamp query per check interval, however
+    many dashboards are watching.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stale = True
+        self._checked = 0.0
+        self._stamp = None
+        self._snapshot = None
+
+    def mark_stale(self):
+        self._stale = True
+
+    def current(self) -> Tuple[str, Dict]:
+        """
+        The current status and its event ID (a digest, equal across processes)
+
+        :return: (event ID, status dictionary)
+        """
+        with self._lock:
+            now = time.monotonic()
+            since_check = now - self._checked
+            running = self._snapshot is not None and self._snapshot[1].get('status') == 'running'
+            interval = RUNNING_CHECK_SECONDS if running else IDLE_CHECK_SECONDS
+
+            # A running job saves after every patient, so saves in this
+            # process are still only looked at once per RUNNING_CHECK_SECONDS
+            if self._snapshot is None or (self._stale and since_check >= RUNNING_CHECK_SECONDS):
+                self._refresh(now, self._current_stamp())
+            elif since_check >= interval:
+                stamp = self._current_stamp()
+                if stamp != self._stamp:
+                    self._refresh(now, stamp)
+                self._checked = now
+            return self._snapshot
+
+    def _current_stamp(self):
+        return RatedAppSettings.objects.values_list(
+            'analytics_last_job_id', 'analytics_last_job__updated_at'
+        ).first()
+
+    def _refresh(self, now: float, stamp):
+        self._stale = False
+        self._checked = now
+        self._stamp = stamp
+        data = analytics_status_data()
+        body = json.dumps(data, sort_keys=True, default=str)
+        self._snapshot = (hashlib.sha1(body.encode()).hexdigest()[:16], data)
+
+
+status_hub = StatusHub()
+
+
+@receiver(post_save, sender=AnalyticsJob, dispatch_uid='analytics_status_job_saved')
+@receiver(post_save, sender=RatedAppSettings, dispatch_uid='analytics_status_settings_saved')
+def status_source_saved(sender, **kwargs):
+    status_hub.mark_stale()
+
+
+def status_event(event_id: str, data: Dict, event: str = 'status', retry: Optional[int] = None) -> str:
+    """One server-sent event carrying a status dictionary"""
+    lines = [f"retry: {retry}"] if retry else []
+    lines += [f"id: {event_id}", f"event: {event}", f"data: {json.dumps(data, default=str)}"]
+    return '\n'.join(lines) + '\n\n'
+
+
+async def status_events(last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Server-sent analytics status events for one stream, sent only on change
+
+    Events are named ``status``, or ``complete`` when a job this stream saw
+    running or paused has finished. Ends after STREAM_SECONDS.
+
+    :param last_event_id: ID of the last event the browser received, so an
+                          unchanged status isn't sent again on reconnect
+    """
+    loop = asyncio.get_running_loop()
+    started = last_sent = loop.time()
+    sent_id = last_event_id
+    previous_status = None
+
+    yield f"retry: {RETRY_MS}\n\n"
+    while loop.time() - started < STREAM_SECONDS:
+        event_id, data = await sync_to_async(status_hub.current)()
+        status = data.get('status')
+
+        if event_id != sent_id:
+            finished = previous_status in ACTIVE_STATUSES and status not in ACTIVE_STATUSES
+            yield status_event(event_id, data, 'complete' if finished else 'status')
+            sent_id, last_sent = event_id, loop.time()
+        elif loop.time() - last_sent >= HEARTBEAT_SECONDS:
+            yield ': keep-alive\n\n'
+            last_sent = loop.time()
+
+        previous_status = status
+        await asyncio.sleep(STREAM_TICK_SECONDS)
+
+
+def single_status_event(last_event_id: Optional[str] = None) -> str:
+    """
+    One event for servers that can't hold a stream open (WSGI)
+
+    The browser's reconnect delay stands in for polling, at the same rate the
+    dashboard polled before; an unchanged status is answered with a comment only.
+    """
+    event_id, data = status_hub.current()
+    retry = WSGI_RUNNING_RETRY_MS if data.get('status') in ACTIVE_STATUSES else WSGI_IDLE_RETRY_MS
+    if event_id == last_event_id:
+        return f"retry: {retry}\n: unchanged\n\n"
+    return status_event(event_id, data, retry=retry)
@@ -0,0 +1,203 @@
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this are logged at WARNING (settings.SLOW_REQUEST_MS overrides)
+DEFAULT_SLOW_REQUEST_MS = 1000
+
+
+class RequestTally:
+    """
+    Time spent by one request in the database and in outbound API calls
+
+    Found through a context variable, so queries and calls made in
+    sync_to_async threads (and fetch pools that copy the context) count
+    towards the request that started them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.api_calls = 0
+        self.api_seconds = 0.0
+
+    def add_query(self, seconds: float):
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+
+    def add_api_call(self, seconds: float):
+        with self._lock:
+            self.api_calls += 1
+            self.api_seconds += seconds
+
+
+current_tally: contextvars.ContextVar[Optional[RequestTally]] = contextvars.ContextVar('request_tally', default=None)
+
+
+def record_api_call(seconds: float):
+    """Count one outbound API request towards the current request, if any"""
+    tally = current_tally.get()
+    if tally is not None:
+        tally.add_api_call(seconds)
+
+
+def _timed_query(execute, sql, params, many, context):
+    tally = current_tally.get()
+    if tally is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tally.add_query(time.perf_counter() - started)
+
+
+@receiver(connection_created, dispatch_uid='request_metrics_connection_created')
+def time_connection_queries(sender, connection, **kwargs):
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+class ViewStats:
+    """
+    Running totals per view (and dashboard action) since this process started
+
+    Kept in memory only; each worker reports its own share.
+    """
+
+    FIELDS = ('requests', 'slow', 'total_ms', 'max_ms', 'queries', 'query_ms', 'api_calls', 'api_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views: Dict[str, Dict[str, float]] = {}
+        self.since = timezone.now()
+
+    def add(self, name: str, elapsed_ms: float, tally: RequestTally, slow: bool):
+        with self._lock:
+            stats = self._views.setdefault(name, dict.fromkeys(self.FIELDS, 0))
+            stats['requests'] += 1
+            stats['slow'] += int(slow)
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['queries'] += tally.queries
+            stats['query_ms'] += tally.query_seconds * 1000
+            stats['api_calls'] += tally.api_calls
+            stats['api_ms'] += tally.api_seconds * 1000
+
+    def snapshot(self) -> Dict:
+        """
+        Totals and per-request averages, slowest average first
+
+        :return: Dictionary with since (ISO time) and views, a list of
+                 dictionaries with view plus the FIELDS totals and avg_ms,
+                 avg_queries and avg_api_calls
+        """
+        with self._lock:
+            views = [dict(stats, view=name) for name, stats in self._views.items()]
+
+        for stats in views:
+            count = stats['requests']
+            stats['avg_ms'] = round(stats['total_ms'] / count, 1)
+            stats['avg_queries'] = round(stats['queries'] / count, 1)
+            stats['avg_api_calls'] = round(stats['api_calls'] / count, 1)
+            for field in ('total_ms', 'max_ms', 'query_ms', 'api_ms'):
+                stats[field] = round(stats[field], 1)
+
+        views.sort(key=lambda stats: -stats['avg_ms'])
+        return {'since': self.since.isoformat(), 'views': views}
+
+
+view_stats = ViewStats()
+
+
+def view_label(request) -> str:
+    """URL name of the view that handled ``request``, plus the dashboard action for AJAX posts"""
+    match = getattr(request, 'resolver_match', None)
+    label = match.view_name if match and match.view_name else 'unresolved'
+    if request.method == 'POST' and request.content_type in ('application/x-www-form-urlencoded', 'multipart/form-data'):
+        action = request.POST.get('action')
+        if action:
+            label = f"{label}:{action}"
+    return label
+
+
+class RequestTimingMiddleware:
+    """
+    Time each request and attribute it to its view
+
+    Records wall time, database queries and outbound API calls (count and
+    time) per request. Requests slower than SLOW_REQUEST_MS are logged at
+    WARNING as one key=value line; every request is logged at DEBUG. The
+    same numbers are sent to the browser in a Server-Timing header and
+    added to view_stats for the request metrics endpoint.
+
+    For streaming responses the time is to the first byte, not the end of
+    the stream.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tally = RequestTally()
+        token = current_tally.set(tally)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_tally.reset(token)
+        self.record(request, response, tally)
+        return response
+
+    async def __acall__(self, request):
+        tally = RequestTally()
+        token = current_tally.set(tally)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_tally.reset(token)
+        self.record(request, response, tally)
+        return response
+
+    def record(self, request, response, tally: RequestTally):
+        elapsed_ms = (time.perf_counter() - tally.started) * 1000
+        label = view_label(request)
+        slow = elapsed_ms >= self.slow_ms
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={tally.query_seconds * 1000:.1f};desc="{tally.queries} queries"',
+            f'api;dur={tally.api_seconds * 1000:.1f};desc="{tally.api_calls} API calls"',
+            f'total;dur={elapsed_ms:.1f}',
+        ])
+        view_stats.add(label, elapsed_ms, tally, slow)
+
+        if slow or logger.isEnabledFor(logging.DEBUG):
+            line = (
+                f"view={label} method={request.method} path={request.path} status={response.status_code} "
+                f"ms={elapsed_ms:.0f} queries={tally.queries} query_ms={tally.query_seconds * 1000:.0f} "
+                f"api_calls={tally.api_calls} api_ms={tally.api_seconds * 1000:.0f}"
+            )
+            if slow:
+                logger.warning(f"Slow request {line}")
+            else:
+                logger.debug(f"Request {line}")
@@ -0,0 +1,155 @@
+import heapq
+import logging
+import threading
+
+from django.core.management import call_command
+from django.db import close_old_connections
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AnalyticsJob
+
+logger = logging.getLogger(__name__)
+
+
+class AnalyticsScheduler:
+    """
+    Starts scheduled analytics jobs when their next_run is due
+
+    Pending daily/weekly jobs are kept in a heap ordered by next_run and the
+    scheduler sleeps until the earliest one. Job changes made in this process
+    (including a finished run saving its next next_run) wake it immediately
+    through model signals; changes made elsewhere (the web process) are picked
+    up by a cheap change-stamp query at most RELOAD_INTERVAL later.
+
+    next_run is stored timezone-aware, so all comparisons here are in UTC and
+    clinic timezone/DST handling stays in AnalyticsJob.calculate_next_run.
+
+    A running job's worker keeps renewing its lease (see JobControl). A job
+    whose lease has lapsed was left behind by a process that stopped
+    mid-run; the scheduler takes it over and resumes it from its stored
+    cohort.
+    """
+
+    RELOAD_INTERVAL = 30  # seconds between change-stamp checks
+
+    _wake = threading.Event()
+
+    def __init__(self):
+        self._heap = []
+        self._stamp = None
+        self._stop = threading.Event()
+        self._running = set()
+
+    @classmethod
+    def notify(cls):
+        """Wake the scheduler in this process to reload its jobs"""
+        cls._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self.notify()
+
+    def jobs_changed(self) -> bool:
+        """Return True if any job was added, removed or saved since the last reload"""
+        stamp = AnalyticsJob.objects.aggregate(changed=Max('updated_at'), jobs=Count('id'))
+        return stamp != self._stamp
+
+    def reload(self):
+        """Rebuild the heap from scheduled jobs that are waiting to run"""
+        self._stamp = AnalyticsJob.objects.aggregate(changed=Max('updated_at'), jobs=Count('id'))
+        self._heap = list(
+            AnalyticsJob.objects.filter(
+                status='pending',
+                frequency__in=['daily', 'weekly'],
+                next_run__isnull=False
+            ).values_list('next_run', 'id')
+        )
+        heapq.heapify(self._heap)
+
+        if self._heap:
+            logger.info(f"Scheduler loaded {len(self._heap)} jobs, next due {self._heap[0][0].isoformat()}")
+
+    def start_job(self, job_id: int, next_run):
+        """Claim a due job and run it in a background thread"""
+        # The conditional update stops a second scheduler (or a stale heap
+        # entry) from starting the same run twice
+        claimed = AnalyticsJob.objects.filter(
+            id=job_id,
+            status='pending',
+            next_run=next_run
+        ).update(
+            status='running',
+            updated_at=timezone.now(),
+            lease_owner='',
+            lease_expires_at=timezone.now() + AnalyticsJob.RUN_LEASE
+        )
+
+        if not claimed:
+            return
+
+        logger.info(f"Starting scheduled analytics job {job_id} (due {next_run.isoformat()})")
+        self.run_job(job_id)
+
+    def reclaim_stale_jobs(self):
+        """Take over and resume running jobs whose lease has lapsed"""
+        stale = AnalyticsJob.lapsed().exclude(id__in=self._running).only(
+            'id', 'lease_owner', 'lease_expires_at'
+        )
+
+        for job in stale:
+            if job.take_over():
+                logger.warning(f"Resuming analytics job {job.id}, lease lapsed at {job.lease_expires_at}")
+                self.run_job(job.id)
+
+    def run_job(self, job_id: int):
+        """Run a claimed job in a background thread"""
+        self._running.add(job_id)
+
+        def run():
+            try:
+                call_command('process_analytics', job_id=job_id)
+            except Exception as e:
+                logger.error(f"Scheduled analytics job {job_id} failed: {e}")
+            finally:
+                self._running.discard(job_id)
+                close_old_connections()
+                self.notify()
+
+        threading.Thread(target=run, name=f'analytics-job-{job_id}', daemon=True).start()
+
+    def run_forever(self):
+        """Start jobs as they fall due until stop() is called"""
+        self.reload()
+
+        while not self._stop.is_set():
+            self.reclaim_stale_jobs()
+
+            now = timezone.now()
+            while self._heap and self._heap[0][0] <= now:
+                next_run, job_id = heapq.heappop(self._heap)
+                self.start_job(job_id, next_run)
+
+            timeout = self.RELOAD_INTERVAL
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - now).total_seconds())
+
+            woken = self._wake.wait(max(timeout, 0))
+            self._wake.clear()
+
+            if woken or self.jobs_changed():
+                self.reload()
+
+
+@receiver(post_save, sender=AnalyticsJob, dispatch_uid='analytics_scheduler_job_saved')
+def job_saved(sender, instance, update_fields=None, **kwargs):
+    # Progress-only saves during a run don't affect the schedule
+    if update_fields is None or {'status', 'next_run'} & set(update_fields):
+        AnalyticsScheduler.notify()
+
+
+@receiver(post_delete, sender=AnalyticsJob, dispatch_uid='analytics_scheduler_job_deleted')
+def job_deleted(sender, instance, **kwargs):
+    AnalyticsScheduler.notify()
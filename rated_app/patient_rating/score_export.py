@@ -0,0 +1,92 @@
+import csv
+from typing import Iterator, List
+
+from django.db import models
+
+from .models import Patient, PatientScoreSnapshot
+
+# Rows fetched from the database per round trip while streaming
+EXPORT_CHUNK_SIZE = 2000
+
+PATIENT_COLUMNS = [
+    'cliniko_patient_id',
+    'patient_name',
+    'total_score',
+    'calculated_rating',
+    'override_active',
+    'override_rating',
+    'likability',
+    'last_calculated',
+    'is_stale',
+]
+
+# BehavioralProcessor categories, in the order it scores them
+CATEGORY_COLUMNS = [
+    'future_appointments',
+    'age_demographics',
+    'yearly_spend',
+    'consecutive_attendance',
+    'referrer_score',
+    'open_dna_invoices',
+    'unpaid_invoices',
+    'cancellations',
+    'dna',
+    'likability',
+]
+
+
+class Echo:
+    """File-like object whose write() returns the value, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def export_header(include_categories: bool = False) -> List[str]:
+    header = list(PATIENT_COLUMNS)
+    if include_categories:
+        header += [f'{category}_points' for category in CATEGORY_COLUMNS]
+    return header
+
+
+def export_rows(include_categories: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[list]:
+    """
+    Every patient's stored score as a CSV row, read in chunks
+
+    Category points come from each patient's latest score snapshot, joined
+    in the same query so memory stays flat regardless of patient count.
+    """
+    patients = Patient.objects.order_by('pk')
+    fields = list(PATIENT_COLUMNS)
+
+    if include_categories:
+        latest_snapshot = PatientScoreSnapshot.objects.filter(
+            patient=models.OuterRef('pk')
+        ).order_by('-snapshot_date', '-id')
+        patients = patients.annotate(
+            category_points=models.Subquery(
+                latest_snapshot.values('category_points')[:1],
+                output_field=models.JSONField()
+            )
+        )
+        fields.append('category_points')
+
+    last_calculated = PATIENT_COLUMNS.index('last_calculated')
+    for values in patients.values_list(*fields).iterator(chunk_size=chunk_size):
+        row = list(values[:len(PATIENT_COLUMNS)])
+        if row[last_calculated]:
+            row[last_calculated] = row[last_calculated].isoformat()
+
+        if include_categories:
+            points = values[-1] or {}
+            row += [points.get(category, '') for category in CATEGORY_COLUMNS]
+
+        yield row
+
+
+def stream_csv(include_categories: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """CSV text of the score export, one line at a time"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(export_header(include_categories))
+    for row in export_rows(include_categories, chunk_size):
+        yield writer.writerow(row)
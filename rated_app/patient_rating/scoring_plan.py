@@ -0,0 +1,210 @@
+from bisect import bisect_left
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Optional, Tuple
+
+# Ages beyond this are matched by scanning the brackets instead of the table
+MAX_TABLE_AGE = 150
+
+NO_AGE_MATCH = (0, "No matching bracket")
+
+
+@dataclass(frozen=True)
+class ScoringPlan:
+    """
+    Immutable, precomputed form of a ScoringConfiguration
+
+    Built once per run by ScoringConfiguration.compile() so scoring a patient
+    needs no database access:
+
+    - weights are plain attributes named like the configuration fields
+    - age_table maps an integer age to (points, description) directly
+    - spend_boundaries holds every spend bracket edge, sorted, so a spend
+      amount is placed with bisect; spend_points_at[i] applies to an amount
+      equal to boundary i and spend_points_between[i] to amounts between
+      boundary i-1 and boundary i
+    - spend_float_boundaries/spend_points_at_float are the same edges as
+      floats for vectorised lookups, with the points for an amount equal to
+      the float edge (which can fall just either side of the Decimal edge)
+
+    Bracket matching keeps the configuration's semantics exactly: the first
+    bracket in display order containing the value wins, edges are inclusive
+    and amounts above the highest spend bracket get its points.
+    """
+
+    # Same weights as ScoringConfiguration.SCORING_FIELDS
+    WEIGHT_FIELDS = (
+        'future_appointments_weight',
+        'age_demographics_weight',
+        'yearly_spend_weight',
+        'consecutive_attendance_weight',
+        'referrer_score_weight',
+        'points_per_consecutive_attendance',
+        'points_per_referral',
+        'likability_weight',
+        'cancellations_weight',
+        'points_per_cancellation',
+        'dna_weight',
+        'points_per_dna',
+        'unpaid_invoices_weight',
+        'points_per_unpaid_invoice',
+        'open_dna_invoice_weight',
+    )
+
+    config_id: Optional[int]
+    future_appointments_weight: int
+    age_demographics_weight: int
+    yearly_spend_weight: int
+    consecutive_attendance_weight: int
+    referrer_score_weight: int
+    points_per_consecutive_attendance: int
+    points_per_referral: int
+    likability_weight: int
+    cancellations_weight: int
+    points_per_cancellation: int
+    dna_weight: int
+    points_per_dna: int
+    unpaid_invoices_weight: int
+    points_per_unpaid_invoice: int
+    open_dna_invoice_weight: int
+    age_table: Tuple[Tuple[int, str], ...]
+    age_brackets: Tuple[Tuple[int, int, int, str], ...]
+    spend_boundaries: Tuple[Decimal, ...]
+    spend_points_at: Tuple[int, ...]
+    spend_points_between: Tuple[int, ...]
+    spend_float_boundaries: Tuple[float, ...]
+    spend_points_at_float: Tuple[int, ...]
+
+    @classmethod
+    def from_config(cls, config) -> 'ScoringPlan':
+        """
+        Compile a ScoringConfiguration (two queries: age and spend brackets)
+
+        Brackets are read through ``.all()`` so prefetched brackets are reused.
+        """
+        return cls.from_parts(
+            {field: getattr(config, field) for field in cls.WEIGHT_FIELDS},
+            [(bracket.min_age, bracket.max_age, bracket.percentage) for bracket in config.age_brackets.all()],
+            [(bracket.min_spend, bracket.max_spend, bracket.percentage) for bracket in config.spend_brackets.all()],
+            config_id=getattr(config, 'pk', None)
+        )
+
+    @classmethod
+    def from_parts(cls, weights, age_brackets, spend_brackets, config_id=None) -> 'ScoringPlan':
+        """
+        Compile weights and brackets directly, e.g. a draft that isn't saved
+
+        :param weights: Dictionary with a value for every WEIGHT_FIELDS name
+        :param age_brackets: (min_age, max_age, percentage) in display order
+        :param spend_brackets: (min_spend, max_spend, percentage) in display
+                               order, amounts as Decimal
+        :param config_id: ID of the configuration compiled, if any
+        """
+        age_brackets = tuple(
+            (
+                min_age,
+                max_age,
+                int((percentage / 100) * weights['age_demographics_weight']),
+                f"[{min_age}-{max_age}] ({percentage}%)"
+            )
+            for min_age, max_age, percentage in age_brackets
+        )
+        spend_brackets = [
+            (min_spend, max_spend, round(weights['yearly_spend_weight'] * (percentage / 100)))
+            for min_spend, max_spend, percentage in spend_brackets
+        ]
+
+        table_size = min(max((bracket[1] for bracket in age_brackets), default=-1), MAX_TABLE_AGE) + 1
+        age_table = tuple(cls._match_age(age_brackets, age) for age in range(table_size))
+
+        boundaries, points_at, points_between = cls._spend_pieces(spend_brackets)
+
+        # A float edge equal to its Decimal edge takes the edge's points;
+        # otherwise it lies in the gap just above or below it
+        points_at_float = []
+        for index, edge in enumerate(boundaries):
+            as_float = Decimal(float(edge))
+            if as_float == edge:
+                points_at_float.append(points_at[index])
+            elif as_float > edge:
+                points_at_float.append(points_between[index + 1])
+            else:
+                points_at_float.append(points_between[index])
+
+        return cls(
+            config_id=config_id,
+            **{field: weights[field] for field in cls.WEIGHT_FIELDS},
+            age_table=age_table,
+            age_brackets=age_brackets,
+            spend_boundaries=boundaries,
+            spend_points_at=points_at,
+            spend_points_between=points_between,
+            spend_float_boundaries=tuple(float(edge) for edge in boundaries),
+            spend_points_at_float=tuple(points_at_float),
+        )
+
+    @staticmethod
+    def _match_age(age_brackets, age: int) -> Tuple[int, str]:
+        for min_age, max_age, points, description in age_brackets:
+            if min_age <= age <= max_age:
+                return points, description
+        return NO_AGE_MATCH
+
+    @staticmethod
+    def _spend_pieces(spend_brackets):
+        """
+        Split the spend axis at every bracket edge and resolve each piece once
+
+        Between two neighbouring edges (and at each edge) the first matching
+        bracket cannot change, so resolving one representative per piece is
+        exact. Zero is always an edge so the "positive spend" condition of the
+        above-highest fallback is constant within a piece too.
+        """
+        if not spend_brackets:
+            return (), (), (0,)
+
+        highest_max, highest_points = spend_brackets[0][1], spend_brackets[0][2]
+        for _, max_spend, points in spend_brackets[1:]:
+            if max_spend > highest_max:
+                highest_max, highest_points = max_spend, points
+
+        boundaries = tuple(sorted(
+            {Decimal(0)} | {edge for min_spend, max_spend, _ in spend_brackets for edge in (min_spend, max_spend)}
+        ))
+
+        def first_match(contains):
+            return next((points for min_spend, max_spend, points in spend_brackets if contains(min_spend, max_spend)), None)
+
+        points_at = []
+        for edge in boundaries:
+            points = first_match(lambda low, high: low <= edge <= high)
+            if points is None:
+                points = highest_points if edge > 0 and edge > highest_max else 0
+            points_at.append(points)
+
+        points_between = []
+        for i in range(len(boundaries) + 1):
+            lower = boundaries[i - 1] if i > 0 else None
+            upper = boundaries[i] if i < len(boundaries) else None
+            points = None
+            if lower is not None and upper is not None:
+                points = first_match(lambda low, high: low <= lower and upper <= high)
+            if points is None:
+                points = highest_points if lower is not None and lower >= 0 and lower >= highest_max else 0
+            points_between.append(points)
+
+        return boundaries, tuple(points_at), tuple(points_between)
+
+    def age_points(self, age: int) -> Tuple[int, str]:
+        """(points, bracket description) for an integer age"""
+        if 0 <= age < len(self.age_table):
+            return self.age_table[age]
+        return self._match_age(self.age_brackets, age)
+
+    def spend_points(self, yearly_spend: float) -> int:
+        """Points for a yearly spend amount"""
+        index = bisect_left(self.spend_boundaries, yearly_spend)
+        if index < len(self.spend_boundaries) and self.spend_boundaries[index] == yearly_spend:
+            return self.spend_points_at[index]
+        return self.spend_points_between[index]
+
@@ -0,0 +1,1349 @@
+    // Function to load clinic settings
+    function loadClinicSettings() {
+    fetch(DASHBOARD_URLS.updateClinicSettings)
+    .then(response => {
+        if (!response.ok) {
+            throw new Error('No settings found');
+        }
+        return response.json();
+    })
+    .then(data => {
+        if (data.success) {
+            const settings = data.settings;
+            
+            // Populate Clinic Information
+            document.getElementById('clinic-name').value = settings.clinic_information.clinic_name;
+            document.getElementById('clinic-location').value = settings.clinic_information.clinic_location;
+            document.getElementById('clinic-timezone').value = settings.clinic_information.clinic_timezone;
+            document.getElementById('clinic-email').value = settings.clinic_information.clinic_email || '';
+            
+            // Populate Connectivity
+const softwareSelect = document.getElementById('software-integration');
+const apiKeyInput = document.getElementById('api-key');
+const apiKeyFormGroup = document.querySelector('.form-group.api-key');
+
+softwareSelect.value = settings.connectivity.software_integration || '';
+
+// Show masked API key and connection status if API key exists
+if (settings.connectivity.api_key && settings.connectivity.api_key !== 'None') {
+    apiKeyInput.value = settings.connectivity.api_key; // Shows masked key (****1234)
+    
+    const statusElement = document.createElement('div');
+    statusElement.classList.add('connection-status', 'connected');
+    statusElement.textContent = 'Connected';
+    apiKeyFormGroup.appendChild(statusElement);
+}
+        }
+    })
+    .catch(error => {
+        console.error('Error loading settings:', error);
+    });
+}
+
+    // Call on page load
+    document.addEventListener('DOMContentLoaded', loadClinicSettings);
+    
+// Add CSS for Edit/Save text and input states
+const style = document.createElement("style");
+style.textContent = `
+    .form-group {
+        position: relative;
+        display: flex;
+        align-items: baseline;
+    }
+
+    .edit-save-text {
+        color: #6c757d;
+        font-size: 0.9em;
+        cursor: pointer;
+        position: absolute;
+        right: 0;
+        top: 50%;
+        transform: translateY(-50%);
+        user-select: none;
+    }
+
+    .edit-save-text.save-mode {
+        color: #007bff;
+    }
+
+    .validation-error {
+        color: red;
+        margin-left: 5px;
+    }
+
+    /* Consistent disabled state for all inputs */
+    input:disabled, select:disabled {
+        opacity: 0.6;
+        background-color: #f8f9fa;
+        cursor: not-allowed;
+    }
+
+    /* Remove focus outline on all inputs */
+    input:focus, select:focus {
+        outline: none;
+        box-shadow: none;
+        border-color: #ced4da;
+    }
+`;
+document.head.appendChild(style);
+
+// Find the Clinic Information section
+const clinicInformationSection = document.querySelector(".settings-section.clinic-information");
+const formGroups = clinicInformationSection.querySelectorAll(".form-group");
+const timezoneFormGroup = document.querySelector(".form-group.clinic-timezone");
+const clinicNameInput = document.querySelector("#clinic-name");
+
+// Get the existing Edit/Save span
+const editSaveSpan = timezoneFormGroup.querySelector(".edit-save-text");
+
+// Interaction Logic
+    editSaveSpan.addEventListener("click", (event) => {
+        event.preventDefault();
+        event.stopPropagation();
+
+        console.log("Current Span State:", {
+            text: editSaveSpan.textContent,
+            classes: Array.from(editSaveSpan.classList)
+        });
+
+        // EDIT MODE (when NOT in save mode)
+        if (!editSaveSpan.classList.contains("save-mode")) {
+            console.log("🔧 Entering Edit Mode");
+            editSaveSpan.textContent = "Save";
+            editSaveSpan.classList.add("save-mode");
+            
+            formGroups.forEach(group => {
+                const input = group.querySelector("input, select");
+                if (input) {
+                    input.disabled = false;
+                    console.log(`Enabled input: ${input.id}`);
+                }
+            });
+
+            // Focus on first field (Name) and position cursor at end
+            setTimeout(() => {
+                clinicNameInput.focus();
+                clinicNameInput.setSelectionRange(
+                    clinicNameInput.value.length, 
+                    clinicNameInput.value.length
+                );
+            }, 10);
+        } 
+        // SAVE MODE
+        else {
+            const inputs = Array.from(
+                clinicInformationSection.querySelectorAll("input, select")
+            );
+            
+            // Remove previous validation errors
+            clinicInformationSection.querySelectorAll(".validation-error").forEach(el => el.remove());
+
+            // Validate critical inputs
+            const invalidInputs = inputs.filter(input => !input.value.trim());
+
+            console.log("🕵️ Validation Check:", {
+                totalInputs: inputs.length,
+                invalidInputs: invalidInputs.map(input => input.id)
+            });
+
+            if (invalidInputs.length > 0) {
+                console.log("❌ Validation Failed");
+                
+                invalidInputs.forEach(input => {
+                    const formGroup = input.closest(".form-group");
+                    if (formGroup) {
+                        const errorSpan = document.createElement("span");
+                        errorSpan.classList.add("validation-error");
+                        errorSpan.textContent = "*";
+                        formGroup.appendChild(errorSpan);
+                    }
+                });
+                return;
+            }
+
+            // Successful Save Logic
+            console.log("✅ Save Successful");
+            editSaveSpan.textContent = "Edit";
+            editSaveSpan.classList.remove("save-mode");
+            
+            // Disable all inputs
+            formGroups.forEach(group => {
+                const input = group.querySelector("input, select");
+                if (input) {
+                    input.disabled = true;
+                    console.log(`Disabled input: ${input.id}`);
+                }
+            });
+
+            // Capture save data
+            const saveData = {
+                clinic_name: document.getElementById("clinic-name").value,
+                clinic_location: document.getElementById("clinic-location").value,
+                clinic_timezone: document.querySelector("#clinic-timezone").value,
+                clinic_email: document.getElementById("clinic-email").value
+            };
+            
+            console.log("💾 Clinic Settings Updated:", saveData);
+
+saveSettings('clinic_information', saveData)
+    .then(result => {
+        console.log("Settings saved successfully");
+    })
+    .catch(error => {
+        console.error("Error saving settings:", error);
+    });
+
+            document.getElementById('clinic-name-header').textContent = saveData.clinic_name;
+            document.getElementById('clinic-location-header').textContent = saveData.clinic_location;
+
+
+        }
+    });
+
+// Initially disable all inputs
+formGroups.forEach(group => {
+    const input = group.querySelector("input, select");
+    input.disabled = true;
+});
+
+console.log("✅ Edit/Save Interaction Setup Complete");
+
+// CSRF Token Retrieval
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+// Unified Save Mechanism
+function saveSettings(section, data) {
+    return csrfFetch(DASHBOARD_URLS.updateClinicSettings, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify({
+            section: section,
+            ...data
+        })
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error('Save failed');
+        }
+        return response.json();
+    })
+    .then(result => {
+        if (result.success) {
+            console.log(`${section} settings saved successfully`);
+            return result;
+        } else {
+            throw new Error(result.error || 'Save failed');
+        }
+    })
+    .catch(error => {
+        console.error(`Error saving ${section} settings:`, error);
+        alert(`Failed to save ${section} settings: ${error.message}`);
+        throw error;
+    });
+}
+
+// Connectivity Edit/Save Logic
+document.addEventListener('DOMContentLoaded', function() {
+    const connectivitySection = document.querySelector(".settings-section.connectivity-settings");
+    const editSaveSpan = connectivitySection.querySelector(".edit-save-text");
+    const softwareSelect = document.getElementById('software-integration');
+    const apiKeyInput = document.getElementById('api-key');
+    const apiKeyFormGroup = document.querySelector('.form-group.api-key');
+
+    // Clear any existing status messages
+    function clearStatusMessages() {
+        const existingStatusElements = apiKeyFormGroup.querySelectorAll('.connection-status');
+        existingStatusElements.forEach(el => el.remove());
+    }
+
+    // Create status message
+    function createStatusMessage(message, type) {
+        clearStatusMessages();
+        const statusElement = document.createElement('div');
+        statusElement.classList.add('connection-status', type);
+        statusElement.textContent = message;
+        apiKeyFormGroup.appendChild(statusElement);
+    }
+
+    editSaveSpan.addEventListener("click", function() {
+        if (this.textContent === 'Edit') {
+            // EDIT MODE
+            clearStatusMessages();
+            softwareSelect.disabled = false;
+            apiKeyInput.disabled = false;
+            
+            this.textContent = 'Save';
+            this.classList.add('save-mode');
+        } else {
+            // SAVE MODE
+            const saveData = {
+                software_integration: softwareSelect.value,
+                api_key: apiKeyInput.value
+            };
+
+            // Show spinner and enforce 3-second minimum delay
+showAPIValidationSpinner();
+const startTime = Date.now();
+
+validateClinikoAPIKey(saveData.api_key)
+    .then(async (validationResult) => {
+        // Ensure minimum 3-second delay
+        const elapsedTime = Date.now() - startTime;
+        const remainingTime = Math.max(0, 3000 - elapsedTime);
+        await new Promise(resolve => setTimeout(resolve, remainingTime));
+        
+        hideAPIValidationSpinner();
+        
+        if (validationResult.status === 'Connected') {
+            // Successful validation - save to backend
+            createStatusMessage('Connected', 'connected');
+            
+            return saveSettings('connectivity', {
+                software_integration: saveData.software_integration,
+                api_key: saveData.api_key
+            });
+        } else {
+            // Validation failed - don't save to backend
+            createStatusMessage(validationResult.error, 'disconnected');
+            
+            // Keep fields unlocked and in Save mode
+            softwareSelect.disabled = false;
+            apiKeyInput.disabled = false;
+            this.textContent = 'Save';
+            this.classList.add('save-mode');
+            
+            throw new Error(validationResult.error);
+        }
+    })
+    .then(() => {
+        // Successful save - lock fields and return to Edit mode
+        softwareSelect.disabled = true;
+        apiKeyInput.disabled = true;
+        
+        this.textContent = 'Edit';
+        this.classList.remove('save-mode');
+    })
+    .catch(error => {
+        console.error('Connectivity Save Error:', error);
+        hideAPIValidationSpinner();
+        
+        // Revert to Edit state
+        this.textContent = 'Edit';
+        this.classList.remove('save-mode');
+        
+        // LOCK inputs (Edit state has locked fields)
+        softwareSelect.disabled = true;
+        apiKeyInput.disabled = true;
+    });
+        }
+    });
+});
+
+async function validateClinikoAPIKey(apiKey) {
+    const validationUrl = `${DASHBOARD_URLS.validateClinikoApiKey}?api_key=${encodeURIComponent(apiKey)}`;
+    
+    try {
+        const response = await fetch(validationUrl);
+        const result = await response.json();
+
+        if (response.ok) {
+            return {
+                status: 'Connected',
+                message: result.message
+            };
+        } else {
+            return {
+                status: 'Disconnected',
+                error: result.error || 'Invalid API key'
+            };
+        }
+    } catch (error) {
+        console.error('API Validation Error:', error);
+        return {
+            status: 'Disconnected',
+            error: 'Network Error'
+        };
+    }
+}
+
+// UI Helper Functions
+function showAPIValidationSpinner() {
+    const apiKeyField = document.getElementById('api-key');
+    const spinnerElement = document.createElement('span');
+    spinnerElement.classList.add('api-validation-spinner');
+    spinnerElement.innerHTML = '⏳'; // Loading spinner emoji
+    apiKeyField.parentNode.appendChild(spinnerElement);
+}
+
+function hideAPIValidationSpinner() {
+    const spinner = document.querySelector('.api-validation-spinner');
+    if (spinner) spinner.remove();
+}
+
+// Update saveSettings to use API validation
+function saveSettings(section, data) {
+    // Existing save logic for other sections
+    return csrfFetch('/update-clinic-settings/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        body: JSON.stringify({
+            section: section,
+            ...data
+        })
+    });
+}
+
+// Add CSS for connection status
+const connectionStatusStyle = document.createElement('style');
+connectionStatusStyle.textContent = `
+    .connection-status {
+        margin-left: 10px;
+        font-size: 0.8em;
+        font-weight: bold;
+    }
+    .connection-status.connected {
+        color: green;
+    }
+    .connection-status.disconnected {
+        color: red;
+    }
+    .api-validation-spinner {
+        margin-left: 10px;
+        animation: spin 1s linear infinite;
+    }
+    @keyframes spin {
+        100% { transform: rotate(360deg); }
+    }
+`;
+document.head.appendChild(connectionStatusStyle);
+
+// Analytics JavaScript Functions - Enhanced Version
+let analyticsConfig = null;
+let analyticsStatusInterval = null;
+let analyticsProcessingInterval = null;
+let analyticsEventSource = null;
+let analyticsStreamUnavailable = false;
+let analyticsStreamProcessing = false;
+
+// Initialize analytics section
+document.addEventListener('DOMContentLoaded', function() {
+    // Check connection status and initialize
+    checkAnalyticsConnection();
+    loadAnalyticsPresets();
+    loadAnalyticsConfig();
+    
+    // Start status monitoring
+    startAnalyticsStatusMonitoring();
+});
+
+function checkAnalyticsConnection() {
+    // Check if software is connected in Connectivity section
+    const softwareIntegration = document.getElementById('software-integration');
+    const apiKey = document.getElementById('api-key');
+    const analyticsOverlay = document.getElementById('analytics-disabled-overlay');
+    const analyticsForm = document.getElementById('analytics-form');
+    
+    // Check for connected status
+    const isConnected = softwareIntegration && 
+                       softwareIntegration.value && 
+                       apiKey && 
+                       apiKey.value &&
+                       document.querySelector('.connection-status.connected');
+    
+    if (isConnected) {
+        // Enable analytics
+        analyticsOverlay.style.display = 'none';
+        analyticsForm.style.opacity = '1';
+        analyticsForm.style.pointerEvents = 'auto';
+        
+        // Enable Edit button
+        const editBtn = document.querySelector('.settings-section.analytics-settings .edit-save-text');
+        if (editBtn) {
+            editBtn.style.pointerEvents = 'auto';
+            editBtn.style.opacity = '1';
+        }
+    } else {
+        // Disable analytics
+        analyticsOverlay.style.display = 'flex';
+        analyticsForm.style.opacity = '0.3';
+        analyticsForm.style.pointerEvents = 'none';
+    }
+}
+
+function toggleAnalyticsDaySelector() {
+    const frequency = document.getElementById('analytics-frequency').value;
+    const dayGroup = document.getElementById('analytics-day-group');
+    const timeGroup = document.getElementById('analytics-time-group');
+    const startBtn = document.getElementById('analytics-action-btn');
+    const statusText = document.getElementById('analytics-status-text');
+    
+    if (frequency === 'weekly') {
+        dayGroup.style.display = 'flex';
+        timeGroup.style.display = 'flex';
+        startBtn.disabled = true;
+        startBtn.style.opacity = '0.6';
+        
+        // Update status for scheduled mode
+        const savedTime = document.getElementById('analytics-time').value;
+        const savedDay = document.getElementById('analytics-day').value;
+        if (savedTime && savedDay) {
+            updateScheduledStatus(savedTime, savedDay, 'weekly');
+        }
+    } else if (frequency === 'daily') {
+        dayGroup.style.display = 'none';
+        timeGroup.style.display = 'flex';
+        startBtn.disabled = true;
+        startBtn.style.opacity = '0.6';
+        
+        // Update status for scheduled mode
+        const savedTime = document.getElementById('analytics-time').value;
+        if (savedTime) {
+            updateScheduledStatus(savedTime, null, 'daily');
+        }
+    } else if (frequency === 'manual') {
+        dayGroup.style.display = 'none';
+        timeGroup.style.display = 'none';
+        
+        // Enable Start button only if preset is selected
+        const preset = document.getElementById('analytics-preset').value;
+        if (preset) {
+            startBtn.disabled = false;
+            startBtn.style.opacity = '1';
+        }
+        
+        // Update status for manual mode
+        statusText.textContent = 'Ready to run';
+    } else {
+        dayGroup.style.display = 'none';
+        timeGroup.style.display = 'none';
+        startBtn.disabled = true;
+        startBtn.style.opacity = '0.6';
+    }
+}
+
+function updateScheduledStatus(time, day, frequency) {
+    const statusText = document.getElementById('analytics-status-text');
+    const dayNames = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
+    
+    // Calculate next run time
+    const now = new Date();
+    const [hours, minutes] = time.split(':');
+    let nextRun = new Date();
+    nextRun.setHours(parseInt(hours));
+    nextRun.setMinutes(parseInt(minutes));
+    nextRun.setSeconds(0);
+    
+    if (frequency === 'daily') {
+        // If time has passed today, set for tomorrow
+        if (nextRun <= now) {
+            nextRun.setDate(nextRun.getDate() + 1);
+        }
+    } else if (frequency === 'weekly' && day !== null) {
+        const targetDay = parseInt(day);
+        const currentDay = now.getDay();
+        let daysUntil = (targetDay - currentDay + 7) % 7;
+        
+        // If it's the same day but time has passed, schedule for next week
+        if (daysUntil === 0 && nextRun <= now) {
+            daysUntil = 7;
+        }
+        
+        nextRun.setDate(nextRun.getDate() + daysUntil);
+    }
+    
+    // Format the date
+    const formattedDate = nextRun.toLocaleDateString('en-GB', {
+        day: '2-digit',
+        month: '2-digit',
+        year: '2-digit'
+    });
+    const formattedTime = nextRun.toLocaleTimeString('en-US', {
+        hour: 'numeric',
+        minute: '2-digit',
+        hour12: true
+    });
+    
+    statusText.textContent = `Ready to run on: ${formattedDate} ${formattedTime}`;
+}
+
+function loadAnalyticsPresets() {
+    fetch(DASHBOARD_URLS.getPresets)
+        .then(response => response.json())
+        .then(data => {
+            const presetSelect = document.getElementById('analytics-preset');
+            if (presetSelect && data.presets) {
+                // Clear existing options except first
+                const firstOption = presetSelect.firstElementChild;
+                presetSelect.innerHTML = '';
+                if (firstOption) {
+                    presetSelect.appendChild(firstOption);
+                }
+                
+                // Add preset options
+                data.presets.forEach(preset => {
+                    const option = document.createElement('option');
+                    option.value = preset.id;
+                    option.textContent = preset.name;
+                    presetSelect.appendChild(option);
+                });
+            }
+        })
+        .catch(error => {
+            console.error('Error loading presets:', error);
+        });
+}
+
+function loadAnalyticsConfig() {
+    fetch('/analytics/config/')
+        .then(response => response.json())
+        .then(data => {
+            if (data.success && data.current_job) {
+                analyticsConfig = data.current_job;
+                
+                // Populate form with saved values
+                document.getElementById('analytics-date-range').value = data.current_job.date_range || '';
+                document.getElementById('analytics-frequency').value = data.current_job.frequency || '';
+                document.getElementById('analytics-preset').value = data.current_job.preset_id || '';
+                document.getElementById('testModeCheckbox').checked = data.current_job.is_test_mode || false;
+                
+                if (data.current_job.scheduled_time) {
+                    document.getElementById('analytics-time').value = data.current_job.scheduled_time;
+                }
+                
+                if (data.current_job.frequency === 'weekly' && data.current_job.scheduled_day !== null) {
+                    document.getElementById('analytics-day').value = data.current_job.scheduled_day;
+                }
+                
+                // Trigger UI updates
+                toggleAnalyticsDaySelector();
+                
+                // Update status
+                updateAnalyticsStatus(data.current_job);
+            }
+        })
+        .catch(error => {
+            console.error('Error loading analytics config:', error);
+        });
+}
+
+function updateFrequencyOptions() {
+    const dateRange = document.getElementById('analytics-date-range').value;
+    const frequencySelect = document.getElementById('analytics-frequency');
+    
+    if (dateRange === '1d') {
+        // For 1 day, only allow Manual
+        frequencySelect.value = 'manual';
+        
+        // Disable other options
+        Array.from(frequencySelect.options).forEach(option => {
+            if (option.value !== 'manual') {
+                option.disabled = true;
+                option.text = option.text.includes('(1 day only allows Manual)') ? 
+                    option.text : option.text + ' (1 day only allows Manual)';
+            }
+        });
+    } else {
+        // Enable all options for other date ranges
+        Array.from(frequencySelect.options).forEach(option => {
+            option.disabled = false;
+            option.text = option.text.replace(' (1 day only allows Manual)', '');
+        });
+    }
+}
+
+// Add event listener for date range changes
+document.getElementById('analytics-date-range').addEventListener('change', updateFrequencyOptions);
+
+function saveAnalyticsConfig() {
+    const dateRange = document.getElementById('analytics-date-range').value;
+    const frequency = document.getElementById('analytics-frequency').value;
+    const presetId = document.getElementById('analytics-preset').value;
+    const scheduledTime = document.getElementById('analytics-time').value || '02:00';
+    const scheduledDay = document.getElementById('analytics-day').value;
+    const testMode = document.getElementById('testModeCheckbox').checked;
+    
+    // Validation
+    if (!dateRange || !frequency || !presetId) {
+        alert('Please fill in all required fields');
+        return;
+    }
+    
+    // Validate 1 day can only be manual
+    if (dateRange === '1d' && frequency !== 'manual') {
+        alert('1 day range can only use Manual frequency');
+        return;
+    }
+    
+    if (frequency !== 'manual' && !scheduledTime) {
+        alert('Please select a scheduled time for automated runs');
+        return;
+    }
+    
+    if (frequency === 'weekly' && !scheduledDay) {
+        alert('Please select a day for weekly runs');
+        return;
+    }
+    
+    // Estimate the run first so the confirmation shows its likely cost
+    fetch(`/analytics/estimate/?date_range=${encodeURIComponent(dateRange)}&is_test_mode=${testMode}`)
+        .then(response => response.json())
+        .catch(() => ({ success: false }))
+        .then(estimateData => {
+            const estimate = estimateData.success ? estimateData.estimate : null;
+            
+            // Show confirmation if replacing existing job
+            let confirmMessage = testMode ? 
+                'Start test analytics run? (Will not update Cliniko)' :
+                'Save analytics configuration? This will replace any existing scheduled job.';
+            if (estimate) {
+                confirmMessage += '\n\n' + formatAnalyticsEstimate(estimate);
+            }
+                
+            if (!confirm(confirmMessage)) {
+                return;
+            }
+            
+            submitAnalyticsConfig(dateRange, frequency, presetId, scheduledTime, scheduledDay, testMode, estimate);
+        });
+}
+
+function formatAnalyticsDuration(seconds) {
+    if (seconds < 3600) {
+        return `${Math.max(1, Math.round(seconds / 60))} min`;
+    }
+    return `${(seconds / 3600).toFixed(1)} hours`;
+}
+
+function formatAnalyticsEstimate(estimate) {
+    const approx = estimate.cohort_exact ? '' : '~';
+    return `Estimated run: ${approx}${estimate.cohort} patients ` +
+        `(${estimate.appointments} appointments), ` +
+        `~${estimate.api_calls} API calls, ` +
+        `~${formatAnalyticsDuration(estimate.duration_seconds)}` +
+        (estimate.write_backs ? `, ${estimate.write_backs} Cliniko updates` : '');
+}
+
+function submitAnalyticsConfig(dateRange, frequency, presetId, scheduledTime, scheduledDay, testMode, estimate) {
+    // Prepare data
+    const configData = {
+        date_range: dateRange,
+        frequency: frequency,
+        preset_id: presetId,
+        scheduled_time: scheduledTime,
+        is_test_mode: testMode,
+        estimate: estimate || {}
+    };
+    
+    if (frequency === 'weekly') {
+        configData.scheduled_day = parseInt(scheduledDay);
+    }
+    
+    // Save configuration
+    csrfFetch('/analytics/config/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        },
+        body: JSON.stringify(configData)
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Show success message
+            const saveMessage = document.getElementById('save-message');
+            if (saveMessage) {
+                saveMessage.textContent = '✓ Analytics configured';
+                saveMessage.style.display = 'block';
+                setTimeout(() => {
+                    saveMessage.style.display = 'none';
+                }, 3000);
+            }
+            
+            // Enable action button if manual
+            if (frequency === 'manual') {
+                document.getElementById('analytics-action-btn').disabled = false;
+            }
+            
+            // Reload config
+            loadAnalyticsConfig();
+            
+            // If test mode, auto-start might be desired
+            if (testMode && confirm('Start test run now?')) {
+                startAnalytics();
+            }
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error saving analytics config:', error);
+        alert('Failed to save configuration');
+    });
+}
+
+function toggleAnalytics() {
+    const actionBtn = document.getElementById('analytics-action-btn');
+    
+    if (actionBtn.textContent === 'Start') {
+        // Check if preset is selected for manual mode
+        const frequency = document.getElementById('analytics-frequency').value;
+        const preset = document.getElementById('analytics-preset').value;
+        
+        if (frequency === 'manual' && !preset) {
+            alert('Please select a preset before starting');
+            return;
+        }
+        
+        startAnalytics();
+    } else if (actionBtn.textContent === 'Stop') {
+        cancelAnalytics();
+    }
+}
+
+function startAnalytics() {
+    const actionBtn = document.getElementById('analytics-action-btn');
+    const statusText = document.getElementById('analytics-status-text');
+    
+    // Confirm action
+    if (!confirm('Start analytics processing? This will analyze all patients in the selected date range.')) {
+        return;
+    }
+    
+    // Disable button during request
+    actionBtn.disabled = true;
+    
+    // Start processing
+    csrfFetch('/analytics/start/', {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update button to Stop
+            actionBtn.textContent = 'Stop';
+            actionBtn.style.background = '#dc3545';
+            actionBtn.disabled = false;
+            
+            // Update status immediately
+            statusText.textContent = 'Initialising...';
+            document.getElementById('analytics-status').className = 'analytics-status running';
+            
+            // Start monitoring - this will update the status dynamically
+            setTimeout(() => {
+                startAnalyticsProcessingMonitoring();
+            }, 1000);
+        } else {
+            alert('Error: ' + data.error);
+            actionBtn.disabled = false;
+        }
+    })
+    .catch(error => {
+        console.error('Error starting analytics:', error);
+        alert('Failed to start analytics');
+        actionBtn.disabled = false;
+    });
+}
+
+function cancelAnalytics() {
+    const actionBtn = document.getElementById('analytics-action-btn');
+    
+    // Confirm cancellation
+    if (!confirm('Stop analytics processing? Use Pause instead to keep progress and resume later.')) {
+        return;
+    }
+    
+    // Cancel processing
+    csrfFetch('/analytics/cancel/', {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update status
+            document.getElementById('analytics-status-text').textContent = 'Process Aborted';
+            
+            // Button will update on next status check
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error cancelling analytics:', error);
+        alert('Failed to cancel analytics');
+    });
+}
+
+function toggleAnalyticsPause() {
+    const pauseBtn = document.getElementById('analytics-pause-btn');
+    const resuming = pauseBtn.textContent.trim() === 'Resume';
+    
+    pauseBtn.disabled = true;
+    
+    csrfFetch(resuming ? '/analytics/resume/' : '/analytics/pause/', {
+        method: 'POST',
+        headers: {
+            'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        pauseBtn.disabled = false;
+        if (data.success) {
+            if (resuming) {
+                document.getElementById('analytics-status-text').textContent = 'Resuming...';
+                startAnalyticsProcessingMonitoring();
+            } else {
+                document.getElementById('analytics-status-text').textContent = 'Pausing...';
+            }
+        } else {
+            alert('Error: ' + data.error);
+        }
+    })
+    .catch(error => {
+        console.error('Error pausing/resuming analytics:', error);
+        alert('Failed to ' + (resuming ? 'resume' : 'pause') + ' analytics');
+        pauseBtn.disabled = false;
+    });
+}
+
+function updateAnalyticsPauseButton(status) {
+    const pauseBtn = document.getElementById('analytics-pause-btn');
+    if (!pauseBtn) {
+        return;
+    }
+    
+    if (status === 'running') {
+        pauseBtn.textContent = 'Pause';
+        pauseBtn.style.display = 'inline-block';
+    } else if (status === 'paused') {
+        pauseBtn.textContent = 'Resume';
+        pauseBtn.style.display = 'inline-block';
+    } else {
+        pauseBtn.style.display = 'none';
+    }
+}
+
+function startAnalyticsProcessingMonitoring() {
+    // The status stream pushes processing updates itself
+    if (analyticsEventSource) {
+        analyticsStreamProcessing = true;
+        return;
+    }
+    
+    // Clear existing processing interval
+    if (analyticsProcessingInterval) {
+        clearInterval(analyticsProcessingInterval);
+    }
+    
+    // Check status every 2 seconds during processing
+    analyticsProcessingInterval = setInterval(() => {
+        checkAnalyticsProcessingStatus();
+    }, 2000);
+    
+    // Check immediately
+    checkAnalyticsProcessingStatus();
+}
+
+function checkAnalyticsProcessingStatus() {
+    fetch('/analytics/status/')
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                updateAnalyticsProcessingStatus(data);
+                
+                // Stop frequent monitoring if not running
+                if (data.status !== 'running') {
+                    if (analyticsProcessingInterval) {
+                        clearInterval(analyticsProcessingInterval);
+                        analyticsProcessingInterval = null;
+                    }
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error checking analytics status:', error);
+        });
+}
+
+function updateAnalyticsProcessingStatus(statusData) {
+    const statusElement = document.getElementById('analytics-status');
+    const statusText = document.getElementById('analytics-status-text');
+    const actionBtn = document.getElementById('analytics-action-btn');
+    
+    // Calculate ETA based on processing rate
+    let statusMessage = '';
+    
+    if (statusData.status === 'running') {
+        const processed = statusData.patients_processed || 0;
+        const total = statusData.total_patients || 0;
+        
+        if (total === 0) {
+            statusMessage = 'Initialising...';
+        } else {
+            const progress = Math.round((processed / total) * 100);
+            const remaining = total - processed;
+            
+            // Estimate time (3 seconds per patient + overhead)
+            const secondsPerPatient = 3.5;
+            const estimatedSeconds = remaining * secondsPerPatient;
+            
+            let etaText = '';
+            if (estimatedSeconds < 60) {
+                etaText = Math.round(estimatedSeconds) + ' secs';
+            } else if (estimatedSeconds < 3600) {
+                etaText = Math.round(estimatedSeconds / 60) + ' mins';
+            } else {
+                etaText = Math.round(estimatedSeconds / 3600) + ' hrs';
+            }
+            
+            if (processed < total * 0.5) {
+                statusMessage = `Retrieving Data (ETA ${etaText})...`;
+            } else {
+                statusMessage = `Processing Data (ETA ${etaText})...`;
+            }
+        }
+        
+        // Update button to Stop
+        actionBtn.textContent = 'Stop';
+        actionBtn.style.background = '#dc3545';
+        actionBtn.disabled = false;
+        
+    } else if (statusData.status === 'paused') {
+        statusMessage = `Paused (${statusData.patients_processed || 0}/${statusData.total_patients || 0})`;
+        actionBtn.textContent = 'Stop';
+        actionBtn.style.background = '#dc3545';
+        actionBtn.disabled = false;
+        
+    } else if (statusData.status === 'completed') {
+        statusMessage = 'Completed';
+        
+        // Reset button for manual mode
+        const frequency = document.getElementById('analytics-frequency').value;
+        if (frequency === 'manual') {
+            actionBtn.textContent = 'Start';
+            actionBtn.style.background = '#28a745';
+            actionBtn.disabled = false;
+        } else {
+            // Show next scheduled run
+            if (statusData.next_run) {
+                const nextRun = new Date(statusData.next_run);
+                const formattedDate = nextRun.toLocaleDateString('en-GB', {
+                    day: '2-digit',
+                    month: '2-digit',
+                    year: '2-digit'
+                });
+                const formattedTime = nextRun.toLocaleTimeString('en-US', {
+                    hour: 'numeric',
+                    minute: '2-digit',
+                    hour12: true
+                });
+                statusMessage = `Ready to run on: ${formattedDate} ${formattedTime}`;
+            }
+            actionBtn.disabled = true;
+        }
+        
+    } else if (statusData.status === 'cancelled' || statusData.status === 'partial') {
+        statusMessage = 'Process Aborted';
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+        actionBtn.disabled = false;
+        
+    } else if (statusData.status === 'failed') {
+        statusMessage = 'Failed';
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+        actionBtn.disabled = false;
+        
+    } else {
+        statusMessage = 'Ready to run';
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+    }
+    
+    statusText.textContent = statusMessage;
+    updateAnalyticsPauseButton(statusData.status);
+    
+    // Update status styling
+    statusElement.className = 'analytics-status';
+    if (statusData.status === 'running') {
+        statusElement.classList.add('running');
+    } else if (statusData.status === 'completed') {
+        statusElement.classList.add('completed');
+    } else if (statusData.status === 'failed' || statusData.status === 'partial') {
+        statusElement.classList.add('failed');
+    }
+}
+
+function checkAnalyticsStatus() {
+    // Don't check if currently processing
+    if (analyticsProcessingInterval) {
+        return;
+    }
+    
+    fetch('/analytics/status/')
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                updateAnalyticsStatus(data);
+            }
+        })
+        .catch(error => {
+            console.error('Error checking analytics status:', error);
+        });
+}
+
+function updateAnalyticsStatus(statusData) {
+    const statusElement = document.getElementById('analytics-status');
+    const statusText = document.getElementById('analytics-status-text');
+    const actionBtn = document.getElementById('analytics-action-btn');
+    const frequency = document.getElementById('analytics-frequency').value;
+    
+    // Don't update if we're in the middle of processing
+    if (analyticsProcessingInterval && statusData.status === 'running') {
+        return;
+    }
+    
+    let statusMessage = '';
+    
+    if (statusData.status === 'pending' || statusData.status === 'not_configured') {
+        // Check frequency to determine status message
+        if (frequency === 'manual') {
+            statusMessage = 'Ready to run';
+            actionBtn.textContent = 'Start';
+            actionBtn.style.background = '#28a745';
+            actionBtn.disabled = false;
+        } else {
+            // For scheduled runs, show next run time
+            const time = document.getElementById('analytics-time').value;
+            const day = document.getElementById('analytics-day').value;
+            
+            if (time && (frequency === 'daily' || (frequency === 'weekly' && day))) {
+                updateScheduledStatus(time, day, frequency);
+                // Don't override the scheduled status message
+                return;
+            } else {
+                statusMessage = 'Not configured';
+            }
+            actionBtn.disabled = true;
+        }
+    } else if (statusData.status === 'running') {
+        // Should be handled by processing monitor
+        startAnalyticsProcessingMonitoring();
+        return;
+    } else if (statusData.status === 'paused') {
+        statusMessage = `Paused (${statusData.patients_processed || 0}/${statusData.total_patients || 0})`;
+        actionBtn.textContent = 'Stop';
+        actionBtn.style.background = '#dc3545';
+        actionBtn.disabled = false;
+    } else if (statusData.status === 'completed') {
+        if (frequency === 'manual') {
+            statusMessage = 'Completed';
+        } else if (statusData.next_run) {
+            // Show next scheduled run
+            const nextRun = new Date(statusData.next_run);
+            const formattedDate = nextRun.toLocaleDateString('en-GB', {
+                day: '2-digit',
+                month: '2-digit',
+                year: '2-digit'
+            });
+            const formattedTime = nextRun.toLocaleTimeString('en-US', {
+                hour: 'numeric',
+                minute: '2-digit',
+                hour12: true
+            });
+            statusMessage = `Ready to run on: ${formattedDate} ${formattedTime}`;
+        } else {
+            statusMessage = 'Completed';
+        }
+        
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+        actionBtn.disabled = (frequency !== 'manual');
+        
+    } else if (statusData.status === 'failed') {
+        statusMessage = 'Failed';
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+        actionBtn.disabled = false;
+    } else if (statusData.status === 'cancelled' || statusData.status === 'partial') {
+        statusMessage = 'Process Aborted';
+        actionBtn.textContent = 'Start';
+        actionBtn.style.background = '#28a745';
+        actionBtn.disabled = false;
+    }
+    
+    // Only update if we have a message to set
+    if (statusMessage) {
+        statusText.textContent = statusMessage;
+    }
+    updateAnalyticsPauseButton(statusData.status);
+    
+    // Update status styling
+    statusElement.className = 'analytics-status';
+    if (statusData.status === 'running') {
+        statusElement.classList.add('running');
+    } else if (statusData.status === 'completed') {
+        statusElement.classList.add('completed');
+    } else if (statusData.status === 'failed' || statusData.status === 'partial') {
+        statusElement.classList.add('failed');
+    }
+}
+
+function startAnalyticsStatusStream() {
+    // Server-sent status events replace polling where the browser supports them
+    if (analyticsStreamUnavailable || !window.EventSource) {
+        return false;
+    }
+    if (analyticsEventSource) {
+        return true;
+    }
+    
+    analyticsEventSource = new EventSource('/analytics/stream/');
+    analyticsEventSource.addEventListener('status', handleAnalyticsStatusEvent);
+    analyticsEventSource.addEventListener('complete', handleAnalyticsStatusEvent);
+    analyticsEventSource.onerror = function() {
+        // The browser reconnects by itself unless the stream was refused
+        if (analyticsEventSource.readyState === EventSource.CLOSED) {
+            analyticsEventSource = null;
+            analyticsStreamUnavailable = true;
+            startAnalyticsStatusMonitoring();
+            if (analyticsStreamProcessing) {
+                startAnalyticsProcessingMonitoring();
+            }
+        }
+    };
+    return true;
+}
+
+function handleAnalyticsStatusEvent(event) {
+    const data = JSON.parse(event.data);
+    if (!data.success) {
+        return;
+    }
+    
+    if (data.status === 'running' || data.status === 'paused' || analyticsStreamProcessing) {
+        // Same display as the processing poll, including the finished state
+        analyticsStreamProcessing = data.status === 'running' || data.status === 'paused';
+        updateAnalyticsProcessingStatus(data);
+    } else {
+        updateAnalyticsStatus(data);
+    }
+}
+
+function startAnalyticsStatusMonitoring(interval = 30000) {
+    if (startAnalyticsStatusStream()) {
+        return;
+    }
+    
+    // Clear existing interval
+    if (analyticsStatusInterval) {
+        clearInterval(analyticsStatusInterval);
+    }
+    
+    // Don't monitor during active processing
+    if (analyticsProcessingInterval) {
+        return;
+    }
+    
+    // Check status immediately
+    checkAnalyticsStatus();
+    
+    // Set up periodic checking
+    analyticsStatusInterval = setInterval(checkAnalyticsStatus, interval);
+}
+
+// Monitor connection status changes
+setInterval(checkAnalyticsConnection, 5000);
+
+// Analytics Edit/Save Logic
+document.addEventListener('DOMContentLoaded', function() {
+    const analyticsSection = document.querySelector(".settings-section.analytics-settings");
+    const editSaveSpan = analyticsSection.querySelector(".edit-save-text");
+    const analyticsForm = document.getElementById('analytics-form');
+
+    editSaveSpan.addEventListener("click", function() {
+        if (this.textContent === 'Edit') {
+            // EDIT MODE
+            this.textContent = 'Save';
+            this.classList.add('save-mode');
+            
+            // Enable all inputs in the Analytics form except Start button
+            const inputs = analyticsForm.querySelectorAll('select, input');
+            inputs.forEach(input => {
+                if (input.id !== 'analytics-action-btn') {
+                    input.disabled = false;
+                }
+            });
+            
+            // Start button stays disabled in edit mode for schedules
+            const frequency = document.getElementById('analytics-frequency').value;
+            if (frequency !== 'manual') {
+                document.getElementById('analytics-action-btn').disabled = true;
+            }
+        } else {
+            // SAVE MODE
+            // Call the existing saveAnalyticsConfig function
+            saveAnalyticsConfig();
+            
+            // Revert to Edit state
+            this.textContent = 'Edit';
+            this.classList.remove('save-mode');
+            
+            // Disable all inputs in the Analytics form
+            const inputs = analyticsForm.querySelectorAll('select, input');
+            inputs.forEach(input => {
+                input.disabled = true;
+            });
+            
+            // Enable Start button only if manual mode
+            const frequency = document.getElementById('analytics-frequency').value;
+            const preset = document.getElementById('analytics-preset').value;
+            if (frequency === 'manual' && preset) {
+                document.getElementById('analytics-action-btn').disabled = false;
+            }
+        }
+    });
+
+    // Initially disable all inputs in the Analytics form
+    const inputs = analyticsForm.querySelectorAll('select, input');
+    inputs.forEach(input => {
+        input.disabled = true;
+    });
+});
+
+
+const logoutTrigger = document.getElementById('logout-trigger');
+const logoutForm = document.getElementById('logout-form');
+
+if (logoutTrigger && logoutForm) {
+    logoutTrigger.addEventListener('click', function () {
+        logoutForm.submit();
+    });
+}
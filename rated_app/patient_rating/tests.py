@@ -1,3 +1,649 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+import pytz
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import behavioral_processor
+from .analytics_pipeline import Pipeline, Stage
+from .behavioral_processor import BATCH_COLUMNS, SCORE_CATEGORIES, BehavioralProcessor
+from .cohort_shards import ShardedCohortDiscovery
+from .config_cache import config_cache
+from .email_outbox import OutboxSender, queue_email
+from .integrations.base_client import BaseClient
+from .integrations.cliniko.cliniko_client import ClinikoClient
+from .integrations.factory import IntegrationFactory
+from .job_control import JobControl, JobInterrupted
+from .models import (
+    AgeBracket, AnalyticsJob, OutboxEmail, Patient, RatedAppSettings, ScoringConfiguration, SpendBracket
+)
+from .scheduler import AnalyticsScheduler
+
+SYDNEY = pytz.timezone('Australia/Sydney')
+
+
+class FakeClient(BaseClient):
+    """
+    In-memory practice management API for analytics runs
+
+    Writing a rating bumps the appointment's updated_at, as Cliniko does.
+    """
+
+    def __init__(self, settings, patient_count=2):
+        super().__init__(settings)
+        now = timezone.now()
+        self.notes_written = 0
+        self.records = {}
+        for number in range(1, patient_count + 1):
+            patient_id = str(1000 + number)
+            self.records[patient_id] = {
+                'patient': {
+                    'id': patient_id,
+                    'first_name': f'First{number}',
+                    'last_name': f'Last{number}',
+                    'date_of_birth': '1980-06-15',
+                    'updated_at': (now - timedelta(days=30)).isoformat(),
+                },
+                'appointments': [
+                    {
+                        'id': f'{patient_id}-{days}',
+                        'starts_at': (now - timedelta(days=days)).isoformat(),
+                        'updated_at': (now - timedelta(days=days)).isoformat(),
+                        'cancelled_at': None,
+                        'did_not_arrive': False,
+                        'notes': '',
+                        'patient': {'links': {'self': f'https://api.example/patients/{patient_id}'}},
+                    }
+                    for days in (10, 40, 70)
+                ],
+                'invoices': [],
+            }
+
+    def get_patients(self, page=1, per_page=100, filters=None):
+        self.request_timeout()
+        record = self.records.get((filters or {}).get('id'))
+        return [dict(record['patient'])] if record else []
+
+    def search_patients(self, name=None, page=1, per_page=100):
+        return []
+
+    def get_appointments(self, patient_id, start_date=None, end_date=None, include_cancelled=True):
+        self.request_timeout()
+        return [dict(appointment) for appointment in self.records[patient_id]['appointments']]
+
+    def get_cancelled_appointments(self, patient_id, start_date=None, end_date=None):
+        self.request_timeout()
+        return []
+
+    def get_invoices(self, patient_id, start_date=None, end_date=None):
+        self.request_timeout()
+        return []
+
+    def get_referrals(self, patient_id):
+        self.request_timeout()
+        return {'referral_count': 0, 'referred_patient_ids': []}
+
+    def validate_connection(self):
+        return True
+
+    def get_appointments_by_date_range(self, start_date, end_date, page=1, per_page=100):
+        return [appointment for record in self.records.values() for appointment in record['appointments']]
+
+    def update_appointment_notes(self, appointment_id, notes, append=True):
+        return True
+
+    def batch_get_patients(self, patient_ids):
+        return [self.records[patient_id]['patient'] for patient_id in patient_ids]
+
+    def get_patients_with_appointments_in_range(self, start_date, end_date):
+        self.request_timeout()
+        return [
+            {'patient_id': patient_id, 'name': f"{record['patient']['first_name']} {record['patient']['last_name']}"}
+            for patient_id, record in self.records.items()
+        ]
+
+    def get_patient_changes_since(self, since):
+        self.request_timeout()
+        cut_off = datetime.fromisoformat(f"{since}+00:00")
+        changes = {}
+        for patient_id, record in self.records.items():
+            stamps = [record['patient']['updated_at']]
+            stamps.extend(appointment['updated_at'] for appointment in record['appointments'])
+            latest = max(datetime.fromisoformat(stamp) for stamp in stamps)
+            if latest > cut_off:
+                changes[patient_id] = latest.isoformat()
+        return changes
+
+    def update_patient_appointment_notes(self, patient_id, rating_text):
+        self.request_timeout()
+        appointment = max(self.records[patient_id]['appointments'], key=lambda appointment: appointment['starts_at'])
+        appointment['notes'] = rating_text
+        appointment['updated_at'] = timezone.now().isoformat()
+        self.notes_written += 1
+        return dict(appointment)
+
+    def get_rate_limits(self):
+        return {'requests_per_minute': 100000, 'recommended_delay': 0, 'batch_size': 100,
+                'concurrent_requests': 1, 'retry_after': 60}
+
+
+class AnalyticsRunTestCase(TransactionTestCase):
+    """Runs process_analytics against a FakeClient (pipeline threads need committed rows)"""
+
+    def setUp(self):
+        self.settings = RatedAppSettings.objects.create(
+            clinic_name='Test Clinic', clinic_location='Sydney', api_key='test-key',
+            clinic_timezone='Australia/Sydney'
+        )
+        # Flushed between tests, so the migration's default preset may be gone
+        self.config, _ = ScoringConfiguration.objects.get_or_create(
+            name='Default Configuration', defaults={'is_active_for_behavior': True}
+        )
+        config_cache.clear()
+        self.client = FakeClient(self.settings)
+        patcher = mock.patch.object(IntegrationFactory, 'get_client', return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_job(self, **fields):
+        return AnalyticsJob.objects.create(
+            date_range='3', preset=self.config, scheduled_time=dtime(2, 0),
+            is_test_mode=False, **fields
+        )
+
+    def run_job(self, job):
+        self.client.control = None
+        self.client.requests_made = 0
+        call_command('process_analytics', job_id=job.id)
+        job.refresh_from_db()
+        return job
+
+
+class IncrementalAnalyticsTests(AnalyticsRunTestCase):
+
+    def test_second_run_without_source_changes_skips_patients(self):
+        job = self.create_job(incremental=True)
+
+        first = self.run_job(job)
+        self.assertEqual(first.status, 'completed')
+        self.assertEqual(first.patients_skipped, 0)
+        self.assertEqual(self.client.notes_written, 2)
+
+        # The first run's own note edits bumped updated_at in the source
+        second = self.run_job(job)
+        self.assertEqual(second.status, 'completed')
+        self.assertEqual(second.patients_skipped, 2)
+        self.assertEqual(self.client.notes_written, 2)
+
+    def test_source_change_rescores_only_that_patient(self):
+        job = self.create_job(incremental=True)
+        self.run_job(job)
+
+        self.client.records['1001']['patient']['updated_at'] = (timezone.now() + timedelta(seconds=1)).isoformat()
+        second = self.run_job(job)
+        self.assertEqual(second.patients_skipped, 1)
+        self.assertEqual(Patient.objects.filter(is_stale=False).count(), 2)
+
+
+class ClinikoNoteWriteTests(TestCase):
+
+    def setUp(self):
+        settings = RatedAppSettings(clinic_name='Test Clinic', api_key='test-key')
+        self.client = ClinikoClient(settings)
+
+    def response(self, status_code, body):
+        return mock.Mock(status_code=status_code, json=mock.Mock(return_value=body))
+
+    def test_unchanged_rating_skips_put(self):
+        appointment = {'id': '1', 'notes': 'Rated A Prefers mornings', 'updated_at': '2026-01-01T00:00:00Z'}
+        with mock.patch.object(ClinikoClient, 'send', return_value=self.response(200, appointment)) as send:
+            written = self.client.write_appointment_notes('1', 'Rated A')
+        self.assertEqual(written, appointment)
+        self.assertEqual([call.args[0] for call in send.call_args_list], ['GET'])
+
+    def test_new_rating_returns_appointment_after_put(self):
+        current = {'id': '1', 'notes': 'Rated B', 'updated_at': '2026-01-01T00:00:00Z'}
+        updated = {'id': '1', 'notes': 'Rated A', 'updated_at': '2026-02-01T00:00:00Z'}
+        with mock.patch.object(ClinikoClient, 'send', side_effect=[
+            self.response(200, current), self.response(200, updated)
+        ]) as send:
+            written = self.client.write_appointment_notes('1', 'Rated A')
+        self.assertEqual(written, updated)
+        self.assertEqual(send.call_args_list[1].kwargs['json'], {'notes': 'Rated A'})
+
+
+class ScoringPlanTestCase(TestCase):
+    """A configuration with overlapping brackets, a gap and edges that aren't exact floats"""
+
+    def setUp(self):
+        self.config = ScoringConfiguration.objects.create(
+            name='Plan Test', age_demographics_weight=17, yearly_spend_weight=33
+        )
+        for order, (min_age, max_age, percentage) in enumerate([(0, 17, 40), (18, 35, 100), (30, 64, 70), (70, 200, 25)]):
+            AgeBracket.objects.create(config=self.config, order=order, min_age=min_age, max_age=max_age, percentage=percentage)
+        for order, (min_spend, max_spend, percentage) in enumerate([
+            ('0.01', '199.99', 20), ('150.10', '500.00', 60), ('750.30', '1999.99', 90), ('500.00', '750.00', 45)
+        ]):
+            SpendBracket.objects.create(
+                config=self.config, order=order, min_spend=Decimal(min_spend), max_spend=Decimal(max_spend),
+                percentage=percentage
+            )
+        self.plan = self.config.compile()
+
+    # Spend amounts on, just inside and just outside every bracket edge
+    SPEND_SAMPLES = [
+        0, 0.005, 0.01, 100, 150.1, 199.99, 200, 499.999, 500, 500.004, 600, 750, 750.15,
+        750.3, 1000, 1999.99, 1999.995, 2000, 50000,
+    ]
+
+
+class ScoringPlanTests(ScoringPlanTestCase):
+
+    def config_age_points(self, age):
+        # Per-patient bracket scan the plan replaced
+        bracket = next((b for b in self.config.age_brackets.all() if b.min_age <= age <= b.max_age), None)
+        if bracket is None:
+            return 0, "No matching bracket"
+        return (
+            int((bracket.percentage / 100) * self.config.age_demographics_weight),
+            f"[{bracket.min_age}-{bracket.max_age}] ({bracket.percentage}%)"
+        )
+
+    def config_spend_points(self, yearly_spend):
+        spend_brackets = self.config.spend_brackets.all().order_by('order')
+        percentage = 0
+        for bracket in spend_brackets:
+            if bracket.min_spend <= yearly_spend <= bracket.max_spend:
+                percentage = bracket.percentage / 100
+                break
+        if percentage == 0 and yearly_spend > 0 and spend_brackets.exists():
+            highest = spend_brackets.order_by('-max_spend').first()
+            if yearly_spend > highest.max_spend:
+                percentage = highest.percentage / 100
+        return round(self.config.yearly_spend_weight * percentage)
+
+    def test_age_points_match_configuration(self):
+        for age in range(-1, 230):
+            with self.subTest(age=age):
+                self.assertEqual(self.plan.age_points(age), self.config_age_points(age))
+
+    def test_spend_points_match_configuration(self):
+        for yearly_spend in self.SPEND_SAMPLES:
+            with self.subTest(yearly_spend=yearly_spend):
+                self.assertEqual(self.plan.spend_points(yearly_spend), self.config_spend_points(yearly_spend))
+
+    def test_weights_copied_from_configuration(self):
+        for field in ScoringConfiguration.SCORING_FIELDS:
+            self.assertEqual(getattr(self.plan, field), getattr(self.config, field))
+        self.assertEqual(self.plan.config_id, self.config.id)
+
+
+class ScoreBatchTests(ScoringPlanTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.settings = RatedAppSettings(clinic_timezone='Australia/Sydney')
+        self.features = [
+            {
+                'id': str(number), 'future_count': number % 3, 'age': age, 'yearly_spend': yearly_spend,
+                'consecutive_streak': number % 20, 'referral_count': number % 7, 'open_dna_count': number % 4 == 0,
+                'unpaid_count': number % 5, 'cancellation_count': number % 9, 'dna_count': number % 6,
+            }
+            for number, (age, yearly_spend) in enumerate(
+                (age, yearly_spend) for age in (-1, 0, 17, 18, 33, 66, 80, 250) for yearly_spend in self.SPEND_SAMPLES
+            )
+        ]
+        self.likability = {features['id']: int(features['id']) % 41 - 20 for features in self.features}
+
+    def assert_matches_score_features(self, batch):
+        for index, features in enumerate(self.features):
+            with self.subTest(features=features):
+                expected = BehavioralProcessor.score_features(features, self.config, self.settings, self.likability)
+                points = {category: batch['points'][category][index] for category in SCORE_CATEGORIES}
+                self.assertEqual(points, {
+                    category: values['points'] for category, values in expected['behavior_data'].items()
+                })
+                self.assertEqual(batch['total_score'][index], expected['total_score'])
+                self.assertEqual(batch['letter_grade'][index], expected['letter_grade'])
+
+    def columns(self):
+        rows = [BehavioralProcessor.feature_row(features, self.likability[features['id']]) for features in self.features]
+        return {column: [row[column] for row in rows] for column in BATCH_COLUMNS}
+
+    def test_python_batch_matches_score_features(self):
+        with mock.patch.object(behavioral_processor, 'np', None):
+            batch = BehavioralProcessor.score_batch(self.columns(), self.plan)
+        self.assert_matches_score_features(batch)
+
+    @skipIf(behavioral_processor.np is None, 'NumPy is not installed')
+    def test_numpy_batch_matches_score_features(self):
+        self.assert_matches_score_features(BehavioralProcessor.score_batch(self.columns(), self.plan))
+
+    def test_empty_cohort(self):
+        empty = {column: [] for column in BATCH_COLUMNS}
+        self.assertEqual(BehavioralProcessor.score_batch(empty, self.plan)['total_score'], [])
+
+
+class LoggedInMixin:
+    """Logged-in test client with clinic settings"""
+
+    def setUp(self):
+        super().setUp()
+        RatedAppSettings.objects.create(
+            clinic_name='Test Clinic', clinic_location='Sydney', api_key='test-key',
+            clinic_timezone='Australia/Sydney'
+        )
+        user = User.objects.create_user('staff', password='password')
+        self.client.force_login(user)
+        config_cache.clear()
+
+
+class ViewTestCase(LoggedInMixin, TestCase):
+    pass
+
+
+class NoActivePresetTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ScoringConfiguration.objects.update(is_active_for_behavior=False)
+
+    def test_active_plan_is_none(self):
+        self.assertIsNone(ScoringConfiguration.active_plan())
+
+    def test_patient_bundle_reports_missing_preset(self):
+        response = self.client.get(reverse('patient_bundle', args=[1001]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'No active scoring configuration found')
+
+    def test_dashboard_score_reports_missing_preset(self):
+        response = self.client.get(reverse('patient_dashboard_score', args=[1001]))
+        self.assertEqual(response.json()['error'], 'No active scoring configuration found')
+
+
+class PresetETagTests(ViewTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = ScoringConfiguration.objects.create(name='Cached')
+
+    def assert_revalidates(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        etag = first.headers['ETag']
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+
+        self.config.dna_weight += 1
+        self.config.save()
+        changed = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_preset_list_revalidates(self):
+        self.assert_revalidates(reverse('get_presets'))
+
+    def test_preset_details_revalidate(self):
+        self.assert_revalidates(reverse('get_preset_details', args=[self.config.id]))
+
+    def test_bracket_change_invalidates(self):
+        url = reverse('get_preset_details', args=[self.config.id])
+        etag = self.client.get(url).headers['ETag']
+        AgeBracket.objects.create(config=self.config, order=1, min_age=0, max_age=30, percentage=50)
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+class PresetUpdateTests(LoggedInMixin, TransactionTestCase):
+    """Committed transactions, so the config cache keeps what it loads"""
+
+    def test_saved_brackets_reach_cached_plan(self):
+        config = ScoringConfiguration.objects.create(name='Editable', is_active_for_behavior=True)
+        self.assertEqual(ScoringConfiguration.active_plan().age_points(30)[0], 0)
+
+        weights = {field: getattr(config, field) for field in ScoringConfiguration.SCORING_FIELDS}
+        response = self.client.post(reverse('unified_dashboard'), {
+            'action': 'update_preset', 'preset_name': 'Editable', **weights,
+            'age_brackets_data': json.dumps([{'min_age': 18, 'max_age': 40, 'percentage': 100, 'order': 1}]),
+        }, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertTrue(response.json()['success'])
+
+        self.assertEqual(ScoringConfiguration.active_plan().age_points(30)[0], config.age_demographics_weight)
+
+
+class ScheduleTestCase(TestCase):
+
+    def setUp(self):
+        RatedAppSettings.objects.create(clinic_name='Test Clinic', clinic_location='Sydney', clinic_timezone='Australia/Sydney')
+        self.config = ScoringConfiguration.objects.get(is_active_for_behavior=True)
+
+    def create_job(self, **fields):
+        fields.setdefault('scheduled_time', dtime(2, 0))
+        return AnalyticsJob.objects.create(date_range='3', preset=self.config, **fields)
+
+
+class NextRunTests(ScheduleTestCase):
+
+    def test_daily_run_keeps_local_time_when_dst_starts(self):
+        job = self.create_job(frequency='daily', scheduled_time=dtime(9, 0))
+        next_run = job.calculate_next_run(now=SYDNEY.localize(datetime(2026, 10, 3, 10, 0)))
+        local = next_run.astimezone(SYDNEY)
+        self.assertEqual((local.date().isoformat(), local.hour, local.minute), ('2026-10-04', 9, 0))
+        self.assertEqual(local.utcoffset(), timedelta(hours=11))
+
+    def test_time_in_spring_forward_gap_runs_an_hour_later(self):
+        job = self.create_job(frequency='daily', scheduled_time=dtime(2, 30))
+        next_run = job.calculate_next_run(now=SYDNEY.localize(datetime(2026, 10, 3, 12, 0)))
+        self.assertEqual(next_run, pytz.utc.localize(datetime(2026, 10, 3, 16, 30)))
+        self.assertEqual(next_run.astimezone(SYDNEY).hour, 3)
+
+    def test_weekly_run_keeps_local_time_when_dst_ends(self):
+        job = self.create_job(frequency='weekly', scheduled_day=6, scheduled_time=dtime(9, 0))
+        next_run = job.calculate_next_run(now=SYDNEY.localize(datetime(2026, 4, 4, 12, 0)))
+        local = next_run.astimezone(SYDNEY)
+        self.assertEqual((local.date().isoformat(), local.hour), ('2026-04-05', 9))
+        self.assertEqual(local.utcoffset(), timedelta(hours=10))
+
+
+class StaleJobReclaimTests(ScheduleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(AnalyticsScheduler, 'run_job')
+        self.run_job = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def running_job(self, lease_expires_at, updated_at=None):
+        job = self.create_job(status='running')
+        AnalyticsJob.objects.filter(id=job.id).update(
+            lease_expires_at=lease_expires_at,
+            updated_at=updated_at or timezone.now() - timedelta(hours=2)
+        )
+        return job
+
+    def test_job_with_live_lease_is_left_alone(self):
+        # Quiet for hours (e.g. long cohort discovery) but still renewing
+        self.running_job(timezone.now() + timedelta(minutes=5))
+        AnalyticsScheduler().reclaim_stale_jobs()
+        self.run_job.assert_not_called()
+
+    def test_lapsed_job_is_taken_over_by_one_scheduler(self):
+        job = self.running_job(timezone.now() - timedelta(minutes=1))
+        AnalyticsScheduler().reclaim_stale_jobs()
+        AnalyticsScheduler().reclaim_stale_jobs()
+        self.run_job.assert_called_once_with(job.id)
+        job.refresh_from_db()
+        self.assertGreater(job.lease_expires_at, timezone.now())
+
+    def test_job_from_before_leases_uses_updated_at(self):
+        old = self.running_job(None)
+        self.running_job(None, updated_at=timezone.now())
+        AnalyticsScheduler().reclaim_stale_jobs()
+        self.run_job.assert_called_once_with(old.id)
+
+    def test_run_that_lost_its_lease_stops(self):
+        job = self.create_job(status='running')
+        control = JobControl(job)
+        control.take_lease()
+        self.assertIsNone(control.poll(force=True))
+
+        # The worker stalled past its lease and another run took the job
+        AnalyticsJob.objects.filter(id=job.id).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertTrue(AnalyticsJob.objects.get(id=job.id).take_over())
+        control._renewed -= JobControl.LEASE_RENEW_INTERVAL
+        self.assertEqual(control.poll(force=True), 'lease_lost')
+        control.release()
+
+
+class PipelineTests(SimpleTestCase):
+
+    def pipeline(self, *funcs):
+        return Pipeline([Stage(f'stage{number}', func, queue_size=1) for number, func in enumerate(funcs)], output_size=1)
+
+    def items(self, count):
+        return ({'patient_id': number} for number in range(count))
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return condition()
+
+    def test_full_queues_hold_back_earlier_stages(self):
+        pipeline = self.pipeline(lambda item: item, lambda item: item)
+        pipeline.start()
+        pipeline.feed(self.items(20))
+
+        # Nothing is consumed: at most one item per queue and per worker is in flight
+        time.sleep(0.3)
+        self.assertLessEqual(pipeline.stages[0].processed, 4)
+
+        self.assertEqual([item['patient_id'] for item in pipeline.results()], list(range(20)))
+        pipeline.close()
+
+    def test_failing_item_is_marked_and_passed_on(self):
+        def score(item):
+            if item['patient_id'] == 2:
+                raise ValueError('bad record')
+            item['status'] = 'success'
+            return item
+
+        def write_back(item):
+            item['written'] = item['status'] == 'success'
+            return item
+
+        pipeline = self.pipeline(score, write_back)
+        pipeline.start()
+        with self.assertLogs('patient_rating.analytics_pipeline', 'ERROR'):
+            pipeline.feed(self.items(5))
+            results = {item['patient_id']: item for item in pipeline.results()}
+        pipeline.close()
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual((results[2]['status'], results[2]['error']), ('error', 'bad record'))
+        self.assertEqual(sum(item['written'] for item in results.values()), 4)
+
+    def test_interruption_passes_remaining_items_through(self):
+        def fetch(item):
+            if item['patient_id'] == 3:
+                raise JobInterrupted('pause')
+            item['status'] = 'success'
+            return item
+
+        pipeline = self.pipeline(fetch)
+        pipeline.start()
+        pipeline.feed(self.items(6))
+        statuses = [item['status'] for item in pipeline.results()]
+        pipeline.close()
+        self.assertEqual(statuses, ['success'] * 3 + ['interrupted'] * 3)
+
+    def test_close_releases_threads_after_consumer_stops(self):
+        pipeline = self.pipeline(lambda item: item, lambda item: item)
+        pipeline.start()
+        pipeline.feed(self.items(50))
+        next(pipeline.results())
+        pipeline.close()
+
+        def pipeline_threads():
+            return [thread for thread in threading.enumerate() if thread.name.startswith('pipeline-')]
+        self.assertTrue(self.wait_for(lambda: not pipeline_threads()))
+
+
+class ShardWorkerTests(SimpleTestCase):
+
+    def test_pool_threads_close_their_connections(self):
+        settings = RatedAppSettings(clinic_name='Test Clinic', api_key='test-key', clinic_timezone='Australia/Sydney')
+        discovery = ShardedCohortDiscovery(FakeClient(settings), settings, workers=3)
+
+        def fetch(number):
+            if number == 4:
+                raise ValueError('API error')
+            return threading.current_thread().name
+
+        with mock.patch('patient_rating.cohort_shards.close_old_connections') as close:
+            names = discovery.run_parallel(fetch, range(4))
+            with self.assertRaises(ValueError):
+                discovery.run_parallel(fetch, range(5))
+
+        self.assertTrue(all(name.startswith('cohort-shard') for name in names))
+        self.assertEqual(close.call_count, 9)
+
+
+class OutboxSenderTests(TestCase):
+
+    def setUp(self):
+        RatedAppSettings.objects.create(
+            clinic_name='Test Clinic', clinic_location='Sydney',
+            smtp_host='smtp.example.com', smtp_port=587, smtp_username='clinic@example.com', smtp_password='secret'
+        )
+        self.email = queue_email('Report', 'Body', 'clinic@example.com', 'owner@example.com')
+        self.sender = OutboxSender()
+
+    def make_due(self):
+        OutboxEmail.objects.filter(id=self.email.id).update(next_attempt_at=timezone.now())
+
+    def assert_retry_in(self, seconds):
+        email = OutboxEmail.objects.get(id=self.email.id)
+        self.assertEqual(email.status, 'pending')
+        delay = (email.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, seconds, delta=5)
+        return email
+
+    def test_failed_sends_back_off_exponentially(self):
+        with mock.patch('patient_rating.email_outbox.smtplib.SMTP', side_effect=OSError('connection refused')):
+            self.sender.send_due()
+            email = self.assert_retry_in(OutboxSender.RETRY_BASE)
+            self.assertEqual((email.attempts, email.last_error), (1, 'connection refused'))
+
+            # Not due yet - nothing is attempted
+            self.assertEqual(self.sender.send_due(), 0)
+
+            self.make_due()
+            self.sender.send_due()
+            self.assertEqual(self.assert_retry_in(OutboxSender.RETRY_BASE * 2).attempts, 2)
+
+    def test_gives_up_after_max_attempts(self):
+        OutboxEmail.objects.filter(id=self.email.id).update(attempts=OutboxSender.MAX_ATTEMPTS - 1)
+        with mock.patch('patient_rating.email_outbox.smtplib.SMTP', side_effect=OSError('connection refused')):
+            self.sender.send_due()
+        email = OutboxEmail.objects.get(id=self.email.id)
+        self.assertEqual((email.status, email.attempts), ('failed', OutboxSender.MAX_ATTEMPTS))
+
+    def test_due_email_is_sent_over_one_connection(self):
+        second = queue_email('Second report', 'Body', 'clinic@example.com', 'owner@example.com')
+        with mock.patch('patient_rating.email_outbox.smtplib.SMTP') as smtp:
+            smtp.return_value.noop.return_value = (250, b'OK')
+            self.sender.drain()
+
+        self.assertEqual(smtp.call_count, 1)
+        self.assertEqual(smtp.return_value.send_message.call_count, 2)
+        for email in OutboxEmail.objects.filter(id__in=[self.email.id, second.id]):
+            self.assertEqual((email.status, email.attempts), ('sent', 1))
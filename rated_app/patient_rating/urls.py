@@ -31,11 +31,22 @@ urlpatterns = [
 
     path("delete-preset/", login_required(views.delete_preset), name="delete_preset"),
     path("patients/<int:patient_id>/dashboard-score/", login_required(views.PatientDashboardScoreView.as_view()), name="patient_dashboard_score"),
+    path("patients/<int:patient_id>/bundle/", login_required(views.patient_bundle), name="patient_bundle"),
+    path("patients/<int:patient_id>/score-history/", login_required(views.patient_score_history), name="patient_score_history"),
     path("patients/presets/get/", login_required(views.get_presets), name="get_presets"),
 
     path("analytics/config/", login_required(views.analytics_config), name="analytics_config"),
+    path("analytics/estimate/", login_required(views.analytics_estimate), name="analytics_estimate"),
     path("analytics/start/", login_required(views.analytics_start), name="analytics_start"),
     path("analytics/cancel/", login_required(views.analytics_cancel), name="analytics_cancel"),
+    path("analytics/pause/", login_required(views.analytics_pause), name="analytics_pause"),
+    path("analytics/resume/", login_required(views.analytics_resume), name="analytics_resume"),
     path("analytics/status/", login_required(views.analytics_status), name="analytics_status"),
+    path("analytics/stream/", login_required(views.analytics_stream), name="analytics_stream"),
+    path("metrics/requests/", login_required(views.request_metrics), name="request_metrics"),
     path("analytics/presets/", login_required(views.analytics_presets), name="analytics_presets"),
+    path("analytics/grade-migration/", login_required(views.analytics_grade_migration), name="analytics_grade_migration"),
+    path("analytics/comparison/", login_required(views.analytics_comparison), name="analytics_comparison"),
+    path("analytics/preview/", login_required(views.analytics_preview), name="analytics_preview"),
+    path("analytics/export/", login_required(views.analytics_export), name="analytics_export"),
 ]
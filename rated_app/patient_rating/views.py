@@ -2,12 +2,15 @@ import json
 import logging
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponseRedirect
-from django.views.decorators.http import require_POST, require_http_methods
+from django.http import HttpResponse, JsonResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST, require_http_methods
 from django.views import View
 from django.contrib import messages
 from django.urls import reverse
-from django.db.models import F
+from django.db.models import F, Prefetch
 from django.db import models, IntegrityError, transaction
 from django.views.decorators.csrf import csrf_exempt
 from django.core.management import call_command  # NEW
@@ -17,22 +20,24 @@ from django.utils import timezone
 from datetime import datetime, timedelta
 import pytz
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s: %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # Import models
 from .models import (
     RatedAppSettings, ScoringConfiguration, Patient, 
-    AgeBracket, SpendBracket, AnalyticsJob
+    AgeBracket, SpendBracket, AnalyticsJob, PatientScoreSnapshot
 )
 
 # Import plugin architecture components
 from .integrations.factory import IntegrationFactory
 from .behavioral_processor import BehavioralProcessor
+from .feature_cache import get_patient_features
+from .preset_comparison import comparison_report
+from .cohort_preview import draft_plan, preview_distribution
+from .job_control import JobControl
+from .config_cache import config_cache
+from .request_metrics import view_stats
+from .progress_stream import analytics_status_data, single_status_event, status_events
 
 # Helper function for safe integer conversion
 def safe_int(value, default=0):
@@ -68,7 +73,7 @@ class PatientSearchView(View):
         
         try:
             # Get settings and initialize plugin client
-            settings = RatedAppSettings.objects.first()
+            settings = RatedAppSettings.cached()
             if not settings:
                 return render(request, 'patient_rating/patient_search.html', {
                     'error': 'System not configured. Please configure settings first.'
@@ -161,7 +166,7 @@ class PatientSearchView(View):
     def get_open_dna_invoices(self, patient_id):
         """Get open DNA invoices using plugin architecture"""
         try:
-            settings = RatedAppSettings.objects.first()
+            settings = RatedAppSettings.cached()
             if not settings:
                 return {'count': 0, 'has_open_dna': False, 'description': 'System not configured'}
             
@@ -186,7 +191,7 @@ class PatientSearchView(View):
             }
             
         except Exception as e:
-            print(f"Error getting DNA invoices for patient {patient_id}: {e}")
+            logger.error(f"Error getting DNA invoices for patient {patient_id}: {e}")
             return {'count': 0, 'has_open_dna': False, 'description': "Error loading DNA invoices"}
     
     def get_likability_data(self, patient_id):
@@ -217,7 +222,7 @@ class PatientSearchView(View):
             }
             
         except Exception as e:
-            print(f"Error getting likability for patient {patient_id}: {e}")
+            logger.error(f"Error getting likability for patient {patient_id}: {e}")
             return {
                 'likability_score': 0,
                 'description': 'Error loading likability',
@@ -260,7 +265,12 @@ class PatientAnalysisView(View):
         
         # Continue with existing analysis logic
         try:
-            config = ScoringConfiguration.get_active_config()
+            config = ScoringConfiguration.active_plan()
+            if not config:
+                return JsonResponse({
+                    'status': 'error',
+                    'message': 'No active scoring configuration found'
+                })
             analysis = self.analyze_patient_behavior_plugin(patient_id, config)
             
             if analysis:
@@ -279,52 +289,29 @@ class PatientAnalysisView(View):
                 'message': str(e)
             })
     
-    def analyze_patient_behavior_plugin(self, patient_id, config):
+    def analyze_patient_behavior_plugin(self, patient_id, config, refresh=False):
         """Analyze patient behavior using plugin architecture"""
         try:
-            settings = RatedAppSettings.objects.first()
+            settings = RatedAppSettings.cached()
             if not settings:
                 return None
             
-            # Get client and normalizer
-            client = IntegrationFactory.get_client(settings)
-            normalizer = IntegrationFactory.get_normalizer(settings)
-            
-            # Get raw data from Cliniko
-            patients = client.get_patients(filters={'id': patient_id})
-            if not patients:
+            # Cached features are rescored, so only new patients hit Cliniko
+            features = get_patient_features(patient_id, settings, refresh=refresh)
+            if not features:
                 return None
             
-            raw_patient = patients[0]
-            appointments = client.get_appointments(patient_id)
-            invoices = client.get_invoices(patient_id)
-            referral_data = client.get_referrals(patient_id)
-            
-            # Normalize the data
-            normalized_patient = normalizer.normalize_patient(raw_patient)
-            
-            # Prepare data for behavioral processor (use RAW data as processor expects Cliniko format)
-            patient_data = {
-                'id': patient_id,
-                'date_of_birth': raw_patient.get('date_of_birth'),  # Use raw DOB
-                'appointments': appointments,  # Raw appointments
-                'invoices': invoices,  # Raw invoices
-                'referrals': referral_data.get('referred_patient_ids', []) if isinstance(referral_data, dict) else []
-            }
-            
-            # Process behavior using BehavioralProcessor
-            processor = BehavioralProcessor()
-            result = processor.process_patient_behavior(patient_data, config, settings)
+            result = BehavioralProcessor.score_features(
+                features, config, settings,
+                likability=Patient.likability_map([patient_id])
+            )
             
-            # Add patient name from normalized data
-            result['patient_name'] = normalized_patient['full_name']
+            result['patient_name'] = features['patient_name']
             
             return result
             
         except Exception as e:
-            print(f"Error in analyze_patient_behavior_plugin: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error in analyze_patient_behavior_plugin: {e}")
             return None
 
 
@@ -359,13 +346,13 @@ def get_referrer_count_plugin(patient_id, settings):
         return 0
         
     except Exception as e:
-        print(f"Error getting referrer count for patient {patient_id}: {e}")
+        logger.error(f"Error getting referrer count for patient {patient_id}: {e}")
         return 0
 
 
 def calculate_referrer_score(patient_id, points_per_referral, max_points):
     """Calculate referrer score with points cap logic"""
-    settings = RatedAppSettings.objects.first()
+    settings = RatedAppSettings.cached()
     if not settings:
         return 0
     
@@ -373,34 +360,28 @@ def calculate_referrer_score(patient_id, points_per_referral, max_points):
     raw_score = referral_count * points_per_referral
     final_score = min(raw_score, max_points)
     
-    print(f"Referrer score for patient {patient_id}: {referral_count} referrals × {points_per_referral} points = {raw_score}, capped at {max_points} = {final_score}")
+    logger.debug(f"Referrer score for patient {patient_id}: {referral_count} referrals × {points_per_referral} points = {raw_score}, capped at {max_points} = {final_score}")
     
     return final_score
 
 
 @login_required
 def unified_dashboard(request):
-    print("=== UNIFIED DASHBOARD REQUEST DEBUG ===")
-    print(f"Method: {request.method}")
-    print(f"Is AJAX: {request.headers.get('X-Requested-With') == 'XMLHttpRequest'}")
-    print(f"POST data: {dict(request.POST)}")
-    print("=" * 50)
-    
     # AJAX Handlers
     if request.method == "POST" and request.headers.get("X-Requested-With") == "XMLHttpRequest":
         action = request.POST.get("action")
-        print(f"AJAX ACTION RECEIVED: {action}")
+        logger.debug(f"Dashboard action: {action}")
         
         if action == "search_patients":
             search_term = request.POST.get("search_term", "").strip()
-            print(f"SEARCH REQUEST: '{search_term}'")
+            logger.debug(f"SEARCH REQUEST: '{search_term}'")
             
             if len(search_term) < 2:
-                print("Search term too short")
+                logger.debug("Search term too short")
                 return JsonResponse({"success": False, "error": "Search term too short"})
             
             try:
-                settings = RatedAppSettings.objects.first()
+                settings = RatedAppSettings.cached()
                 if not settings:
                     return JsonResponse({"success": False, "error": "System not configured"})
                 
@@ -422,10 +403,10 @@ def unified_dashboard(request):
                     test_patients = [{"id": 0, "name": "No patients found"}]
                 
             except Exception as e:
-                print(f"API Error: {e}")
+                logger.error(f"API Error: {e}")
                 test_patients = [{"id": 0, "name": f"Search error: {str(e)}"}]
             
-            print(f"Returning {len(test_patients)} test patients")
+            logger.debug(f"Returning {len(test_patients)} test patients")
             
             return JsonResponse({
                 "success": True,
@@ -448,11 +429,11 @@ def unified_dashboard(request):
                 patient.likability = likability
                 patient.save()
                 
-                print(f"SAVED LIKABILITY: Patient {patient_id} = {likability}")
+                logger.debug(f"SAVED LIKABILITY: Patient {patient_id} = {likability}")
                 return JsonResponse({'success': True, 'likability': likability})
                 
             except Exception as e:
-                print(f"LIKABILITY ERROR: {str(e)}")
+                logger.error(f"LIKABILITY ERROR: {str(e)}")
                 return JsonResponse({'success': False, 'error': str(e)})
         
         elif action == 'update_weights':
@@ -484,7 +465,7 @@ def unified_dashboard(request):
                 })
                 
             except Exception as e:
-                print(f"Error in update_weights: {e}")
+                logger.error(f"Error in update_weights: {e}")
                 return JsonResponse({"success": False, "error": str(e)})
                 
                 # Update all weight values
@@ -513,7 +494,7 @@ def unified_dashboard(request):
                 })
                 
             except Exception as e:
-                print(f"Error updating weights: {e}")
+                logger.error(f"Error updating weights: {e}")
                 return JsonResponse({"success": False, "error": str(e)})
         
         elif action == 'update_preset':
@@ -524,11 +505,11 @@ def unified_dashboard(request):
                 if not preset_name:
                     return JsonResponse({"success": False, "error": "Preset name required"})
                 
-                print(f"UPDATE PRESET: {preset_name}")
+                logger.debug(f"UPDATE PRESET: {preset_name}")
                 
                 try:
                     preset_config = ScoringConfiguration.objects.get(name=preset_name)
-                    print(f"Found preset to update: {preset_config.id}")
+                    logger.debug(f"Found preset to update: {preset_config.id}")
                 except ScoringConfiguration.DoesNotExist:
                     return JsonResponse({"success": False, "error": f"Preset '{preset_name}' not found"})
                 
@@ -550,18 +531,15 @@ def unified_dashboard(request):
                 preset_config.points_per_unpaid_invoice = int(request.POST.get("points_per_unpaid_invoice", 0))
                 preset_config.points_per_referral = int(request.POST.get("points_per_referral", 0))
                 
-                preset_config.save()
-                print(f"Updated preset configuration: {preset_name}")
-                
                 # Process age brackets data
                 age_brackets_data = request.POST.get('age_brackets_data')
                 if age_brackets_data:
                     try:
                         age_brackets = json.loads(age_brackets_data)
-                        print(f"Received {len(age_brackets)} age brackets from screen")
+                        logger.debug(f"Received {len(age_brackets)} age brackets from screen")
                         
                         AgeBracket.objects.filter(config=preset_config).delete()
-                        print(f"Deleted existing age brackets for preset")
+                        logger.debug(f"Deleted existing age brackets for preset")
                         
                         new_age_brackets = []
                         for bracket_data in age_brackets:
@@ -574,22 +552,22 @@ def unified_dashboard(request):
                             ))
                         
                         AgeBracket.objects.bulk_create(new_age_brackets)
-                        print(f"Created {len(new_age_brackets)} new age brackets from screen state")
+                        logger.debug(f"Created {len(new_age_brackets)} new age brackets from screen state")
                         
                     except json.JSONDecodeError as e:
-                        print(f"Error parsing age brackets JSON: {e}")
+                        logger.error(f"Error parsing age brackets JSON: {e}")
                     except Exception as e:
-                        print(f"Error processing age brackets: {e}")
+                        logger.error(f"Error processing age brackets: {e}")
                 
                 # Process spend brackets data
                 spend_brackets_data = request.POST.get('spend_brackets_data')
                 if spend_brackets_data:
                     try:
                         spend_brackets = json.loads(spend_brackets_data)
-                        print(f"Received {len(spend_brackets)} spend brackets from screen")
+                        logger.debug(f"Received {len(spend_brackets)} spend brackets from screen")
                         
                         SpendBracket.objects.filter(config=preset_config).delete()
-                        print(f"Deleted existing spend brackets for preset")
+                        logger.debug(f"Deleted existing spend brackets for preset")
                         
                         new_spend_brackets = []
                         for bracket_data in spend_brackets:
@@ -602,12 +580,17 @@ def unified_dashboard(request):
                             ))
                         
                         SpendBracket.objects.bulk_create(new_spend_brackets)
-                        print(f"Created {len(new_spend_brackets)} new spend brackets from screen state")
+                        logger.debug(f"Created {len(new_spend_brackets)} new spend brackets from screen state")
                         
                     except json.JSONDecodeError as e:
-                        print(f"Error parsing spend brackets JSON: {e}")
+                        logger.error(f"Error parsing spend brackets JSON: {e}")
                     except Exception as e:
-                        print(f"Error processing spend brackets: {e}")
+                        logger.error(f"Error processing spend brackets: {e}")
+                
+                # Saved after its brackets: bulk_create sends no signals, so this
+                # save's post_save is what refreshes cached configurations
+                preset_config.save()
+                logger.debug(f"Updated preset configuration: {preset_name}")
                 
                 return JsonResponse({
                     "success": True,
@@ -615,7 +598,7 @@ def unified_dashboard(request):
                 })
                 
             except Exception as e:
-                print(f"Error updating preset: {e}")
+                logger.error(f"Error updating preset: {e}")
                 return JsonResponse({"success": False, "error": str(e)})
         
         elif action == 'load_patient_behavior':
@@ -624,7 +607,7 @@ def unified_dashboard(request):
                 if not patient_id:
                     return JsonResponse({'success': False, 'error': 'Patient ID required'})
                 
-                print(f'Loading comprehensive behavior data for patient {patient_id}')
+                logger.debug(f'Loading comprehensive behavior data for patient {patient_id}')
                 
                 try:
                     # Check for testing configuration in session first
@@ -638,7 +621,7 @@ def unified_dashboard(request):
                     if not config:
                         return JsonResponse({'success': False, 'error': 'No active scoring configuration found'})
                 except Exception as e:
-                    print(f"Error getting active config: {e}")
+                    logger.error(f"Error getting active config: {e}")
                     return JsonResponse({'success': False, 'error': 'Configuration error'})
                 
                 # Extract behavior data using plugin architecture
@@ -648,8 +631,8 @@ def unified_dashboard(request):
                 total_score = calculate_total_score(behavior_data)
                 letter_grade = calculate_letter_grade(total_score)
                 
-                print(f'Comprehensive behavior data loaded: {total_score} points, grade {letter_grade}')
-                print(f'Behaviors loaded: {len(behavior_data)} categories')
+                logger.debug(f'Comprehensive behavior data loaded: {total_score} points, grade {letter_grade}')
+                logger.debug(f'Behaviors loaded: {len(behavior_data)} categories')
                 
                 # Format data for frontend
                 formatted_data = {}
@@ -700,7 +683,7 @@ def unified_dashboard(request):
                             'has_penalty': behavior_info < 0
                         }
                 
-                print(f'Formatted {len(formatted_data)} behaviors for update functions')
+                logger.debug(f'Formatted {len(formatted_data)} behaviors for update functions')
                 
                 return JsonResponse({
                     'success': True,
@@ -711,14 +694,12 @@ def unified_dashboard(request):
                 })
                 
             except Exception as e:
-                print(f"Error loading comprehensive patient behavior: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"Error loading comprehensive patient behavior: {e}")
                 return JsonResponse({'success': False, 'error': str(e)})
         
         elif action == 'save_preset':
             try:
-                print("SAVE PRESET: Reading screen values directly")
+                logger.debug("SAVE PRESET: Reading screen values directly")
                 
                 preset_name = request.POST.get('preset_name', '').strip()
                 preset_description = request.POST.get('preset_description', '').strip()
@@ -726,7 +707,7 @@ def unified_dashboard(request):
                 if not preset_name:
                     return JsonResponse({'success': False, 'error': 'Preset name is required'})
                 
-                print(f"Creating preset: '{preset_name}'")
+                logger.debug(f"Creating preset: '{preset_name}'")
                 
                 config_data = {
                     'name': preset_name,
@@ -752,7 +733,7 @@ def unified_dashboard(request):
                     'points_per_unpaid_invoice': int(request.POST.get('points_per_unpaid_invoice', 20))
                 }
                 
-                print(f"Screen values captured: {len(config_data)} fields")
+                logger.debug(f"Screen values captured: {len(config_data)} fields")
                 
                 new_preset = ScoringConfiguration.objects.create(**config_data)
                 
@@ -769,7 +750,7 @@ def unified_dashboard(request):
                             percentage=bracket['percentage'],
                             order=index + 1
                         )
-                    print(f"Age brackets added: {len(age_brackets)}")
+                    logger.debug(f"Age brackets added: {len(age_brackets)}")
                 
                 # Handle spend brackets from screen
                 spend_brackets_data = request.POST.get('spend_brackets_data')
@@ -783,9 +764,9 @@ def unified_dashboard(request):
                             percentage=bracket['percentage'],
                             order=index + 1
                         )
-                    print(f"Spend brackets added: {len(spend_brackets)}")
+                    logger.debug(f"Spend brackets added: {len(spend_brackets)}")
                 
-                print(f"PRESET CREATED: '{preset_name}' (ID: {new_preset.id}) - NOT APPLIED")
+                logger.debug(f"PRESET CREATED: '{preset_name}' (ID: {new_preset.id}) - NOT APPLIED")
                 
                 return JsonResponse({
                     'success': True,
@@ -795,9 +776,7 @@ def unified_dashboard(request):
                 })
                 
             except Exception as e:
-                print(f"SAVE PRESET ERROR: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception(f"SAVE PRESET ERROR: {e}")
                 return JsonResponse({'success': False, 'error': str(e)})
         
         elif action == 'load_patient_data':
@@ -838,7 +817,7 @@ def unified_dashboard(request):
                     preset.is_active_for_behavior = True
                     preset.save()
                     
-                    print(f"DEBUG: Preset {preset.name} activated successfully")
+                    logger.debug(f"Preset {preset.name} activated successfully")
                     
                     preset_data = {
                         "id": preset.id,
@@ -885,13 +864,11 @@ def unified_dashboard(request):
                     })
                     
                 except ScoringConfiguration.DoesNotExist:
-                    print(f"DEBUG: Preset with ID {preset_id} does not exist")
+                    logger.debug(f"Preset with ID {preset_id} does not exist")
                     return JsonResponse({"success": False, "error": f"Preset with ID {preset_id} not found"})
                 
             except Exception as e:
-                import traceback
-                print("DEBUG: Unexpected error in apply_preset:")
-                traceback.print_exc()
+                logger.exception("Unexpected error in apply_preset")
                 
                 return JsonResponse({
                     "success": False, 
@@ -928,34 +905,20 @@ def unified_dashboard(request):
         spend_brackets = []
         
         try:
-            active_config = ScoringConfiguration.objects.filter(is_active_for_behavior=True).first()
-            if not active_config:
-                # Ensure at least one preset exists
-                active_config = ScoringConfiguration.objects.first()
-                if not active_config:
-                    active_config = ScoringConfiguration.objects.create(
-                        name="Default Configuration",
-                        description="Auto-created default configuration",
-                        is_active_for_behavior=True
-                    )
-                else:
-                    active_config.is_active_for_behavior = True
-                    active_config.save()
+            active_config = ScoringConfiguration.get_active_config()
         except Exception as e:
-            print(f"Error getting active config: {e}")
+            logger.error(f"Error getting active config: {e}")
             active_config = None
         
         if active_config:
-            try:
-                age_brackets = AgeBracket.objects.filter(config=active_config).order_by('order')
-                spend_brackets = SpendBracket.objects.filter(config=active_config).order_by('order')
-                print(f"Loaded {len(age_brackets)} age brackets and {len(spend_brackets)} spend brackets")
-            except Exception as e:
-                print(f"Error loading brackets: {e}")
-                age_brackets = []
-                spend_brackets = []
+            # Prefetched (in bracket order) with the cached configuration
+            age_brackets = list(active_config.age_brackets.all())
+            spend_brackets = list(active_config.spend_brackets.all())
+            logger.debug(f"Loaded {len(age_brackets)} age brackets and {len(spend_brackets)} spend brackets")
+        else:
+            logger.warning("No active scoring configuration")
         
-        clinic_settings = RatedAppSettings.objects.first()
+        clinic_settings = RatedAppSettings.cached()
         return render(request, 'patient_rating/unified_dashboard.html', {
             "clinic_settings": clinic_settings,
             "active_config": active_config,
@@ -964,6 +927,23 @@ def unified_dashboard(request):
         })
 
 
+def preset_version(request, *args, **kwargs):
+    """
+    ETag for preset responses
+    
+    The shared config version changes with every preset or bracket change, so
+    the dashboard can revalidate and get a 304 while nothing has changed.
+    """
+    version, updated_at = config_cache.stamp()
+    return f"presets-{version}-{updated_at.timestamp() if updated_at else 0}"
+
+
+def presets_last_modified(request, *args, **kwargs):
+    return config_cache.stamp()[1]
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=preset_version, last_modified_func=presets_last_modified)
 def get_presets(request):
     """Return JSON list of all saved presets for dropdown population"""
     if request.method == 'GET':
@@ -984,7 +964,8 @@ def get_presets(request):
             return JsonResponse({
                 'success': True,
                 'presets': preset_list,
-                'count': len(preset_list)
+                'count': len(preset_list),
+                'version': config_cache.stamp()[0]
             })
             
         except Exception as e:
@@ -993,13 +974,18 @@ def get_presets(request):
     return JsonResponse({'success': False, 'error': 'Method not allowed'}, status=405)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=preset_version, last_modified_func=presets_last_modified)
 def get_preset_details(request, preset_id):
     """Get detailed preset data including all slider values and brackets"""
     try:
-        preset = ScoringConfiguration.objects.get(id=preset_id)
+        preset = ScoringConfiguration.objects.prefetch_related(
+            Prefetch('age_brackets', queryset=AgeBracket.objects.order_by('order')),
+            Prefetch('spend_brackets', queryset=SpendBracket.objects.order_by('order'))
+        ).get(id=preset_id)
         
         age_brackets = []
-        for bracket in preset.age_brackets.all().order_by('order'):
+        for bracket in preset.age_brackets.all():
             age_brackets.append({
                 'id': bracket.id,
                 'min_age': bracket.min_age,
@@ -1009,7 +995,7 @@ def get_preset_details(request, preset_id):
             })
         
         spend_brackets = []
-        for bracket in preset.spend_brackets.all().order_by('order'):
+        for bracket in preset.spend_brackets.all():
             spend_brackets.append({
                 'id': bracket.id,
                 'min_spend': float(bracket.min_spend),
@@ -1054,7 +1040,8 @@ def get_preset_details(request, preset_id):
         
         return JsonResponse({
             'success': True,
-            'preset': preset_data
+            'preset': preset_data,
+            'version': config_cache.stamp()[0]
         })
         
     except ScoringConfiguration.DoesNotExist:
@@ -1114,6 +1101,8 @@ def bulk_insert_age_brackets(request):
                 ))
             
             AgeBracket.objects.bulk_create(age_brackets)
+            # bulk_create sends no post_save, so the config cache is bumped here
+            config_cache.bump()
             
             return JsonResponse({
                 'success': True,
@@ -1172,6 +1161,8 @@ def bulk_insert_spend_brackets(request):
                 ))
             
             SpendBracket.objects.bulk_create(spend_brackets)
+            # bulk_create sends no post_save, so the config cache is bumped here
+            config_cache.bump()
             
             return JsonResponse({
                 'success': True,
@@ -1416,11 +1407,19 @@ class PatientDashboardScoreView(View):
     """Dedicated endpoint for unified dashboard to get patient scores AND behavior data"""
     def get(self, request, patient_id):
         try:
-            config = ScoringConfiguration.get_active_config()
+            config = ScoringConfiguration.active_plan()
+            if not config:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No active scoring configuration found',
+                    'patient_id': patient_id
+                })
             
             # Use plugin architecture for analysis
             analysis_view = PatientAnalysisView()
-            analysis_result = analysis_view.analyze_patient_behavior_plugin(patient_id, config)
+            analysis_result = analysis_view.analyze_patient_behavior_plugin(
+                patient_id, config, refresh=request.GET.get('refresh') == '1'
+            )
             
             if analysis_result and 'behavior_data' in analysis_result:
                 return JsonResponse({
@@ -1446,47 +1445,98 @@ class PatientDashboardScoreView(View):
             })
 
 
+@require_http_methods(["GET"])
+def patient_bundle(request, patient_id):
+    """
+    Everything the dashboard shows for a selected patient in one response
+    
+    The patient record, appointments, invoices and referrals are fetched
+    concurrently (or reused from the feature cache), then scored with the
+    active configuration. Pass refresh=1 to bypass the cache.
+    """
+    try:
+        settings = RatedAppSettings.cached()
+        if not settings:
+            return JsonResponse({
+                'success': False,
+                'error': 'System not configured'
+            }, status=400)
+        
+        plan = ScoringConfiguration.active_plan()
+        if not plan:
+            return JsonResponse({
+                'success': False,
+                'error': 'No active scoring configuration found'
+            }, status=400)
+        
+        features = get_patient_features(patient_id, settings, refresh=request.GET.get('refresh') == '1')
+        if not features:
+            return JsonResponse({
+                'success': False,
+                'error': 'Patient not found',
+                'patient_id': patient_id
+            }, status=404)
+        
+        likability = Patient.likability_map([patient_id])
+        result = BehavioralProcessor.score_features(
+            features, plan, settings, likability=likability
+        )
+        
+        patient = features.get('patient') or {}
+        return JsonResponse({
+            'success': True,
+            'patient_id': patient_id,
+            'patient_name': features['patient_name'],
+            'patient': {
+                field: patient.get(field)
+                for field in ('id', 'first_name', 'last_name', 'full_name', 'email', 'phone', 'date_of_birth')
+            },
+            'likability': likability.get(str(patient_id), 0),
+            'score': result['total_score'],
+            'grade': result['letter_grade'],
+            'behavior_data': result['behavior_data']
+        })
+    
+    except Exception as e:
+        logger.exception(f"Error building bundle for patient {patient_id}")
+        return JsonResponse({
+            'success': False,
+            'error': str(e),
+            'patient_id': patient_id
+        }, status=500)
+
+
 # Helper functions for patient behavior extraction using plugin architecture
 def extract_patient_behavior_data_plugin(patient_id, config):
     """Extract comprehensive patient behavior data using plugin architecture"""
     try:
-        print(f"Extracting behavior data for patient {patient_id}")
+        logger.debug(f"Extracting behavior data for patient {patient_id}")
         
         # Handle both dictionary (testing mode) and object configs
         if isinstance(config, dict):
-            # Testing mode - create a temporary config object
-            from types import SimpleNamespace
-            config = SimpleNamespace(**config)
-        
-        settings = RatedAppSettings.objects.first()
+            # Testing mode - session weights over the active preset's brackets (never saved)
+            testing_config = config
+            config = ScoringConfiguration.get_active_config()
+            if not config:
+                logger.warning("No active scoring configuration")
+                return {}
+            for field in ScoringConfiguration.SCORING_FIELDS:
+                if field in testing_config:
+                    setattr(config, field, testing_config[field])
+        
+        settings = RatedAppSettings.cached()
         if not settings:
             return {}
         
-        # Get client directly
-        client = IntegrationFactory.get_client(settings)
-        
-        # Get raw data from Cliniko
-        patients = client.get_patients(filters={'id': patient_id})
-        if not patients:
+        # Cached features are rescored, so slider changes don't refetch from Cliniko
+        features = get_patient_features(patient_id, settings)
+        if not features:
             return {}
         
-        raw_patient = patients[0]
-        appointments = client.get_appointments(patient_id)
-        invoices = client.get_invoices(patient_id)
-        referral_data = client.get_referrals(patient_id)
-        
-        # Prepare data for behavioral processor
-        patient_data = {
-            'id': patient_id,
-            'date_of_birth': raw_patient.get('date_of_birth'),
-            'appointments': appointments,
-            'invoices': invoices,
-            'referrals': referral_data.get('referred_patient_ids', []) if isinstance(referral_data, dict) else []
-        }
-        
-        # Process behavior
-        processor = BehavioralProcessor()
-        result = processor.process_patient_behavior(patient_data, config, settings)
+        result = BehavioralProcessor.score_features(
+            features, config, settings,
+            likability=Patient.likability_map([patient_id])
+        )
         
         if result and 'behavior_data' in result:
             return result['behavior_data']
@@ -1494,9 +1544,7 @@ def extract_patient_behavior_data_plugin(patient_id, config):
         return {}
         
     except Exception as e:
-        print(f"Error in extract_patient_behavior_data_plugin: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error in extract_patient_behavior_data_plugin: {e}")
         return {}
 
 
@@ -1530,7 +1578,7 @@ def update_clinic_settings(request):
     """Update clinic settings"""
     try:
         if request.method == 'GET':
-            settings = RatedAppSettings.objects.first()
+            settings = RatedAppSettings.cached()
             if not settings:
                 return JsonResponse({
                     'success': False, 
@@ -1692,6 +1740,8 @@ def analytics_config(request):
             response_data = {
                 'success': True,
                 'enabled': settings.analytics_enabled if settings else False,
+                'interactive_rate_share': settings.interactive_rate_share if settings else 25,
+                'shard_cache_horizon_months': settings.shard_cache_horizon_months if settings else 3,
                 'current_job': None
             }
             
@@ -1706,6 +1756,8 @@ def analytics_config(request):
                     'preset_name': current_job.preset.name if current_job.preset else None,
                     'status': current_job.status,
                     'is_test_mode': current_job.is_test_mode,
+                    'incremental': current_job.incremental,
+                    'compare_preset_ids': list(current_job.compare_presets.values_list('id', flat=True)),
                     'last_run': current_job.last_run_completed.isoformat() if current_job.last_run_completed else None,
                     'next_run': current_job.next_run.isoformat() if current_job.next_run else None,
                     'patients_processed': current_job.patients_processed,
@@ -1751,6 +1803,15 @@ def analytics_config(request):
                     'error': 'Invalid preset selected'
                 }, status=400)
             
+            # Optional presets to compare with the job's preset, scored from the same fetched data
+            compare_ids = {str(preset_id) for preset_id in data.get('compare_preset_ids') or []} - {str(preset.id)}
+            compare_presets = list(ScoringConfiguration.objects.filter(id__in=compare_ids))
+            if len(compare_presets) != len(compare_ids):
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid comparison preset selected'
+                }, status=400)
+            
             # Calculate date range sizes for comparison
             date_range_order = {
                 '1d': 1,
@@ -1765,7 +1826,7 @@ def analytics_config(request):
             with transaction.atomic():
                 # Check for existing jobs (exclude test mode jobs from conflict check)
                 existing_jobs = AnalyticsJob.objects.filter(
-                    status__in=['pending', 'running'],
+                    status__in=['pending', 'running', 'paused'],
                     is_test_mode=False
                 ).exclude(
                     date_range='1d',
@@ -1776,9 +1837,13 @@ def analytics_config(request):
                 # If this is not a test mode job, check for conflicts
                 if not is_test_mode:
                     for existing_job in existing_jobs:
-                        # Cancel existing production jobs
+                        # Cancel existing production jobs (a paused job has no worker to notice)
                         existing_job.cancel_requested = True
+                        if existing_job.status == 'paused':
+                            existing_job.status = 'cancelled'
+                            existing_job.cohort = []
                         existing_job.save()
+                        JobControl.signal(existing_job.id)
                         
                         # Prepare replacement message
                         existing_range_size = date_range_order.get(existing_job.date_range, 0)
@@ -1808,8 +1873,11 @@ def analytics_config(request):
                     scheduled_day=data.get('scheduled_day') if data['frequency'] == 'weekly' else None,
                     status='pending',
                     is_test_mode=is_test_mode,
+                    incremental=bool(data.get('incremental', True)),
+                    estimate=data.get('estimate') if isinstance(data.get('estimate'), dict) else {},
                     created_by=request.user.username if request.user.is_authenticated else 'system'
                 )
+                job.compare_presets.set(compare_presets)
                 
                 # Calculate next run time for scheduled jobs
                 if job.frequency in ['daily', 'weekly']:
@@ -1822,6 +1890,11 @@ def analytics_config(request):
                         clinic_name='Default Clinic'
                     )
                 
+                if 'interactive_rate_share' in data:
+                    settings.interactive_rate_share = min(max(int(data['interactive_rate_share']), 0), 90)
+                if 'shard_cache_horizon_months' in data:
+                    settings.shard_cache_horizon_months = min(max(int(data['shard_cache_horizon_months']), 1), 24)
+                
                 settings.analytics_enabled = True
                 settings.analytics_preset = preset
                 settings.analytics_last_job = job
@@ -1853,11 +1926,72 @@ def analytics_config(request):
             }, status=500)
 
 
+@require_http_methods(["GET"])
+def analytics_estimate(request):
+    """Estimate cohort size, API calls and duration for an analytics run before saving it"""
+    from .analytics_estimate import estimate_analytics_run
+    
+    date_range = request.GET.get('date_range')
+    if date_range not in dict(AnalyticsJob.DATE_RANGE_CHOICES):
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid date range'
+        }, status=400)
+    
+    try:
+        settings = RatedAppSettings.cached()
+        if not settings or not settings.api_key:
+            return JsonResponse({
+                'success': False,
+                'error': 'Connect to software first'
+            }, status=400)
+        
+        estimate = estimate_analytics_run(
+            settings,
+            date_range,
+            incremental=request.GET.get('incremental', 'true').lower() != 'false',
+            is_test_mode=request.GET.get('is_test_mode', 'false').lower() == 'true'
+        )
+        if estimate is None:
+            return JsonResponse({
+                'success': False,
+                'error': 'Estimates are not supported for this integration'
+            }, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'estimate': estimate
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+def run_analytics_in_background(job):
+    """Run process_analytics in a daemon thread for a job already marked running"""
+    def run_analytics():
+        try:
+            call_command('process_analytics', job_id=job.id)
+        except Exception as e:
+            logger.error(f"Analytics processing error: {e}")
+            job.refresh_from_db()
+            if job.status == 'running':
+                job.status = 'failed'
+                job.error_log = str(e)
+                job.save()
+    
+    thread = Thread(target=run_analytics)
+    thread.daemon = True
+    thread.start()
+
+
 @require_http_methods(["POST"])
 def analytics_start(request):
     """Manually start analytics processing"""
     try:
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         if not settings or not settings.analytics_last_job:
             return JsonResponse({
                 'success': False,
@@ -1882,13 +2016,16 @@ def analytics_start(request):
             
             for other_job in other_running:
                 other_job.cancel_requested = True
-                other_job.save()
+                other_job.save(update_fields=['cancel_requested', 'updated_at'])
+                JobControl.signal(other_job.id)
                 logger.info(f"Cancelled job {other_job.id} to start job {job.id}")
         
         # Mark job as running immediately
         job.status = 'running'
         job.last_run_started = timezone.now()
         job.cancel_requested = False
+        job.pause_requested = False
+        job.cohort = []
         job.patients_processed = 0
         job.patients_failed = 0
         job.processed_patient_ids = []
@@ -1896,26 +2033,11 @@ def analytics_start(request):
         job.error_log = ''
         if job.is_test_mode:
             job.test_results = {}
+        job.hold_lease()
         job.save()
         
         # Trigger processing in background
-        from django.core.management import call_command
-        from threading import Thread
-        
-        def run_analytics():
-            try:
-                call_command('process_analytics')
-            except Exception as e:
-                print(f"Analytics processing error: {e}")
-                job.refresh_from_db()
-                if job.status == 'running':
-                    job.status = 'failed'
-                    job.error_log = str(e)
-                    job.save()
-        
-        thread = Thread(target=run_analytics)
-        thread.daemon = True
-        thread.start()
+        run_analytics_in_background(job)
         
         test_mode_msg = ' (TEST MODE - will not update Cliniko)' if job.is_test_mode else ''
         
@@ -1937,7 +2059,7 @@ def analytics_start(request):
 def analytics_cancel(request):
     """Cancel running analytics job"""
     try:
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         if not settings or not settings.analytics_last_job:
             return JsonResponse({
                 'success': False,
@@ -1946,19 +2068,34 @@ def analytics_cancel(request):
         
         job = settings.analytics_last_job
         
+        if job.status == 'paused':
+            # No worker is running - cancel straight away and drop the checkpoint
+            job.status = 'cancelled'
+            job.cancel_requested = True
+            job.pause_requested = False
+            job.cohort = []
+            job.save()
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Paused analytics cancelled.',
+                'job_id': job.id
+            })
+        
         if job.status != 'running':
             return JsonResponse({
                 'success': False,
                 'error': 'No analytics currently running'
             }, status=400)
         
-        # Set cancellation flag
+        # Set cancellation flag and wake the worker out of any rate-limit wait
         job.cancel_requested = True
-        job.save()
+        job.save(update_fields=['cancel_requested', 'updated_at'])
+        JobControl.signal(job.id)
         
         return JsonResponse({
             'success': True,
-            'message': 'Cancellation requested. Will stop after current patient.',
+            'message': 'Cancellation requested. Processing will stop shortly.',
             'job_id': job.id
         })
         
@@ -1969,59 +2106,77 @@ def analytics_cancel(request):
         }, status=500)
 
 
-@require_http_methods(["GET"])
-def analytics_status(request):
-    """Get current analytics job status"""
+@require_http_methods(["POST"])
+def analytics_pause(request):
+    """Pause running analytics job, keeping its cohort and progress"""
     try:
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         if not settings or not settings.analytics_last_job:
             return JsonResponse({
-                'success': True,
-                'status': 'not_configured'
-            })
+                'success': False,
+                'error': 'No analytics job configured'
+            }, status=400)
         
         job = settings.analytics_last_job
         
-        # Calculate progress percentage
-        progress = 0
-        if job.total_patients > 0:
-            progress = int((job.patients_processed / job.total_patients) * 100)
+        if job.status != 'running':
+            return JsonResponse({
+                'success': False,
+                'error': 'No analytics currently running'
+            }, status=400)
+        
+        # Set pause flag and wake the worker out of any rate-limit wait
+        job.pause_requested = True
+        job.save(update_fields=['pause_requested', 'updated_at'])
+        JobControl.signal(job.id)
         
-        response_data = {
+        return JsonResponse({
             'success': True,
-            'status': job.status,
-            'progress': progress,
-            'patients_processed': job.patients_processed,
-            'total_patients': job.total_patients,
-            'patients_failed': job.patients_failed,
-            'last_run_started': job.last_run_started.isoformat() if job.last_run_started else None,
-            'last_run_completed': job.last_run_completed.isoformat() if job.last_run_completed else None,
-            'next_run': job.next_run.isoformat() if job.next_run else None,
-        }
+            'message': 'Pause requested. Progress will be kept for resuming.',
+            'job_id': job.id
+        })
         
-        # Format status message
-        if job.status == 'running':
-            response_data['message'] = f'Analysing... ({job.patients_processed}/{job.total_patients})'
-        elif job.status == 'completed':
-            if job.last_run_completed:
-                completed_time = job.last_run_completed.strftime('%Y-%m-%d %H:%M')
-                response_data['message'] = f'Completed ({completed_time})'
-            else:
-                response_data['message'] = 'Completed'
-        elif job.status == 'partial':
-            response_data['message'] = f'Partial Completion ({job.patients_processed}/{job.total_patients})'
-        elif job.status == 'failed':
-            response_data['message'] = 'Failed - Check error log'
-        elif job.status == 'cancelled':
-            response_data['message'] = 'Cancelled by user'
-        else:
-            response_data['message'] = 'Ready to run'
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+
+@require_http_methods(["POST"])
+def analytics_resume(request):
+    """Resume a paused analytics job from its checkpoint"""
+    try:
+        settings = RatedAppSettings.cached()
+        if not settings or not settings.analytics_last_job:
+            return JsonResponse({
+                'success': False,
+                'error': 'No analytics job configured'
+            }, status=400)
         
-        # Add error information if available
-        if job.error_log:
-            response_data['errors'] = job.error_log[-500:]  # Last 500 chars of error log
+        job = settings.analytics_last_job
         
-        return JsonResponse(response_data)
+        if job.status != 'paused':
+            return JsonResponse({
+                'success': False,
+                'error': 'Analytics is not paused'
+            }, status=400)
+        
+        job.status = 'running'
+        job.pause_requested = False
+        job.cancel_requested = False
+        job.hold_lease()
+        job.save(update_fields=[
+            'status', 'pause_requested', 'cancel_requested', 'lease_owner', 'lease_expires_at', 'updated_at'
+        ])
+        
+        run_analytics_in_background(job)
+        
+        return JsonResponse({
+            'success': True,
+            'message': f'Analytics resumed ({job.patients_processed}/{job.total_patients} already processed)',
+            'job_id': job.id
+        })
         
     except Exception as e:
         return JsonResponse({
@@ -2029,11 +2184,49 @@ def analytics_status(request):
             'error': str(e)
         }, status=500)
 
+
+@require_http_methods(["GET"])
+def analytics_status(request):
+    """Get current analytics job status"""
+    try:
+        return JsonResponse(analytics_status_data())
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@require_http_methods(["GET"])
+async def analytics_stream(request):
+    """
+    Server-sent analytics status events, pushed only when the status changes
+    
+    Served from ASGI the stream stays open without holding a worker thread.
+    Under WSGI each request answers with a single event and the browser's
+    reconnect delay paces the polling instead.
+    """
+    last_event_id = request.headers.get('Last-Event-ID')
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    
+    if isinstance(request, ASGIRequest):
+        return StreamingHttpResponse(
+            status_events(last_event_id),
+            content_type='text/event-stream',
+            headers=headers
+        )
+    
+    event = await sync_to_async(single_status_event)(last_event_id)
+    return HttpResponse(event, content_type='text/event-stream', headers=headers)
+
+@require_http_methods(["GET"])
+def request_metrics(request):
+    """Request timings per view and dashboard action, totalled by this worker process"""
+    return JsonResponse({'success': True, **view_stats.snapshot()})
+
 def send_analytics_email_log(job, settings):
-    """Send email log after analytics completion"""
-    import smtplib
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
+    """Queue the analytics email log for the outbox sender"""
+    from .email_outbox import queue_email
     import logging
     
     logger = logging.getLogger(__name__)
@@ -2082,17 +2275,20 @@ def send_analytics_email_log(job, settings):
         if successful_count > 0:
             log_lines.append(f"\nSuccessfully Processed: {successful_count} patients")
             if successful_count <= 20:  # Only list first 20
-                for patient_id in job.processed_patient_ids[:20]:
-                    try:
-                        patient = Patient.objects.get(cliniko_patient_id=patient_id)
-                        # Mask last 4 digits of ID
-                        masked_id = patient_id[:-4] + '****' if len(patient_id) > 4 else '****'
-                        log_lines.append(
-                            f"  - {patient.patient_name}, ID: {masked_id}, "
-                            f"Score: {patient.total_score}, Rating: {patient.calculated_rating}"
-                        )
-                    except Patient.DoesNotExist:
-                        pass
+                listed_ids = job.processed_patient_ids[:20]
+                patients = Patient.objects.only(
+                    'cliniko_patient_id', 'patient_name', 'total_score', 'calculated_rating'
+                ).in_bulk(listed_ids, field_name='cliniko_patient_id')
+                for patient_id in listed_ids:
+                    patient = patients.get(patient_id)
+                    if not patient:
+                        continue
+                    # Mask last 4 digits of ID
+                    masked_id = patient_id[:-4] + '****' if len(patient_id) > 4 else '****'
+                    log_lines.append(
+                        f"  - {patient.patient_name}, ID: {masked_id}, "
+                        f"Score: {patient.total_score}, Rating: {patient.calculated_rating}"
+                    )
                 if successful_count > 20:
                     log_lines.append(f"  ... and {successful_count - 20} more")
         
@@ -2116,45 +2312,38 @@ def send_analytics_email_log(job, settings):
             "",
             "=" * 50,
             f"Total Processed: {successful_count}",
+            f"Unchanged (previous score kept): {job.patients_skipped}",
             f"Total Failed: {failed_count}",
             f"Status: {job.get_status_display()}",
         ])
         
+        comparison = job.estimate_comparison()
+        if comparison:
+            estimated, actual = comparison['estimated'], comparison['actual']
+            log_lines.extend([
+                "",
+                "Estimate vs Actual:",
+                f"  Patients: ~{estimated['cohort']} estimated, {actual['cohort']} actual",
+                f"  API calls: ~{estimated['api_calls']} estimated, {actual['api_calls']} actual",
+                f"  Duration: ~{estimated['duration_seconds'] // 60} min estimated, {actual['duration_seconds'] // 60} min actual",
+            ])
+        
         if job.is_test_mode:
             log_lines.append("\n[TEST MODE - No Cliniko updates were made]")
         
         # Create log file content
         log_content = "\n".join(log_lines)
         
-        # Setup email
-        msg = MIMEMultipart()
-        msg['From'] = settings.smtp_username
-        msg['To'] = settings.clinic_email
-        msg['Subject'] = subject
-        
-        # Add body
-        msg.attach(MIMEText(log_content, 'plain'))
-        
-        # Send email
-        try:
-            server = smtplib.SMTP(settings.smtp_host, settings.smtp_port)
-            if settings.smtp_use_tls:
-                server.starttls()
-            server.login(settings.smtp_username, settings.smtp_password)
-            server.send_message(msg)
-            server.quit()
-            
-            logger.info(f"Analytics email sent to {settings.clinic_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send email: {e}")
-            # Still log to console
-            print("\n" + "="*50)
-            print("ANALYTICS LOG (Email send failed)")
-            print("="*50)
-            print(log_content)
-            return False
+        # Sent by the outbox sender, so the job never waits on the mail server
+        queue_email(
+            subject,
+            log_content,
+            from_address=settings.smtp_username,
+            to_address=settings.clinic_email,
+            job=job
+        )
+        logger.info(f"Analytics email to {settings.clinic_email} queued")
+        return True
         
     except Exception as e:
         logger.error(f"Error preparing analytics email: {e}")
@@ -2170,7 +2359,7 @@ def analytics_presets(request):
         )
         
         # Check if any preset is currently used by analytics
-        settings = RatedAppSettings.objects.first()
+        settings = RatedAppSettings.cached()
         active_analytics_preset_id = None
         if settings and settings.analytics_preset:
             active_analytics_preset_id = settings.analytics_preset.id
@@ -2190,4 +2379,184 @@ def analytics_presets(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+def parse_report_date(value):
+    """Parse a YYYY-MM-DD query parameter, or None if missing"""
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+@require_http_methods(["GET"])
+def patient_score_history(request, patient_id):
+    """Get a patient's analytics score history for trend charts"""
+    try:
+        start_date = parse_report_date(request.GET.get('from'))
+        end_date = parse_report_date(request.GET.get('to'))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Dates must be in YYYY-MM-DD format'
+        }, status=400)
+    
+    try:
+        history = [
+            {**snapshot, 'snapshot_date': snapshot['snapshot_date'].isoformat()}
+            for snapshot in PatientScoreSnapshot.trend(str(patient_id), start_date, end_date)
+        ]
+        
+        return JsonResponse({
+            'success': True,
+            'patient_id': str(patient_id),
+            'history': history
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@require_http_methods(["GET"])
+def analytics_grade_migration(request):
+    """Get grade movement between two analytics run dates (defaults to the last two)"""
+    try:
+        from_date = parse_report_date(request.GET.get('from'))
+        to_date = parse_report_date(request.GET.get('to'))
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Dates must be in YYYY-MM-DD format'
+        }, status=400)
+    
+    try:
+        if not from_date or not to_date:
+            run_dates = list(
+                PatientScoreSnapshot.objects.order_by('-snapshot_date')
+                .values_list('snapshot_date', flat=True).distinct()[:2]
+            )
+            if len(run_dates) < 2:
+                return JsonResponse({
+                    'success': True,
+                    'migration': [],
+                    'message': 'At least two analytics runs are needed to compare grades'
+                })
+            to_date, from_date = run_dates
+        
+        migration = [
+            {'from_grade': row['from_grade'], 'to_grade': row['letter_grade'], 'patients': row['patients']}
+            for row in PatientScoreSnapshot.grade_migration(from_date, to_date, job=request.GET.get('job_id'))
+        ]
+        
+        return JsonResponse({
+            'success': True,
+            'from_date': from_date.isoformat(),
+            'to_date': to_date.isoformat(),
+            'migration': migration
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@require_http_methods(["GET"])
+def analytics_comparison(request):
+    """Grade distributions of a comparison job's presets (defaults to the current job)"""
+    try:
+        job_id = request.GET.get('job_id')
+        if job_id:
+            job = AnalyticsJob.objects.filter(id=job_id).select_related('preset').first()
+        else:
+            settings = RatedAppSettings.cached()
+            job = settings.analytics_last_job if settings else None
+        
+        if not job:
+            return JsonResponse({
+                'success': False,
+                'error': 'Analytics job not found'
+            }, status=404)
+        
+        if not job.compare_presets.exists():
+            return JsonResponse({
+                'success': False,
+                'error': 'This analytics job does not compare presets'
+            }, status=400)
+        
+        return JsonResponse({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'comparison': comparison_report(job)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@require_http_methods(["POST"])
+def analytics_preview(request):
+    """
+    Grade distribution of the last analysed cohort under a draft configuration
+    
+    Rescores the features stored by the last analytics run, so it is quick
+    enough to call while weights and brackets are being edited.
+    """
+    try:
+        started = time.monotonic()
+        draft = json.loads(request.body or '{}')
+        
+        if draft.get('preset_id'):
+            base_config = ScoringConfiguration.objects.filter(id=draft['preset_id']).first()
+            if not base_config:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Invalid preset selected'
+                }, status=400)
+        else:
+            base_config = ScoringConfiguration.get_active_config()
+            if not base_config:
+                return JsonResponse({
+                    'success': False,
+                    'error': 'No active scoring configuration found'
+                }, status=400)
+        
+        try:
+            plan = draft_plan(draft, base_config)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            return JsonResponse({
+                'success': False,
+                'error': f'Invalid draft configuration: {e}'
+            }, status=400)
+        
+        preview = preview_distribution(plan)
+        
+        return JsonResponse({
+            'success': True,
+            **preview,
+            'elapsed_ms': round((time.monotonic() - started) * 1000)
+        })
+        
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON data'
+        }, status=400)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@require_http_methods(["GET"])
+def analytics_export(request):
+    """Stream every patient score as CSV (?categories=1 adds per-category points)"""
+    from .score_export import stream_csv
+    
+    include_categories = request.GET.get('categories', '').lower() in ('1', 'true', 'yes')
+    filename = f"patient-scores-{timezone.localdate().isoformat()}.csv"
+    
+    response = StreamingHttpResponse(stream_csv(include_categories), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response